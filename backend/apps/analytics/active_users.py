@@ -0,0 +1,229 @@
+"""
+Approximate daily, weekly and monthly distinct users.
+
+Each login and redemption adds the user to a Redis set for the day and for
+every dimension it belongs to; ``flush_distinct_users`` (Celery beat, every
+minute) folds those sets into the daily HyperLogLog sketches, one row lock
+per sketch per flush rather than one per request. Windows of any length are
+answered by merging the daily sketches instead of running COUNT(DISTINCT)
+over the raw tables.
+"""
+
+import json
+import logging
+from collections import defaultdict
+from datetime import date, timedelta
+
+import redis
+from django.db import transaction
+from django.utils import timezone
+
+from voucher_project.redis_client import get_redis
+from .hll import HyperLogLog
+from .models import DistinctUserRollup
+
+logger = logging.getLogger('voucher_app')
+
+# Set of the pending sets' keys, and the prefix of those keys
+PENDING_INDEX = 'active_users:pending'
+PENDING_PREFIX = 'active_users:pending:'
+# Pending ids are dropped if nothing flushes them for this long
+PENDING_TTL = 2 * 24 * 3600
+
+WINDOWS = {
+    'daily': 1,
+    'weekly': 7,
+    'monthly': 30,
+}
+
+
+def login_dimensions(user):
+    dimensions = [(DistinctUserRollup.DIMENSION_ALL, '')]
+    if user.institution:
+        dimensions.append((DistinctUserRollup.DIMENSION_INSTITUTION, user.institution))
+    return dimensions
+
+
+def redemption_dimensions(user, voucher):
+    dimensions = login_dimensions(user)
+    dimensions.append((DistinctUserRollup.DIMENSION_VOUCHER_TYPE, voucher.voucher_type.type_code))
+    return dimensions
+
+
+def _pending_key(metric, dimension, value, day):
+    return PENDING_PREFIX + json.dumps([metric, dimension, value, day.isoformat()])
+
+
+def add_to_rollup(metric, dimension, value, day, user_ids):
+    """Fold user ids into one daily sketch"""
+    lookup = dict(metric=metric, dimension=dimension, value=value[:255], day=day)
+
+    # Repeat visitors rarely move a register, so check before locking
+    existing = DistinctUserRollup.objects.filter(**lookup).values_list('sketch', flat=True).first()
+    if existing is not None:
+        sketch = HyperLogLog.from_bytes(existing)
+        if not any(sketch.would_change(user_id) for user_id in user_ids):
+            return
+
+    with transaction.atomic():
+        rollup, _ = DistinctUserRollup.objects.select_for_update().get_or_create(
+            **lookup, defaults={'sketch': HyperLogLog().to_bytes()}
+        )
+        sketch = HyperLogLog.from_bytes(rollup.sketch)
+        changed = False
+        for user_id in user_ids:
+            changed = sketch.add(user_id) or changed
+        if changed:
+            rollup.sketch = sketch.to_bytes()
+            rollup.save(update_fields=['sketch', 'updated_at'])
+
+
+def record_distinct_user(metric, user_id, dimensions, day=None):
+    """Queue a user for the day's sketch of each (dimension, value) pair"""
+    day = day or timezone.now().date()
+    try:
+        pipe = get_redis().pipeline(transaction=False)
+        for dimension, value in dimensions:
+            key = _pending_key(metric, dimension, value[:255], day)
+            pipe.sadd(key, user_id)
+            pipe.expire(key, PENDING_TTL)
+            pipe.sadd(PENDING_INDEX, key)
+        pipe.execute()
+    except redis.RedisError as e:
+        logger.warning(f'Active user tracking fell back to the database: {e}')
+        for dimension, value in dimensions:
+            add_to_rollup(metric, dimension, value, day, [user_id])
+
+
+def flush_distinct_users():
+    """Fold the queued users into the rollups; returns the number of sketches updated"""
+    client = get_redis()
+    flushed = 0
+    for key in client.smembers(PENDING_INDEX):
+        key = key.decode()
+        # Unlisted before the rename: a user queued in between lists the key again
+        client.srem(PENDING_INDEX, key)
+        flushing = f'{key}:flushing'
+        try:
+            client.rename(key, flushing)
+        except redis.ResponseError:
+            # Already flushed and nothing queued since
+            continue
+
+        user_ids = [int(user_id) for user_id in client.smembers(flushing)]
+        metric, dimension, value, day = json.loads(key[len(PENDING_PREFIX):])
+        try:
+            add_to_rollup(metric, dimension, value, date.fromisoformat(day), user_ids)
+        except Exception:
+            # Put the ids back for the next flush
+            pipe = client.pipeline(transaction=False)
+            pipe.sadd(key, *user_ids)
+            pipe.expire(key, PENDING_TTL)
+            pipe.sadd(PENDING_INDEX, key)
+            pipe.execute()
+            raise
+        finally:
+            client.delete(flushing)
+        flushed += 1
+    return flushed
+
+
+def backfill_sketches(start, users, usages, chunk_size):
+    """
+    Daily sketches since ``start`` from logins and voucher usage, as
+    {(metric, dimension, value, day): HyperLogLog}. ``users`` and ``usages``
+    are User and VoucherUsage querysets (or a migration's historical ones).
+    """
+    from .exports import iter_row_chunks
+
+    sketches = defaultdict(HyperLogLog)
+    ALL, INSTITUTION = DistinctUserRollup.DIMENSION_ALL, DistinctUserRollup.DIMENSION_INSTITUTION
+
+    # Only the latest login is stored per user, so this is a lower bound for older days
+    logins = users.filter(last_login__date__gte=start).values_list('id', 'last_login', 'institution')
+    for rows in iter_row_chunks(logins, chunk_size):
+        for user_id, last_login, institution in rows:
+            day = last_login.date()
+            sketches[(DistinctUserRollup.ACTIVE_USERS, ALL, '', day)].add(user_id)
+            if institution:
+                sketches[(DistinctUserRollup.ACTIVE_USERS, INSTITUTION, institution[:255], day)].add(user_id)
+
+    redemptions = usages.filter(used_at__date__gte=start).values_list(
+        'user_id', 'used_at', 'user__institution', 'voucher__voucher_type__type_code'
+    )
+    for rows in iter_row_chunks(redemptions, chunk_size):
+        for user_id, used_at, institution, type_code in rows:
+            day = used_at.date()
+            sketches[(DistinctUserRollup.ACTIVE_REDEEMERS, ALL, '', day)].add(user_id)
+            sketches[(DistinctUserRollup.ACTIVE_REDEEMERS, DistinctUserRollup.DIMENSION_VOUCHER_TYPE, type_code, day)].add(user_id)
+            if institution:
+                sketches[(DistinctUserRollup.ACTIVE_REDEEMERS, INSTITUTION, institution[:255], day)].add(user_id)
+    return sketches
+
+
+def save_sketches(rollups, sketches):
+    """Merge backfilled sketches into the rollup table, keeping what was recorded live"""
+    for (metric, dimension, value, day), sketch in sketches.items():
+        rollup, created = rollups.get_or_create(
+            metric=metric, dimension=dimension, value=value, day=day,
+            defaults={'sketch': sketch.to_bytes()}
+        )
+        if not created:
+            rollup.sketch = sketch.merge(HyperLogLog.from_bytes(rollup.sketch)).to_bytes()
+            rollup.save(update_fields=['sketch', 'updated_at'])
+
+
+def merge_rollups(rows, precision=None):
+    sketches = [HyperLogLog.from_bytes(sketch) for sketch in rows]
+    if not sketches:
+        return HyperLogLog()
+    return HyperLogLog.union(sketches, precision=precision or sketches[0].precision)
+
+
+def distinct_users(metric, start, end, dimension=DistinctUserRollup.DIMENSION_ALL, value=''):
+    """Approximate distinct users between two dates, inclusive"""
+    rows = DistinctUserRollup.objects.filter(
+        metric=metric, dimension=dimension, value=value,
+        day__gte=start, day__lte=end
+    ).values_list('sketch', flat=True)
+    return merge_rollups(rows).count()
+
+
+def distinct_users_by_value(metric, dimension, start, end):
+    """Approximate distinct users per dimension value over a date window"""
+    grouped = defaultdict(list)
+    rows = DistinctUserRollup.objects.filter(
+        metric=metric, dimension=dimension, day__gte=start, day__lte=end
+    ).values_list('value', 'sketch')
+    for value, sketch in rows:
+        grouped[value].append(sketch)
+    return {value: merge_rollups(sketches).count() for value, sketches in grouped.items()}
+
+
+def rolling_distinct_users(metric, dimension, today=None):
+    """Daily, weekly and monthly distinct users per dimension value"""
+    today = today or timezone.now().date()
+    start = today - timedelta(days=max(WINDOWS.values()) - 1)
+
+    by_value = defaultdict(dict)
+    rows = DistinctUserRollup.objects.filter(
+        metric=metric, dimension=dimension, day__gte=start, day__lte=today
+    ).values_list('value', 'day', 'sketch')
+    for value, day, sketch in rows:
+        by_value[value][day] = HyperLogLog.from_bytes(sketch)
+
+    results = {}
+    for value, sketches in by_value.items():
+        # Merge day by day, newest first, reading off each window as it closes
+        merged = HyperLogLog()
+        counts = {}
+        windows = sorted(WINDOWS.items(), key=lambda item: item[1])
+        for offset in range(windows[-1][1]):
+            sketch = sketches.get(today - timedelta(days=offset))
+            if sketch is not None:
+                merged.merge(sketch)
+            for name, days in windows:
+                if days == offset + 1:
+                    counts[name] = merged.count()
+        results[value] = counts
+    return results
@@ -0,0 +1,249 @@
+"""
+Signup and purchase cohort analytics.
+
+Users, completed payments and voucher usage are loaded once into compact
+integer-encoded NumPy arrays (dense user indexes, months and seconds since
+2000-01-01), and the retention and conversion matrices are computed with
+vectorized operations, so a nightly rebuild over millions of users runs in a
+single process.
+"""
+
+from datetime import datetime, timezone as dt_timezone
+
+import numpy as np
+from django.db import transaction
+from django.utils import timezone
+
+from apps.payments.models import Payment
+from apps.users.models import User
+from apps.vouchers.models import VoucherType, VoucherUsage
+from .exports import DEFAULT_CHUNK_SIZE, iter_row_chunks
+from .models import CohortReport
+
+EPOCH = datetime(2000, 1, 1, tzinfo=dt_timezone.utc)
+EPOCH_MONTH = EPOCH.year * 12 + EPOCH.month - 1
+DEFAULT_MAX_MONTHS = 24
+
+
+def month_index(value):
+    """Months since 2000-01"""
+    return value.year * 12 + value.month - 1 - EPOCH_MONTH
+
+
+def month_label(index):
+    year, month = divmod(int(index) + EPOCH_MONTH, 12)
+    return f'{year:04d}-{month + 1:02d}'
+
+
+def epoch_seconds(value):
+    """Seconds since 2000-01-01, fits in int32 until 2068"""
+    return int((value - EPOCH).total_seconds())
+
+
+def _load_columns(queryset, converters, dtypes, chunk_size):
+    """Read a values_list queryset into one NumPy array per column"""
+    columns = [[] for _ in dtypes]
+    for rows in iter_row_chunks(queryset, chunk_size):
+        for index, (convert, dtype) in enumerate(zip(converters, dtypes)):
+            values = (convert(row[index]) for row in rows)
+            columns[index].append(np.fromiter(values, dtype=dtype, count=len(rows)))
+    return [
+        np.concatenate(parts) if parts else np.empty(0, dtype=dtype)
+        for parts, dtype in zip(columns, dtypes)
+    ]
+
+
+def _identity(value):
+    return value
+
+
+class CohortData:
+    """Integer-encoded users, purchases and usage events"""
+
+    def __init__(self, chunk_size=DEFAULT_CHUNK_SIZE):
+        self.user_ids, self.signup_months = _load_columns(
+            User.objects.order_by('id').values_list('id', 'date_joined'),
+            [_identity, month_index], [np.int64, np.int16], chunk_size
+        )
+
+        self.type_ids = np.array(
+            VoucherType.objects.order_by('id').values_list('id', flat=True), dtype=np.int64
+        )
+        self.type_codes = list(VoucherType.objects.order_by('id').values_list('type_code', flat=True))
+
+        purchase_users, purchase_types, purchase_times = _load_columns(
+            Payment.objects.filter(
+                status='completed', completed_at__isnull=False
+            ).values_list('user_id', 'voucher_type_id', 'completed_at'),
+            [_identity, _identity, epoch_seconds], [np.int64, np.int64, np.int32], chunk_size
+        )
+        usage_users, usage_months = _load_columns(
+            VoucherUsage.objects.values_list('user_id', 'used_at'),
+            [_identity, month_index], [np.int64, np.int16], chunk_size
+        )
+
+        # Dense indexes keep every per-user array as small as the user count
+        self.purchase_users = self._user_index(purchase_users)
+        self.purchase_types = np.searchsorted(self.type_ids, purchase_types).astype(np.int32)
+        self.purchase_times = purchase_times
+        self.purchase_months = self._months_from_seconds(purchase_times)
+        self.usage_users = self._user_index(usage_users)
+        self.usage_months = usage_months
+
+    @property
+    def user_count(self):
+        return len(self.user_ids)
+
+    def _user_index(self, user_ids):
+        if len(self.user_ids) == 0:
+            return np.full(len(user_ids), -1, dtype=np.int32)
+        index = np.searchsorted(self.user_ids, user_ids)
+        index[index >= len(self.user_ids)] = 0
+        # Rows for users that vanished mid-load are dropped by the caller
+        return np.where(self.user_ids[index] == user_ids, index, -1).astype(np.int32)
+
+    @staticmethod
+    def _months_from_seconds(seconds):
+        dates = (np.datetime64('2000-01-01T00:00:00', 's') + seconds.astype('timedelta64[s]'))
+        return (dates.astype('datetime64[M]').astype(np.int64) - (EPOCH.year - 1970) * 12).astype(np.int16)
+
+
+def signup_retention(data, current_month, max_months=DEFAULT_MAX_MONTHS):
+    """
+    Rows are signup months, columns are months since signup, values count
+    users who purchased or redeemed a voucher in that month.
+    """
+    if data.user_count == 0:
+        return None
+
+    first_month = int(data.signup_months.min())
+    n_cohorts = current_month - first_month + 1
+    n_offsets = min(max_months, n_cohorts)
+    cohorts = data.signup_months.astype(np.int32) - first_month
+
+    event_users = np.concatenate([data.purchase_users, data.usage_users])
+    event_months = np.concatenate([data.purchase_months, data.usage_months]).astype(np.int32)
+    known = event_users >= 0
+    event_users, event_months = event_users[known], event_months[known]
+
+    offsets = event_months - data.signup_months[event_users]
+    in_range = (offsets >= 0) & (offsets < n_offsets)
+    event_users, offsets = event_users[in_range], offsets[in_range]
+
+    # Count each user at most once per offset
+    keys = np.unique(event_users.astype(np.int64) * n_offsets + offsets)
+    active_users, active_offsets = np.divmod(keys, n_offsets)
+    counts = np.bincount(
+        cohorts[active_users] * n_offsets + active_offsets,
+        minlength=n_cohorts * n_offsets
+    ).reshape(n_cohorts, n_offsets)
+    sizes = np.bincount(cohorts, minlength=n_cohorts)
+
+    # Months that have not happened yet are unknown rather than zero
+    observable = (np.arange(n_cohorts)[:, None] + np.arange(n_offsets)[None, :]) < n_cohorts
+
+    return {
+        'cohort_labels': [month_label(first_month + c) for c in range(n_cohorts)],
+        'column_labels': list(range(n_offsets)),
+        'cohort_sizes': sizes.tolist(),
+        'counts': _masked(counts, observable),
+        'rates': _masked(_rates(counts, sizes), observable),
+    }
+
+
+def purchase_conversion(data):
+    """
+    For each voucher type, cohorts are the month of a user's first purchase of
+    that type. Values count users who later purchased each voucher type.
+    """
+    n_types = len(data.type_ids)
+    known = data.purchase_users >= 0
+    users = data.purchase_users[known]
+    types = data.purchase_types[known].astype(np.int64)
+    times = data.purchase_times[known]
+    months = data.purchase_months[known]
+    if n_types == 0 or len(users) == 0:
+        return {}
+
+    purchasers, buyer_index = np.unique(users, return_inverse=True)
+    keys = buyer_index.astype(np.int64) * n_types + types
+    order = np.lexsort((times, keys))
+    sorted_keys = keys[order]
+    unique_keys, first = np.unique(sorted_keys, return_index=True)
+    last = np.append(first[1:], len(sorted_keys)) - 1
+
+    never = np.iinfo(np.int32).max
+    first_times = np.full(len(purchasers) * n_types, never, dtype=np.int32)
+    last_times = np.full(len(purchasers) * n_types, np.iinfo(np.int32).min, dtype=np.int32)
+    first_months = np.zeros(len(purchasers) * n_types, dtype=np.int16)
+    first_times[unique_keys] = times[order][first]
+    last_times[unique_keys] = times[order][last]
+    first_months[unique_keys] = months[order][first]
+    first_times = first_times.reshape(-1, n_types)
+    last_times = last_times.reshape(-1, n_types)
+    first_months = first_months.reshape(-1, n_types)
+
+    reports = {}
+    for source in range(n_types):
+        buyers = first_times[:, source] != never
+        if not buyers.any():
+            continue
+
+        cohort_months = first_months[buyers, source].astype(np.int32)
+        first_month = int(cohort_months.min())
+        n_cohorts = int(cohort_months.max()) - first_month + 1
+        cohorts = cohort_months - first_month
+
+        converted = last_times[buyers] > first_times[buyers, source][:, None]
+        rows, columns = np.nonzero(converted)
+        counts = np.bincount(
+            cohorts[rows] * n_types + columns, minlength=n_cohorts * n_types
+        ).reshape(n_cohorts, n_types)
+        sizes = np.bincount(cohorts, minlength=n_cohorts)
+
+        reports[data.type_codes[source]] = {
+            'cohort_labels': [month_label(first_month + c) for c in range(n_cohorts)],
+            'column_labels': list(data.type_codes),
+            'cohort_sizes': sizes.tolist(),
+            'counts': counts.tolist(),
+            'rates': _rates(counts, sizes).tolist(),
+        }
+    return reports
+
+
+def _rates(counts, sizes):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rates = np.where(sizes[:, None] > 0, counts / sizes[:, None], 0.0)
+    return np.round(rates, 4)
+
+
+def _masked(matrix, mask):
+    return [
+        [value if visible else None for value, visible in zip(row, mask_row)]
+        for row, mask_row in zip(np.asarray(matrix).tolist(), mask.tolist())
+    ]
+
+
+def build_cohort_reports(max_months=DEFAULT_MAX_MONTHS, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Recompute all cohort matrices and replace the stored reports"""
+    data = CohortData(chunk_size=chunk_size)
+    current_month = month_index(timezone.now())
+
+    reports = []
+    retention = signup_retention(data, current_month, max_months=max_months)
+    if retention:
+        reports.append(CohortReport(kind=CohortReport.SIGNUP_RETENTION, **retention))
+
+    voucher_types = VoucherType.objects.in_bulk(field_name='type_code')
+    for type_code, conversion in purchase_conversion(data).items():
+        reports.append(CohortReport(
+            kind=CohortReport.PURCHASE_CONVERSION,
+            source_type=voucher_types[type_code],
+            **conversion
+        ))
+
+    with transaction.atomic():
+        CohortReport.objects.all().delete()
+        CohortReport.objects.bulk_create(reports)
+
+    return reports
@@ -0,0 +1,384 @@
+"""
+Columnar exports of payment and voucher data for offline analysis.
+
+Rows are read with ``QuerySet.iterator()`` (a server-side cursor on
+PostgreSQL) in fixed-size chunks and written as column batches, so memory
+use depends on the chunk size rather than on the table size.
+"""
+
+import csv
+import io
+import json
+import os
+import uuid
+from datetime import date, datetime
+
+from django.utils import timezone
+
+from apps.vouchers.models import Voucher, VoucherUsage
+from apps.payments.models import Payment, Refund
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc as pa_ipc
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow is optional, CSV is always available
+    pa = None
+
+FORMATS = ('parquet', 'arrow', 'csv')
+STREAMING_FORMATS = ('arrow', 'csv')
+DEFAULT_CHUNK_SIZE = 10000
+WATERMARK_FILE = '_watermark.json'
+
+FILE_EXTENSIONS = {
+    'parquet': 'parquet',
+    'arrow': 'arrow',
+    'csv': 'csv',
+}
+
+CONTENT_TYPES = {
+    'arrow': 'application/vnd.apache.arrow.stream',
+    'csv': 'text/csv',
+}
+
+
+class ExportDataset:
+    """An exportable table: model, columns and the watermark column"""
+
+    def __init__(self, name, model, fields, watermark_field):
+        self.name = name
+        self.model = model
+        self.fields = fields
+        self.watermark_field = watermark_field
+
+    @property
+    def model_fields(self):
+        return [self.model._meta.get_field(name) for name in self.fields]
+
+    @property
+    def watermark_index(self):
+        return self.fields.index(self.watermark_field)
+
+    def queryset(self, since=None):
+        queryset = self.model._default_manager.all()
+        if since is not None:
+            queryset = queryset.filter(**{f'{self.watermark_field}__gt': since})
+        return queryset.order_by(self.watermark_field, 'pk').values_list(*self.fields)
+
+
+# Voucher codes are bearer credentials and usage rows carry IP addresses and
+# user agents, so those columns are deliberately left out of the exports.
+# Watermarks are last-modified columns: a row changed after an export is
+# exported again, in the partition of the month it changed. Usage rows are
+# never updated, so their creation time serves.
+DATASETS = {
+    'payments': ExportDataset('payments', Payment, [
+        'id', 'user_id', 'voucher_type_id', 'amount', 'quantity', 'currency',
+        'status', 'payment_method', 'discount_amount', 'discount_code',
+        'created_at', 'updated_at', 'completed_at',
+    ], watermark_field='updated_at'),
+    'vouchers': ExportDataset('vouchers', Voucher, [
+        'id', 'voucher_type_id', 'user_id', 'status', 'usage_count',
+        'last_used_at', 'issued_at', 'expires_at', 'transaction_id', 'metadata', 'updated_at',
+    ], watermark_field='updated_at'),
+    'voucher_usage': ExportDataset('voucher_usage', VoucherUsage, [
+        'id', 'voucher_id', 'user_id', 'service_type', 'service_data', 'used_at',
+    ], watermark_field='used_at'),
+    'refunds': ExportDataset('refunds', Refund, [
+        'id', 'payment_id', 'amount', 'reason', 'status', 'processed_by_id',
+        'created_at', 'processed_at', 'updated_at',
+    ], watermark_field='updated_at'),
+}
+
+
+def available_formats():
+    """Formats supported by the installed libraries"""
+    if pa is None:
+        return ('csv',)
+    return FORMATS
+
+
+def default_format():
+    return 'parquet' if pa is not None else 'csv'
+
+
+def get_dataset(name):
+    try:
+        return DATASETS[name]
+    except KeyError:
+        raise ValueError(f"Unknown dataset '{name}'. Choose from: {', '.join(DATASETS)}")
+
+
+def iter_row_chunks(queryset, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield lists of at most ``chunk_size`` rows from a values_list queryset"""
+    chunk = []
+    for row in queryset.iterator(chunk_size=chunk_size):
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _resolve_field(field):
+    """Follow foreign keys to the column type actually stored"""
+    while field.is_relation:
+        field = field.target_field
+    return field
+
+
+def _arrow_type(field):
+    field = _resolve_field(field)
+    internal_type = field.get_internal_type()
+    if internal_type == 'DecimalField':
+        return pa.decimal128(field.max_digits, field.decimal_places)
+    if internal_type == 'DateTimeField':
+        return pa.timestamp('us', tz='UTC')
+    if internal_type == 'DateField':
+        return pa.date32()
+    if internal_type == 'BooleanField':
+        return pa.bool_()
+    if internal_type in ('AutoField', 'BigAutoField', 'IntegerField', 'BigIntegerField',
+                         'SmallIntegerField', 'PositiveIntegerField',
+                         'PositiveBigIntegerField', 'PositiveSmallIntegerField'):
+        return pa.int64()
+    return pa.string()
+
+
+def arrow_schema(dataset):
+    return pa.schema([
+        pa.field(name, _arrow_type(field))
+        for name, field in zip(dataset.fields, dataset.model_fields)
+    ])
+
+
+def _column_converter(field):
+    """Return a function that makes a column value Arrow-compatible, or None"""
+    internal_type = _resolve_field(field).get_internal_type()
+    if internal_type == 'UUIDField':
+        return lambda value: None if value is None else str(value)
+    if internal_type == 'JSONField':
+        return lambda value: None if value is None else json.dumps(value)
+    return None
+
+
+def _csv_value(value):
+    if value is None:
+        return ''
+    if isinstance(value, (dict, list)):
+        return json.dumps(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    return value
+
+
+class _BatchEncoder:
+    """Turn chunks of rows into Arrow record batches"""
+
+    def __init__(self, dataset):
+        self.schema = arrow_schema(dataset)
+        self.converters = [_column_converter(field) for field in dataset.model_fields]
+
+    def encode(self, rows):
+        arrays = []
+        for index, (column, converter) in enumerate(zip(zip(*rows), self.converters)):
+            if converter is not None:
+                column = [converter(value) for value in column]
+            arrays.append(pa.array(column, type=self.schema.field(index).type))
+        return pa.RecordBatch.from_arrays(arrays, schema=self.schema)
+
+
+class _CSVPartWriter:
+    def __init__(self, path, dataset):
+        self.file = open(path, 'w', newline='', encoding='utf-8')
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(dataset.fields)
+
+    def write(self, rows):
+        self.writer.writerows([_csv_value(value) for value in row] for row in rows)
+
+    def close(self):
+        self.file.close()
+
+
+class _ArrowPartWriter:
+    def __init__(self, path, dataset):
+        self.encoder = _BatchEncoder(dataset)
+        self.sink = pa.OSFile(path, 'wb')
+        self.writer = pa_ipc.new_file(self.sink, self.encoder.schema)
+
+    def write(self, rows):
+        self.writer.write_batch(self.encoder.encode(rows))
+
+    def close(self):
+        self.writer.close()
+        self.sink.close()
+
+
+class _ParquetPartWriter:
+    def __init__(self, path, dataset):
+        self.encoder = _BatchEncoder(dataset)
+        self.writer = pq.ParquetWriter(path, self.encoder.schema, compression='snappy')
+
+    def write(self, rows):
+        self.writer.write_table(pa.Table.from_batches([self.encoder.encode(rows)]))
+
+    def close(self):
+        self.writer.close()
+
+
+PART_WRITERS = {
+    'parquet': _ParquetPartWriter,
+    'arrow': _ArrowPartWriter,
+    'csv': _CSVPartWriter,
+}
+
+
+def _partition_key(value):
+    """Monthly partitions keyed on the watermark column"""
+    if value is None:
+        return 'unknown'
+    return value.strftime('%Y-%m')
+
+
+def _split_partitions(rows, watermark_index):
+    """Split rows sorted by watermark into contiguous (partition, rows) runs"""
+    start = 0
+    current = _partition_key(rows[0][watermark_index])
+    for index in range(1, len(rows)):
+        key = _partition_key(rows[index][watermark_index])
+        if key != current:
+            yield current, rows[start:index]
+            start, current = index, key
+    yield current, rows[start:]
+
+
+def read_watermark(output_dir, dataset):
+    """Return the watermark recorded by the previous export, if any"""
+    path = os.path.join(output_dir, dataset.name, WATERMARK_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as state_file:
+        value = json.load(state_file).get('watermark')
+    return datetime.fromisoformat(value) if value else None
+
+
+def write_watermark(output_dir, dataset, watermark, rows):
+    path = os.path.join(output_dir, dataset.name, WATERMARK_FILE)
+    state = {
+        'watermark': watermark.isoformat() if watermark else None,
+        'rows': rows,
+        'exported_at': timezone.now().isoformat(),
+    }
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as state_file:
+        json.dump(state, state_file)
+    os.replace(tmp_path, path)
+
+
+def export_dataset(dataset, output_dir, fmt, since=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Export a dataset into ``<output_dir>/<dataset>/month=YYYY-MM/`` part files.
+
+    Only rows with a watermark strictly after ``since`` are exported. Returns
+    a summary with the row count, the files written and the new watermark.
+    """
+    if fmt not in available_formats():
+        raise ValueError(f"Format '{fmt}' is not available. Install pyarrow for Parquet/Arrow output.")
+
+    writer_class = PART_WRITERS[fmt]
+    run_id = timezone.now().strftime('%Y%m%dT%H%M%S')
+    watermark_index = dataset.watermark_index
+    dataset_dir = os.path.join(output_dir, dataset.name)
+    os.makedirs(dataset_dir, exist_ok=True)
+
+    files = []
+    total_rows = 0
+    watermark = since
+    writer = None
+    current_partition = None
+
+    try:
+        for rows in iter_row_chunks(dataset.queryset(since=since), chunk_size):
+            for partition, partition_rows in _split_partitions(rows, watermark_index):
+                if partition != current_partition:
+                    if writer is not None:
+                        writer.close()
+                    partition_dir = os.path.join(dataset_dir, f'month={partition}')
+                    os.makedirs(partition_dir, exist_ok=True)
+                    path = os.path.join(partition_dir, f'part-{run_id}.{FILE_EXTENSIONS[fmt]}')
+                    writer = writer_class(path, dataset)
+                    current_partition = partition
+                    files.append(path)
+                writer.write(partition_rows)
+
+            total_rows += len(rows)
+            last_value = rows[-1][watermark_index]
+            if last_value is not None:
+                watermark = last_value
+    finally:
+        if writer is not None:
+            writer.close()
+
+    write_watermark(output_dir, dataset, watermark, total_rows)
+
+    return {
+        'dataset': dataset.name,
+        'rows': total_rows,
+        'files': files,
+        'watermark': watermark,
+    }
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file object that collects what Arrow writes into it"""
+
+    def __init__(self):
+        super().__init__()
+        self.chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def stream_dataset(dataset, fmt, since=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield an export as byte chunks, suitable for a StreamingHttpResponse"""
+    if fmt not in STREAMING_FORMATS or fmt not in available_formats():
+        raise ValueError(f"Format '{fmt}' cannot be streamed.")
+
+    chunks = iter_row_chunks(dataset.queryset(since=since), chunk_size)
+
+    if fmt == 'csv':
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(dataset.fields)
+        for rows in chunks:
+            writer.writerows([_csv_value(value) for value in row] for row in rows)
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+        # Header only when there are no rows
+        if buffer.tell():
+            yield buffer.getvalue().encode('utf-8')
+        return
+
+    encoder = _BatchEncoder(dataset)
+    sink = _ChunkSink()
+    writer = pa_ipc.new_stream(sink, encoder.schema)
+    for rows in chunks:
+        writer.write_batch(encoder.encode(rows))
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
@@ -0,0 +1,115 @@
+"""
+Per-minute redemption and sales counters kept in Redis.
+
+Writers increment every counter for an event in one pipelined round-trip and
+readers fetch a whole window with a single MGET, so the live operations view
+never touches the relational database.
+"""
+
+import logging
+import time
+
+import redis
+from django.conf import settings
+
+from apps.vouchers.models import VoucherType
+from voucher_project.redis_client import get_redis
+
+logger = logging.getLogger('voucher_app')
+
+BUCKET_SECONDS = 60
+KEY_PREFIX = 'live'
+
+REDEMPTIONS = 'redemptions'
+PURCHASES = 'purchases'
+VOUCHERS_SOLD = 'vouchers_sold'
+REVENUE_CENTS = 'revenue_cents'
+
+EVENTS = (REDEMPTIONS, PURCHASES, VOUCHERS_SOLD, REVENUE_CENTS)
+VOUCHER_TYPE_CODES = [code for code, _ in VoucherType.TYPE_CHOICES]
+
+
+class LiveMetricsUnavailable(Exception):
+    pass
+
+
+def _bucket(timestamp):
+    return int(timestamp) // BUCKET_SECONDS * BUCKET_SECONDS
+
+
+def _key(event, bucket, voucher_type=None):
+    if voucher_type:
+        return f'{KEY_PREFIX}:{event}:{voucher_type}:{bucket}'
+    return f'{KEY_PREFIX}:{event}:{bucket}'
+
+
+def _increment(increments, voucher_type=None, timestamp=None):
+    """Apply {event: amount} to the current bucket, overall and per voucher type"""
+    bucket = _bucket(timestamp or time.time())
+    ttl = settings.LIVE_METRICS_RETENTION_MINUTES * 60 + BUCKET_SECONDS
+    try:
+        pipe = get_redis().pipeline(transaction=False)
+        for event, amount in increments.items():
+            keys = [_key(event, bucket)]
+            if voucher_type:
+                keys.append(_key(event, bucket, voucher_type))
+            for key in keys:
+                pipe.incrby(key, amount)
+                pipe.expire(key, ttl)
+        pipe.execute()
+    except redis.RedisError as e:
+        # Live counters are best effort and must never fail a checkout or redemption
+        logger.warning(f'Live metrics update failed: {e}')
+
+
+def record_redemption(voucher_type, timestamp=None):
+    _increment({REDEMPTIONS: 1}, voucher_type=voucher_type, timestamp=timestamp)
+
+
+def record_purchase(voucher_type, quantity, amount, timestamp=None):
+    _increment({
+        PURCHASES: 1,
+        VOUCHERS_SOLD: quantity,
+        REVENUE_CENTS: int(round(amount * 100)),
+    }, voucher_type=voucher_type, timestamp=timestamp)
+
+
+def get_live_series(minutes=60, by_voucher_type=False, now=None):
+    """Per-minute counts for the last ``minutes`` minutes, oldest first"""
+    minutes = max(1, min(minutes, settings.LIVE_METRICS_RETENTION_MINUTES))
+    last_bucket = _bucket(now or time.time())
+    buckets = [last_bucket - BUCKET_SECONDS * offset for offset in range(minutes - 1, -1, -1)]
+
+    series_keys = [(event, None) for event in EVENTS]
+    if by_voucher_type:
+        series_keys += [(event, code) for event in EVENTS for code in VOUCHER_TYPE_CODES]
+
+    keys = [_key(event, bucket, code) for event, code in series_keys for bucket in buckets]
+    try:
+        values = get_redis().mget(keys)
+    except redis.RedisError as e:
+        raise LiveMetricsUnavailable(str(e))
+
+    series = {}
+    by_type = {}
+    for index, (event, code) in enumerate(series_keys):
+        counts = [int(value or 0) for value in values[index * minutes:(index + 1) * minutes]]
+        if code is None:
+            series[event] = counts
+        else:
+            by_type.setdefault(code, {})[event] = counts
+
+    data = {
+        'bucket_seconds': BUCKET_SECONDS,
+        'buckets': buckets,
+        'series': series,
+        'totals': {event: sum(counts) for event, counts in series.items()},
+        # The newest bucket is still filling up, so rates use the one before it
+        'per_minute': {
+            event: counts[-2] if len(counts) > 1 else counts[-1]
+            for event, counts in series.items()
+        },
+    }
+    if by_voucher_type:
+        data['by_voucher_type'] = by_type
+    return data
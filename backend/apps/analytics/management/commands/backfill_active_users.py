@@ -0,0 +1,27 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from apps.analytics.active_users import backfill_sketches, save_sketches
+from apps.analytics.exports import DEFAULT_CHUNK_SIZE
+from apps.analytics.models import DistinctUserRollup
+from apps.users.models import User
+from apps.vouchers.models import VoucherUsage
+
+
+class Command(BaseCommand):
+    help = 'Rebuild active user and redeemer HyperLogLog rollups from existing logins and voucher usage'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=90, help='Number of days to rebuild')
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help='Rows fetched per database round-trip')
+
+    def handle(self, *args, **options):
+        start = timezone.now().date() - timedelta(days=options['days'] - 1)
+        sketches = backfill_sketches(start, User.objects.all(), VoucherUsage.objects.all(), options['chunk_size'])
+        save_sketches(DistinctUserRollup.objects, sketches)
+
+        self.stdout.write(
+            self.style.SUCCESS(f'✅ Rebuilt {len(sketches)} rollup(s) since {start.isoformat()}')
+        )
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from apps.analytics.cohorts import DEFAULT_MAX_MONTHS, build_cohort_reports
+from apps.analytics.exports import DEFAULT_CHUNK_SIZE
+
+
+class Command(BaseCommand):
+    help = 'Rebuild signup retention and purchase conversion cohort reports'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--max-months', type=int, default=DEFAULT_MAX_MONTHS, help='Months tracked after signup')
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help='Rows fetched per database round-trip')
+
+    def handle(self, *args, **options):
+        reports = build_cohort_reports(
+            max_months=options['max_months'],
+            chunk_size=options['chunk_size']
+        )
+        self.stdout.write(self.style.SUCCESS(f'✅ Built {len(reports)} cohort report(s)'))
@@ -0,0 +1,36 @@
+# Generated by Django 4.2.7 on 2026-10-19 17:19
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('vouchers', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CohortReport',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('signup_retention', 'Signup Retention'), ('purchase_conversion', 'Purchase Conversion')], max_length=50)),
+                ('cohort_labels', models.JSONField(default=list)),
+                ('column_labels', models.JSONField(default=list)),
+                ('cohort_sizes', models.JSONField(default=list)),
+                ('counts', models.JSONField(default=list)),
+                ('rates', models.JSONField(default=list)),
+                ('generated_at', models.DateTimeField(auto_now_add=True)),
+                ('source_type', models.ForeignKey(blank=True, help_text='Voucher type whose first purchase defines the cohort', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='cohort_reports', to='vouchers.vouchertype')),
+            ],
+            options={
+                'verbose_name': 'Cohort Report',
+                'verbose_name_plural': 'Cohort Reports',
+                'db_table': 'analytics_cohort_reports',
+                'indexes': [models.Index(fields=['kind', 'source_type'], name='analytics_c_kind_1818ed_idx')],
+            },
+        ),
+    ]
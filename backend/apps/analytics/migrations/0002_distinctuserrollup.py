@@ -0,0 +1,32 @@
+# Generated by Django 4.2.7 on 2026-10-19 17:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DistinctUserRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('metric', models.CharField(choices=[('active_users', 'Active Users'), ('active_redeemers', 'Active Redeemers')], max_length=50)),
+                ('dimension', models.CharField(choices=[('all', 'All'), ('voucher_type', 'Voucher Type'), ('institution', 'Institution')], max_length=50)),
+                ('value', models.CharField(blank=True, max_length=255)),
+                ('day', models.DateField()),
+                ('sketch', models.BinaryField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Distinct User Rollup',
+                'verbose_name_plural': 'Distinct User Rollups',
+                'db_table': 'analytics_distinct_user_rollups',
+                'indexes': [models.Index(fields=['metric', 'dimension', 'day'], name='analytics_d_metric_fa8e22_idx')],
+                'unique_together': {('metric', 'dimension', 'value', 'day')},
+            },
+        ),
+    ]
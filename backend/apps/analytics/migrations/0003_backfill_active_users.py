@@ -0,0 +1,15 @@
+# Generated by Django 4.2.7 on 2026-10-19 21:40
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    # Used to seed the sketches here, which scanned 90 days of usage inside the
+    # migration transaction. Kept so applied histories stay consistent; run
+    # `manage.py backfill_active_users` after deploying instead.
+
+    dependencies = [
+        ('analytics', '0002_distinctuserrollup'),
+    ]
+
+    operations = []
@@ -0,0 +1,89 @@
+from django.db import models
+
+from apps.vouchers.models import VoucherType
+
+
+class CohortReport(models.Model):
+    """Precomputed cohort matrix, rebuilt nightly"""
+    
+    SIGNUP_RETENTION = 'signup_retention'
+    PURCHASE_CONVERSION = 'purchase_conversion'
+    
+    KIND_CHOICES = [
+        (SIGNUP_RETENTION, 'Signup Retention'),
+        (PURCHASE_CONVERSION, 'Purchase Conversion'),
+    ]
+    
+    kind = models.CharField(max_length=50, choices=KIND_CHOICES)
+    source_type = models.ForeignKey(
+        VoucherType,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='cohort_reports',
+        help_text="Voucher type whose first purchase defines the cohort"
+    )
+    
+    # Row labels are cohort months, columns are month offsets or voucher type codes
+    cohort_labels = models.JSONField(default=list)
+    column_labels = models.JSONField(default=list)
+    cohort_sizes = models.JSONField(default=list)
+    counts = models.JSONField(default=list)
+    rates = models.JSONField(default=list)
+    
+    generated_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        db_table = 'analytics_cohort_reports'
+        verbose_name = 'Cohort Report'
+        verbose_name_plural = 'Cohort Reports'
+        indexes = [
+            models.Index(fields=['kind', 'source_type']),
+        ]
+    
+    def __str__(self):
+        if self.source_type_id:
+            return f"{self.get_kind_display()} - {self.source_type.type_code}"
+        return self.get_kind_display()
+
+
+class DistinctUserRollup(models.Model):
+    """Daily HyperLogLog sketch of distinct users per metric and dimension"""
+    
+    ACTIVE_USERS = 'active_users'
+    ACTIVE_REDEEMERS = 'active_redeemers'
+    
+    METRIC_CHOICES = [
+        (ACTIVE_USERS, 'Active Users'),
+        (ACTIVE_REDEEMERS, 'Active Redeemers'),
+    ]
+    
+    DIMENSION_ALL = 'all'
+    DIMENSION_VOUCHER_TYPE = 'voucher_type'
+    DIMENSION_INSTITUTION = 'institution'
+    
+    DIMENSION_CHOICES = [
+        (DIMENSION_ALL, 'All'),
+        (DIMENSION_VOUCHER_TYPE, 'Voucher Type'),
+        (DIMENSION_INSTITUTION, 'Institution'),
+    ]
+    
+    metric = models.CharField(max_length=50, choices=METRIC_CHOICES)
+    dimension = models.CharField(max_length=50, choices=DIMENSION_CHOICES)
+    value = models.CharField(max_length=255, blank=True)
+    day = models.DateField()
+    sketch = models.BinaryField()
+    
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'analytics_distinct_user_rollups'
+        verbose_name = 'Distinct User Rollup'
+        verbose_name_plural = 'Distinct User Rollups'
+        unique_together = ['metric', 'dimension', 'value', 'day']
+        indexes = [
+            models.Index(fields=['metric', 'dimension', 'day']),
+        ]
+    
+    def __str__(self):
+        return f"{self.metric} {self.dimension}={self.value or '*'} on {self.day}"
@@ -0,0 +1,315 @@
+"""
+Per-endpoint query and latency budgets.
+
+``apps/analytics/tests/test_query_budgets.py`` seeds the test database with
+a realistic fixture (a student with many vouchers, usages, payments and
+refunds among other users), then requests every route in
+``voucher_project.urls`` a few times. Each request runs in a transaction
+that is rolled back, so every iteration sees the same data, and with empty
+caches, so the counts are the cold-cache worst case. The measured query count
+and in-process p95 latency are compared with the checked-in table in
+``query_budgets.json``.
+"""
+
+import json
+import math
+import re
+import time
+from dataclasses import dataclass
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.tokens import default_token_generator
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, URLResolver, get_resolver
+from django.utils import timezone
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from apps.payments.models import Payment, PaymentVoucher, Refund
+from apps.users.models import User, UserProfile
+from apps.vouchers.models import Voucher, VoucherDiscount, VoucherType, VoucherUsage
+from .cohorts import build_cohort_reports
+
+BUDGETS_PATH = settings.BASE_DIR / 'query_budgets.json'
+EXCLUDED_PREFIXES = ('admin/', '^media', '^static')
+PASSWORD = 'Budget-pass-123'
+# Latency budgets written by --update: measured p95 times this, at least the minimum
+LATENCY_HEADROOM = 3
+MIN_LATENCY_BUDGET_MS = 50
+
+
+class Fixture:
+    """Seeded objects the scenarios refer to"""
+
+
+def seed_fixture(users=50, vouchers_per_user=20):
+    now = timezone.now()
+    fx = Fixture()
+    password = make_password(PASSWORD)
+
+    fx.voucher_types = VoucherType.objects.bulk_create([
+        VoucherType(
+            name=label, type_code=code, description=f'{label} voucher',
+            price=Decimal('10.00') + index, usage_limit=1 + index % 2
+        )
+        for index, (code, label) in enumerate(VoucherType.TYPE_CHOICES)
+    ])
+    fx.discount = VoucherDiscount.objects.create(
+        code='BUDGET10', description='10% off', discount_type='percentage',
+        discount_value=Decimal('10'), max_uses=1000,
+        valid_from=now - timedelta(days=30), valid_until=now + timedelta(days=30)
+    )
+    fx.discount.applicable_types.set(fx.voucher_types)
+
+    fx.admin = User.objects.create(
+        username='budget-admin', email='admin@budget.test', password=password,
+        is_staff=True, is_superuser=True
+    )
+    people = User.objects.bulk_create([
+        User(
+            username=f'budget{index}', email=f'student{index}@budget.test', password=password,
+            first_name='Student', last_name=str(index), institution=f'School {index % 5}',
+            date_joined=now - timedelta(days=index * 7), last_login=now - timedelta(days=index % 30)
+        )
+        for index in range(users)
+    ])
+    UserProfile.objects.bulk_create([UserProfile(user=user) for user in people])
+    fx.student = people[0]
+
+    vouchers, payments, links, usages, refunds = [], [], [], [], []
+    for user_index, user in enumerate(people):
+        # The student under test has five times the vouchers of everyone else
+        count = vouchers_per_user * (5 if user_index == 0 else 1)
+        for index in range(count):
+            voucher_type = fx.voucher_types[index % len(fx.voucher_types)]
+            status = ('active', 'used', 'expired', 'active')[index % 4]
+            voucher = Voucher(
+                voucher_type=voucher_type, user=user, code=f'B{user_index:05d}X{index:06d}',
+                status=status, usage_count=voucher_type.usage_limit if status == 'used' else 0,
+                expires_at=now + timedelta(days=-1 if status == 'expired' else 30),
+            )
+            vouchers.append(voucher)
+            if status == 'used':
+                usages.append(VoucherUsage(voucher=voucher, user=user, service_type=voucher_type.type_code))
+            # Every other voucher was bought online, one payment per voucher
+            if index % 2 == 0:
+                payment = Payment(
+                    user=user, amount=voucher_type.price, voucher_type=voucher_type,
+                    status='completed' if index % 10 else 'pending', payment_method='stripe',
+                    stripe_payment_intent_id=f'pi_budget{user_index}x{index}',
+                    completed_at=now - timedelta(days=index % 60) if index % 10 else None,
+                )
+                payments.append(payment)
+                links.append(PaymentVoucher(payment=payment, voucher=voucher))
+                if index % 10 and index % 6 == 0:
+                    refunds.append(Refund(payment=payment, amount=payment.amount, reason='customer_request'))
+
+    Voucher.objects.bulk_create(vouchers, batch_size=1000)
+    VoucherUsage.objects.bulk_create(usages, batch_size=1000)
+    Payment.objects.bulk_create(payments, batch_size=1000)
+    PaymentVoucher.objects.bulk_create(links, batch_size=1000)
+    Refund.objects.bulk_create(refunds, batch_size=1000)
+
+    fx.active_code = Voucher.objects.filter(user=fx.student, status='active').values_list('code', flat=True).first()
+    fx.refundable_payment = Payment.objects.filter(
+        user=fx.student, status='completed', refund__isnull=True
+    ).first()
+    fx.pending_payment = Payment.objects.filter(user=fx.student, status='pending').first()
+
+    call_command('backfill_active_users', days=60, stdout=StringIO())
+    build_cohort_reports()
+    return fx
+
+
+@dataclass
+class Scenario:
+    method: str
+    role: str = 'student'
+    data: object = None
+    kwargs: object = None
+    query: str = ''
+    # Streamed responses: None reads everything, otherwise this many chunks
+    stream_chunks: int = None
+
+
+def _refresh(fx):
+    return {'refresh': str(RefreshToken.for_user(fx.student))}
+
+
+def _reset_confirm(fx):
+    return {
+        'uid': urlsafe_base64_encode(force_bytes(fx.student.pk)),
+        'token': default_token_generator.make_token(fx.student),
+        'password': 'New-budget-pass-456',
+        'password_confirm': 'New-budget-pass-456',
+    }
+
+
+# Keyed by URL name; aliased routes (/api/users/...) share their scenario
+SCENARIOS = {
+    'test': Scenario('GET', role='anonymous'),
+    'health': Scenario('GET', role='anonymous'),
+    'metrics': Scenario('GET', role='anonymous'),
+    'register': Scenario('POST', role='anonymous', data=lambda fx: {
+        'username': 'newstudent', 'email': 'new@budget.test', 'password': PASSWORD,
+        'password_confirm': PASSWORD, 'first_name': 'New', 'last_name': 'Student',
+    }),
+    'login': Scenario('POST', role='anonymous', data=lambda fx: {'email': fx.student.email, 'password': PASSWORD}),
+    'logout': Scenario('POST', data=_refresh),
+    'token_obtain_pair': Scenario('POST', role='anonymous', data=lambda fx: {'email': fx.student.email, 'password': PASSWORD}),
+    'token_refresh': Scenario('POST', role='anonymous', data=_refresh),
+    'password_reset_request': Scenario('POST', role='anonymous', data=lambda fx: {'email': fx.student.email}),
+    'password_reset_confirm': Scenario('POST', role='anonymous', data=_reset_confirm),
+    'voucher-types': Scenario('GET', role='anonymous'),
+    'user-vouchers': Scenario('GET'),
+    'purchase-voucher': Scenario('POST', data=lambda fx: {
+        'voucher_type_id': fx.voucher_types[0].pk, 'quantity': 3, 'discount_code': fx.discount.code,
+    }),
+    'redeem-voucher': Scenario('POST', data=lambda fx: {'code': fx.active_code, 'service_type': 'result_check'}),
+    'voucher-detail': Scenario('GET', kwargs=lambda fx: {'code': fx.active_code}),
+    'user-voucher-stats': Scenario('GET'),
+    'voucher-usage-history': Scenario('GET'),
+    'payment-history': Scenario('GET'),
+    # Stripe is not configured during the run, so these stop at the Stripe call
+    'create-payment-intent': Scenario('POST', data=lambda fx: {'voucher_type_id': fx.voucher_types[0].pk, 'quantity': 2}),
+    'confirm-payment': Scenario('POST', data=lambda fx: {'payment_intent_id': fx.pending_payment.stripe_payment_intent_id}),
+    'request-refund': Scenario('POST', data=lambda fx: {'payment_id': str(fx.refundable_payment.pk), 'reason': 'other'}),
+    'user-refunds': Scenario('GET'),
+    'admin-dashboard': Scenario('GET', role='admin'),
+    'user-analytics': Scenario('GET'),
+    'revenue-analytics': Scenario('GET', role='admin'),
+    'active-user-analytics': Scenario('GET', role='admin', query='start=2020-01-01'),
+    'live-metrics': Scenario('GET', role='admin'),
+    'live-metrics-stream': Scenario('GET', role='admin', stream_chunks=2),
+    'throttle-stats': Scenario('GET', role='admin'),
+    'cohort-reports': Scenario('GET', role='admin'),
+    'export-data': Scenario('GET', role='admin', kwargs=lambda fx: {'dataset': 'vouchers'}),
+    'user-profile': Scenario('GET'),
+    'update-user-profile': Scenario('PATCH', data=lambda fx: {'first_name': 'Budget'}),
+    'user-profile-extended': Scenario('GET'),
+    'change-password': Scenario('POST', data=lambda fx: {
+        'old_password': PASSWORD, 'new_password': 'New-budget-pass-456', 'confirm_password': 'New-budget-pass-456',
+    }),
+    # The dashboard page load
+    'batch': Scenario('POST', data=lambda fx: {'requests': [
+        {'path': path} for path in (
+            '/api/vouchers/stats/', '/api/vouchers/my-vouchers/', '/api/analytics/user/',
+            '/api/payments/history/', '/api/users/profile/',
+        )
+    ]}),
+}
+
+
+def iter_routes(patterns=None, prefix=''):
+    """(route, url name) for every endpoint, admin and static files excluded"""
+    if patterns is None:
+        patterns = get_resolver().url_patterns
+    for pattern in patterns:
+        route = prefix + str(pattern.pattern)
+        if route.startswith(EXCLUDED_PREFIXES):
+            continue
+        if isinstance(pattern, URLResolver):
+            yield from iter_routes(pattern.url_patterns, route)
+        elif isinstance(pattern, URLPattern):
+            yield route, pattern.name
+
+
+def _path(route, kwargs):
+    return '/' + re.sub(r'<(?:\w+:)?(\w+)>', lambda match: str(kwargs[match.group(1)]), route)
+
+
+def _p95(values):
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(len(ordered) * 0.95) - 1)]
+
+
+@dataclass
+class Measurement:
+    key: str
+    status: int
+    queries: int
+    p95_ms: float
+    sql: list
+
+
+class BudgetRunner:
+    def __init__(self, fx, iterations=10):
+        self.fx = fx
+        self.iterations = iterations
+        self.tokens = {
+            'student': str(RefreshToken.for_user(fx.student).access_token),
+            'admin': str(RefreshToken.for_user(fx.admin).access_token),
+        }
+        self.client = Client(raise_request_exception=False)
+
+    def _request(self, scenario, path):
+        headers = {}
+        if scenario.role in self.tokens:
+            headers['HTTP_AUTHORIZATION'] = f'Bearer {self.tokens[scenario.role]}'
+        if scenario.query:
+            path = f'{path}?{scenario.query}'
+        if scenario.method == 'GET':
+            return self.client.get(path, **headers)
+        data = scenario.data(self.fx) if scenario.data else {}
+        return self.client.generic(
+            scenario.method, path, json.dumps(data), content_type='application/json', **headers
+        )
+
+    def measure(self, route, scenario):
+        path = _path(route, scenario.kwargs(self.fx) if scenario.kwargs else {})
+        durations, queries = [], []
+        # The first request warms up URL, template and connection state and is not timed
+        for iteration in range(self.iterations + 1):
+            cache.clear()
+            with transaction.atomic():
+                with CaptureQueriesContext(connection) as captured:
+                    start = time.perf_counter()
+                    response = self._request(scenario, path)
+                    if response.streaming:
+                        for index, _chunk in enumerate(response.streaming_content, start=1):
+                            if scenario.stream_chunks and index >= scenario.stream_chunks:
+                                break
+                        response.close()
+                    elapsed = time.perf_counter() - start
+                transaction.set_rollback(True)
+            if iteration:
+                durations.append(elapsed)
+            queries.append(captured)
+        worst = max(queries, key=len)
+        return Measurement(
+            key=f'{scenario.method} /{route}',
+            status=response.status_code,
+            queries=len(worst),
+            p95_ms=round(_p95(durations) * 1000, 1),
+            sql=[query['sql'] for query in worst.captured_queries],
+        )
+
+
+def load_budgets(path=BUDGETS_PATH):
+    try:
+        with open(path) as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return {}
+
+
+def save_budgets(measurements, path=BUDGETS_PATH, existing=None):
+    budgets = dict(existing or {})
+    for m in measurements:
+        budgets[m.key] = {
+            'queries': m.queries,
+            'p95_ms': math.ceil(max(m.p95_ms * LATENCY_HEADROOM, MIN_LATENCY_BUDGET_MS)),
+        }
+    with open(path, 'w') as file:
+        json.dump(dict(sorted(budgets.items())), file, indent=2)
+        file.write('\n')
+
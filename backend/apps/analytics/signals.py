@@ -0,0 +1,44 @@
+from django.contrib.auth.signals import user_logged_in
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from apps.payments.models import Payment
+from apps.vouchers.models import Voucher, VoucherUsage
+from . import live
+from .active_users import login_dimensions, record_distinct_user, redemption_dimensions
+from .models import DistinctUserRollup
+from .user_analytics import invalidate_user_analytics
+
+
+@receiver(user_logged_in)
+def track_active_user(sender, request, user, **kwargs):
+    """Count the user towards today's active users"""
+    dimensions = login_dimensions(user)
+    transaction.on_commit(
+        lambda: record_distinct_user(DistinctUserRollup.ACTIVE_USERS, user.pk, dimensions)
+    )
+
+
+@receiver(post_save, sender=VoucherUsage)
+def track_active_redeemer(sender, instance, created, **kwargs):
+    """Count the user towards today's active redeemers"""
+    if created:
+        dimensions = redemption_dimensions(instance.user, instance.voucher)
+        transaction.on_commit(
+            lambda: record_distinct_user(
+                DistinctUserRollup.ACTIVE_REDEEMERS, instance.user_id, dimensions, day=instance.used_at.date()
+            )
+        )
+        transaction.on_commit(
+            lambda: live.record_redemption(instance.voucher.voucher_type.type_code)
+        )
+
+
+@receiver([post_save, post_delete], sender=Voucher)
+@receiver([post_save, post_delete], sender=VoucherUsage)
+@receiver([post_save, post_delete], sender=Payment)
+def invalidate_cached_user_analytics(sender, instance, **kwargs):
+    """Drop the owner's cached analytics once the change is committed"""
+    user_id = instance.user_id
+    transaction.on_commit(lambda: invalidate_user_analytics(user_id))
@@ -0,0 +1,16 @@
+from celery import shared_task
+
+from .active_users import flush_distinct_users
+from .cohorts import build_cohort_reports
+
+
+@shared_task(ignore_result=True)
+def rebuild_cohort_reports():
+    """Nightly rebuild of the signup and purchase cohort matrices"""
+    build_cohort_reports()
+
+
+@shared_task(ignore_result=True)
+def flush_active_users():
+    """Fold the users queued by logins and redemptions into the daily sketches"""
+    flush_distinct_users()
@@ -0,0 +1,90 @@
+"""
+Query and p95 latency budgets for every API route (apps/analytics/query_budgets.py).
+
+One test per route in voucher_project.urls, against the budget for it in
+query_budgets.json. To accept the numbers after an intended change:
+
+    UPDATE_QUERY_BUDGETS=1 python manage.py test apps.analytics.tests.test_query_budgets
+"""
+
+import logging
+import os
+import re
+
+import stripe
+from django.test import TestCase, override_settings
+
+from apps.analytics.query_budgets import BUDGETS_PATH, SCENARIOS, BudgetRunner, iter_routes, load_budgets, save_budgets, seed_fixture
+
+BUDGETS = load_budgets()
+UPDATE = os.environ.get('UPDATE_QUERY_BUDGETS') == '1'
+
+
+# Isolate the run from shared state: no Redis cache entries, no throttling,
+# no per-process principal cache, no metrics snapshots
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+    THROTTLING_ENABLED=False,
+    AUTH_PRINCIPAL_LOCAL_SECONDS=0,
+    METRICS_MULTIPROC_DIR='',
+)
+class QueryBudgetTests(TestCase):
+    databases = '__all__'
+    measurements = []
+
+    @classmethod
+    def setUpClass(cls):
+        # No Stripe calls; those routes stop at the Stripe request
+        cls._stripe_api_key, stripe.api_key = stripe.api_key, None
+        # Expected 500s from the Stripe routes would drown the output
+        cls._request_logger = logging.getLogger('django.request')
+        cls._log_level = cls._request_logger.level
+        cls._request_logger.setLevel(logging.CRITICAL)
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        stripe.api_key = cls._stripe_api_key
+        cls._request_logger.setLevel(cls._log_level)
+        if UPDATE and cls.measurements:
+            save_budgets(cls.measurements, BUDGETS_PATH, existing=load_budgets())
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.fx = seed_fixture()
+
+    def check_route(self, route, name):
+        scenario = SCENARIOS.get(name)
+        if scenario is None:
+            self.fail(f'/{route} ({name}) has no scenario in apps/analytics/query_budgets.py')
+
+        m = BudgetRunner(self.fx).measure(route, scenario)
+        if UPDATE:
+            self.measurements.append(m)
+            return
+        budget = BUDGETS.get(m.key)
+        if budget is None:
+            self.fail(f'{m.key} has no budget in query_budgets.json: {m.queries} queries, p95 {m.p95_ms}ms')
+        sql = '\n'.join(f'  {query}' for query in m.sql)
+        self.assertLessEqual(
+            m.queries, budget['queries'],
+            f'{m.key} made {m.queries} queries (status {m.status}), budget {budget["queries"]}:\n{sql}'
+        )
+        self.assertLessEqual(
+            m.p95_ms, budget['p95_ms'], f'{m.key} p95 {m.p95_ms}ms, budget {budget["p95_ms"]}ms'
+        )
+
+
+def _add_route_tests():
+    for route, name in iter_routes():
+        scenario = SCENARIOS.get(name)
+        method = scenario.method if scenario else 'any'
+        test_name = 'test_' + re.sub(r'\W+', '_', f'{method} {route}').strip('_').lower()
+        setattr(
+            QueryBudgetTests, test_name,
+            lambda self, route=route, name=name: self.check_route(route, name)
+        )
+
+
+_add_route_tests()
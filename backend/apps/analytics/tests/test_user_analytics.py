@@ -0,0 +1,60 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils import timezone
+
+from apps.analytics.user_analytics import build_user_analytics, cache_key, get_user_analytics
+from apps.payments.models import Payment, PaymentVoucher
+from apps.users.models import User
+from apps.vouchers.models import Voucher, VoucherType, VoucherUsage
+
+
+class UserAnalyticsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='analytics@example.test', username='analytics', password='pass', first_name='A', last_name='User'
+        )
+        cls.voucher_type = VoucherType.objects.create(
+            name='Result Check', type_code=VoucherType.RESULT_CHECK, description='', price=Decimal('10.00')
+        )
+        expires_at = timezone.now() + timedelta(days=30)
+        # Three vouchers from one payment of 3 x 10.00 with 5.00 off, and one unpaid voucher
+        payment = Payment.objects.create(
+            user=cls.user, amount=Decimal('10.00'), quantity=3, status='completed', payment_method='stripe',
+            voucher_type=cls.voucher_type, discount_amount=Decimal('5.00')
+        )
+        for code in ('PAID1', 'PAID2', 'PAID3'):
+            voucher = Voucher.objects.create(
+                voucher_type=cls.voucher_type, user=cls.user, code=code, expires_at=expires_at
+            )
+            PaymentVoucher.objects.create(payment=payment, voucher=voucher)
+        unpaid = Voucher.objects.create(
+            voucher_type=cls.voucher_type, user=cls.user, code='UNPAID', status='used', expires_at=expires_at
+        )
+        VoucherUsage.objects.create(voucher=unpaid, user=cls.user, service_type='result_check')
+
+    def setUp(self):
+        cache.delete(cache_key(self.user.pk))
+
+    def test_payload_takes_four_queries(self):
+        with self.assertNumQueries(4):
+            data = build_user_analytics(self.user)
+
+        self.assertEqual(data['voucher_summary'], {'total': 4, 'active': 3, 'used': 1, 'expired': 0})
+        self.assertEqual(data['usage_by_type'][0]['usage_count'], 1)
+        self.assertEqual(len(data['recent_vouchers']), 4)
+        self.assertEqual(len(data['recent_usage']), 1)
+
+    def test_spending_is_a_decimal_string(self):
+        data = build_user_analytics(self.user)
+
+        self.assertEqual(data['spending'], {'total': '25.00', 'average_per_voucher': '8.33'})
+
+    def test_cached_payload_takes_no_queries(self):
+        get_user_analytics(self.user)
+
+        with self.assertNumQueries(0):
+            get_user_analytics(self.user)
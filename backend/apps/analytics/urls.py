@@ -5,4 +5,10 @@ urlpatterns = [
     path('dashboard/', views.admin_dashboard_stats, name='admin-dashboard'),
     path('user/', views.user_analytics, name='user-analytics'),
     path('revenue/', views.revenue_analytics, name='revenue-analytics'),
+    path('active-users/', views.active_user_analytics, name='active-user-analytics'),
+    path('live/', views.live_metrics, name='live-metrics'),
+    path('live/stream/', views.live_metrics_stream, name='live-metrics-stream'),
+    path('throttles/', views.throttle_stats, name='throttle-stats'),
+    path('cohorts/', views.cohort_reports, name='cohort-reports'),
+    path('export/<str:dataset>/', views.export_data, name='export-data'),
 ]
@@ -0,0 +1,117 @@
+"""
+Per-user analytics payload.
+
+Voucher counts and spending come from one conditional aggregation over the
+user's vouchers; spending is attributed per voucher through its payment link
+as ``amount - discount_amount / quantity``, so quantity and discounts are
+honoured, and returned as a two-place decimal string like every other amount
+in the API. Usage per voucher type stays a separate GROUP BY: it counts the
+user's redemptions, which need not be of their own vouchers, and joining them
+into the voucher aggregate would multiply its rows. The payload is cached per
+user and dropped whenever the user's vouchers, redemptions or payments change.
+"""
+
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, DecimalField, F, FloatField, Q, Sum
+from django.db.models.functions import Cast
+
+from apps.vouchers.models import Voucher, VoucherUsage
+
+CACHE_KEY = 'analytics:user:{user_id}'
+CENTS = Decimal('0.01')
+
+
+def cache_key(user_id):
+    return CACHE_KEY.format(user_id=user_id)
+
+
+def invalidate_user_analytics(user_id):
+    cache.delete(cache_key(user_id))
+
+
+def build_user_analytics(user):
+    """Compute the payload in four queries: one aggregate, one group-by and two slices"""
+    paid = Q(payment_record__payment__status='completed')
+    # Each voucher carries its share of the payment's discount; the float cast
+    # keeps SQLite from doing integer division on whole-number discounts, and
+    # the sum is cast back to a decimal
+    quantity = Cast('payment_record__payment__quantity', FloatField())
+    summary = Voucher.objects.filter(user=user).aggregate(
+        total=Count('id'),
+        active=Count('id', filter=Q(status='active')),
+        used=Count('id', filter=Q(status='used')),
+        expired=Count('id', filter=Q(status='expired')),
+        paid_vouchers=Count('id', filter=paid),
+        total_spent=Cast(
+            Sum(
+                F('payment_record__payment__amount')
+                - F('payment_record__payment__discount_amount') / quantity,
+                filter=paid,
+                output_field=FloatField()
+            ),
+            DecimalField(max_digits=12, decimal_places=2)
+        ),
+    )
+    total_spent = (summary['total_spent'] or Decimal('0')).quantize(CENTS)
+    paid_vouchers = summary['paid_vouchers']
+    average_spent = (total_spent / paid_vouchers).quantize(CENTS) if paid_vouchers > 0 else Decimal('0.00')
+    
+    usage_by_type = VoucherUsage.objects.filter(
+        user=user
+    ).values(
+        'voucher__voucher_type__name',
+        'voucher__voucher_type__type_code'
+    ).annotate(
+        usage_count=Count('id')
+    ).order_by('-usage_count')
+    
+    recent_vouchers = Voucher.objects.filter(
+        user=user
+    ).select_related('voucher_type').order_by('-issued_at')[:5]
+    recent_usage = VoucherUsage.objects.filter(
+        user=user
+    ).select_related('voucher').order_by('-used_at')[:5]
+    
+    return {
+        'voucher_summary': {
+            'total': summary['total'],
+            'active': summary['active'],
+            'used': summary['used'],
+            'expired': summary['expired']
+        },
+        'spending': {
+            'total': str(total_spent),
+            'average_per_voucher': str(average_spent)
+        },
+        'usage_by_type': list(usage_by_type),
+        'recent_vouchers': [
+            {
+                'code': voucher.code,
+                'type': voucher.voucher_type.name,
+                'status': voucher.status,
+                'issued_at': voucher.issued_at,
+                'expires_at': voucher.expires_at
+            }
+            for voucher in recent_vouchers
+        ],
+        'recent_usage': [
+            {
+                'voucher_code': usage.voucher.code,
+                'service_type': usage.service_type,
+                'used_at': usage.used_at
+            }
+            for usage in recent_usage
+        ]
+    }
+
+
+def get_user_analytics(user):
+    key = cache_key(user.pk)
+    data = cache.get(key)
+    if data is None:
+        data = build_user_analytics(user)
+        cache.set(key, data, settings.USER_ANALYTICS_CACHE_SECONDS)
+    return data
@@ -1,17 +1,31 @@
-from rest_framework import permissions
+from rest_framework import permissions, status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
-from django.db.models import Sum, Count, Avg, Q
+from django.db.models import Sum, Count, Avg, Q, OuterRef, Subquery
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
 from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
 from datetime import timedelta
+import json
+import time
 
 from apps.vouchers.models import Voucher, VoucherType, VoucherUsage
 from apps.payments.models import Payment
 from apps.users.models import User
+from . import live
+from .models import CohortReport, DistinctUserRollup
+from .active_users import distinct_users, distinct_users_by_value, rolling_distinct_users
+from .exports import CONTENT_TYPES, FILE_EXTENSIONS, STREAMING_FORMATS, available_formats, get_dataset, stream_dataset
+from .user_analytics import get_user_analytics
+from voucher_project import throttling
+from voucher_project.db_router import replica_reads, replica_stream
 
 
 @api_view(['GET'])
 @permission_classes([permissions.IsAdminUser])
+@replica_reads
 def admin_dashboard_stats(request):
     """Get comprehensive dashboard statistics for admin"""
     
@@ -23,7 +37,7 @@ def admin_dashboard_stats(request):
     # User statistics
     total_users = User.objects.count()
     new_users_week = User.objects.filter(date_joined__date__gte=week_ago).count()
-    active_users_month = User.objects.filter(last_login__date__gte=month_ago).count()
+    active_users_month = distinct_users(DistinctUserRollup.ACTIVE_USERS, month_ago, today)
     
     # Voucher statistics
     total_vouchers = Voucher.objects.count()
@@ -50,11 +64,16 @@ def admin_dashboard_stats(request):
         completed_at__date__gte=month_ago
     ).aggregate(total=Sum('amount'))['total'] or 0
     
-    # Voucher type popularity
+    # Voucher type popularity; revenue comes from a subquery so the usage
+    # join cannot multiply it
+    revenue_by_type = Payment.objects.filter(
+        voucher_type=OuterRef('pk'),
+        status='completed'
+    ).values('voucher_type').annotate(total=Sum('amount')).values('total')
     voucher_type_stats = VoucherType.objects.annotate(
-        total_purchased=Count('voucher'),
-        total_used=Count('voucher__usage_history'),
-        total_revenue=Sum('voucher__payment_record__amount')
+        total_purchased=Count('vouchers', distinct=True),
+        total_used=Count('vouchers__usage_history', distinct=True),
+        total_revenue=Subquery(revenue_by_type)
     ).order_by('-total_purchased')
     
     voucher_types_data = []
@@ -106,74 +125,12 @@ def admin_dashboard_stats(request):
 def user_analytics(request):
     """Get analytics for the current user"""
     
-    user = request.user
-    
-    # User's voucher statistics
-    user_vouchers = Voucher.objects.filter(user=user)
-    total_vouchers = user_vouchers.count()
-    active_vouchers = user_vouchers.filter(status='active').count()
-    used_vouchers = user_vouchers.filter(status='used').count()
-    expired_vouchers = user_vouchers.filter(status='expired').count()
-    
-    # User's spending
-    total_spent = Payment.objects.filter(
-        user=user,
-        status='completed'
-    ).aggregate(total=Sum('amount'))['total'] or 0
-    
-    # Usage by voucher type
-    usage_by_type = VoucherUsage.objects.filter(
-        user=user
-    ).values(
-        'voucher__voucher_type__name',
-        'voucher__voucher_type__type_code'
-    ).annotate(
-        usage_count=Count('id')
-    ).order_by('-usage_count')
-    
-    # Recent activity
-    recent_vouchers = user_vouchers.order_by('-issued_at')[:5]
-    recent_usage = VoucherUsage.objects.filter(
-        user=user
-    ).select_related('voucher').order_by('-used_at')[:5]
-    
-    recent_vouchers_data = []
-    for voucher in recent_vouchers:
-        recent_vouchers_data.append({
-            'code': voucher.code,
-            'type': voucher.voucher_type.name,
-            'status': voucher.status,
-            'issued_at': voucher.issued_at,
-            'expires_at': voucher.expires_at
-        })
-    
-    recent_usage_data = []
-    for usage in recent_usage:
-        recent_usage_data.append({
-            'voucher_code': usage.voucher.code,
-            'service_type': usage.service_type,
-            'used_at': usage.used_at
-        })
-    
-    return Response({
-        'voucher_summary': {
-            'total': total_vouchers,
-            'active': active_vouchers,
-            'used': used_vouchers,
-            'expired': expired_vouchers
-        },
-        'spending': {
-            'total': float(total_spent),
-            'average_per_voucher': float(total_spent / total_vouchers) if total_vouchers > 0 else 0
-        },
-        'usage_by_type': list(usage_by_type),
-        'recent_vouchers': recent_vouchers_data,
-        'recent_usage': recent_usage_data
-    })
+    return Response(get_user_analytics(request.user))
 
 
 @api_view(['GET'])
 @permission_classes([permissions.IsAdminUser])
+@replica_reads
 def revenue_analytics(request):
     """Get detailed revenue analytics"""
     
@@ -230,3 +187,170 @@ def revenue_analytics(request):
             'average_daily_revenue': sum(item['revenue'] for item in daily_revenue) / days if days > 0 else 0
         }
     })
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+def export_data(request, dataset):
+    """Stream a dataset export as CSV or Arrow IPC"""
+    
+    try:
+        export = get_dataset(dataset)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_404_NOT_FOUND)
+    
+    # `format` is reserved by DRF content negotiation
+    fmt = request.query_params.get('file_format', 'csv')
+    if fmt not in STREAMING_FORMATS or fmt not in available_formats():
+        return Response({
+            'error': f"Unsupported format '{fmt}'",
+            'supported_formats': [f for f in STREAMING_FORMATS if f in available_formats()]
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    since = None
+    if request.query_params.get('since'):
+        since = parse_datetime(request.query_params['since'])
+        if since is None:
+            return Response({'error': 'Invalid since timestamp'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    response = StreamingHttpResponse(
+        # Rows are read while the response streams, after the view has returned
+        replica_stream(stream_dataset(export, fmt, since=since)),
+        content_type=CONTENT_TYPES[fmt]
+    )
+    response['Content-Disposition'] = f'attachment; filename="{export.name}.{FILE_EXTENSIONS[fmt]}"'
+    return response
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+@replica_reads
+def cohort_reports(request):
+    """Get the precomputed signup retention and purchase conversion cohorts"""
+    
+    reports = CohortReport.objects.select_related('source_type').order_by('kind', 'source_type__type_code')
+    
+    kind = request.query_params.get('kind')
+    if kind:
+        reports = reports.filter(kind=kind)
+    
+    source = request.query_params.get('source')
+    if source:
+        reports = reports.filter(source_type__type_code=source)
+    
+    return Response({
+        'reports': [
+            {
+                'kind': report.kind,
+                'source_type': report.source_type.type_code if report.source_type else None,
+                'cohort_labels': report.cohort_labels,
+                'column_labels': report.column_labels,
+                'cohort_sizes': report.cohort_sizes,
+                'counts': report.counts,
+                'rates': report.rates,
+                'generated_at': report.generated_at
+            }
+            for report in reports
+        ]
+    })
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+@replica_reads
+def active_user_analytics(request):
+    """Get approximate daily, weekly and monthly distinct users per dimension"""
+    
+    metric = request.query_params.get('metric', DistinctUserRollup.ACTIVE_REDEEMERS)
+    dimension = request.query_params.get('dimension', DistinctUserRollup.DIMENSION_ALL)
+    
+    if metric not in dict(DistinctUserRollup.METRIC_CHOICES):
+        return Response({'error': f"Unknown metric '{metric}'"}, status=status.HTTP_400_BAD_REQUEST)
+    if dimension not in dict(DistinctUserRollup.DIMENSION_CHOICES):
+        return Response({'error': f"Unknown dimension '{dimension}'"}, status=status.HTTP_400_BAD_REQUEST)
+    
+    today = timezone.now().date()
+    data = {
+        'metric': metric,
+        'dimension': dimension,
+        'as_of': today,
+        'values': [
+            {'value': value, **counts}
+            for value, counts in sorted(rolling_distinct_users(metric, dimension, today).items())
+        ]
+    }
+    
+    # Optional arbitrary window, e.g. ?start=2025-01-01&end=2025-03-31
+    start = request.query_params.get('start')
+    end = request.query_params.get('end')
+    if start or end:
+        start_date = parse_date(start) if start else today - timedelta(days=29)
+        end_date = parse_date(end) if end else today
+        if start_date is None or end_date is None or start_date > end_date:
+            return Response({'error': 'Invalid start/end dates'}, status=status.HTTP_400_BAD_REQUEST)
+        data['window'] = {
+            'start': start_date,
+            'end': end_date,
+            'values': distinct_users_by_value(metric, dimension, start_date, end_date)
+        }
+    
+    return Response(data)
+
+
+def _live_params(request):
+    minutes = int(request.query_params.get('minutes', 60))
+    by_voucher_type = request.query_params.get('by_voucher_type') in ('1', 'true')
+    return minutes, by_voucher_type
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+def live_metrics(request):
+    """Get per-minute redemption and sales counts for the last N minutes"""
+    
+    try:
+        minutes, by_voucher_type = _live_params(request)
+    except ValueError:
+        return Response({'error': 'minutes must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    try:
+        return Response(live.get_live_series(minutes, by_voucher_type=by_voucher_type))
+    except live.LiveMetricsUnavailable:
+        return Response({'error': 'Live metrics are unavailable'}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+def throttle_stats(request):
+    """Get blocked request counts per rate limit scope"""
+    
+    return Response(throttling.blocked_counts())
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+def live_metrics_stream(request):
+    """Server-sent events stream of the live counters"""
+    
+    try:
+        minutes, by_voucher_type = _live_params(request)
+        interval = max(1, int(request.query_params.get('interval', 5)))
+    except ValueError:
+        return Response({'error': 'minutes and interval must be integers'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    def events():
+        # Bounded so a sync worker is not held forever; EventSource clients reconnect
+        deadline = time.monotonic() + settings.LIVE_STREAM_MAX_SECONDS
+        yield f'retry: {interval * 1000}\n\n'
+        while time.monotonic() < deadline:
+            try:
+                data = live.get_live_series(minutes, by_voucher_type=by_voucher_type)
+                yield f'data: {json.dumps(data, cls=DjangoJSONEncoder)}\n\n'
+            except live.LiveMetricsUnavailable:
+                yield 'event: unavailable\ndata: {}\n\n'
+            time.sleep(interval)
+    
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -0,0 +1,122 @@
+"""
+Async versions of the credential endpoints, routed instead of the DRF views
+when ASYNC_VIEWS is enabled (the default under SERVER_MODE=asgi).
+
+Password hashing is awaited on the hashing pool, so a login burst holds no
+event loop or sync worker thread while PBKDF2 runs. Responses match the DRF
+views they replace.
+"""
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.contrib.auth.signals import user_logged_in
+from rest_framework import status
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from apps.notifications.emails import queue_password_reset
+from apps.users.serializers import UserSerializer
+from voucher_project.async_api import async_api_view, json_response
+from voucher_project.throttling import LOGIN_THROTTLES, PASSWORD_RESET_THROTTLES, REGISTER_THROTTLES
+from . import hashing
+from .serializers import (
+    CustomTokenObtainPairSerializer, LoginCredentialsSerializer, PasswordResetRequestSerializer,
+    UserRegistrationSerializer
+)
+
+User = get_user_model()
+
+
+async def _authenticate(request):
+    """Return (user, None) or (None, error response)"""
+    credentials = LoginCredentialsSerializer(data=request.data)
+    if not credentials.is_valid():
+        return None, json_response(credentials.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    user = await hashing.aauthenticate(
+        request, credentials.validated_data['email'], credentials.validated_data['password']
+    )
+    if user is not None:
+        await sync_to_async(user_logged_in.send)(sender=user.__class__, request=request, user=user)
+    return user, None
+
+
+@async_api_view(['POST'], throttle_classes=LOGIN_THROTTLES)
+async def login_view(request):
+    """User login endpoint"""
+    user, error = await _authenticate(request)
+    if error is not None:
+        return error
+    if user is None:
+        return json_response(
+            {'non_field_errors': ['Invalid credentials.']}, status=status.HTTP_400_BAD_REQUEST
+        )
+
+    refresh = RefreshToken.for_user(user)
+    user_data = await sync_to_async(lambda: UserSerializer(user).data)()
+    return json_response({
+        'user': user_data,
+        'refresh': str(refresh),
+        'access': str(refresh.access_token),
+        'message': 'Login successful'
+    })
+
+
+@async_api_view(['POST'], throttle_classes=LOGIN_THROTTLES)
+async def token_obtain_pair(request):
+    """Obtain a JWT pair with the custom claims"""
+    user, error = await _authenticate(request)
+    if error is not None:
+        return error
+    if user is None:
+        raise AuthenticationFailed(
+            CustomTokenObtainPairSerializer.default_error_messages['no_active_account'],
+            'no_active_account'
+        )
+
+    refresh = CustomTokenObtainPairSerializer.get_token(user)
+    return json_response({
+        'refresh': str(refresh),
+        'access': str(refresh.access_token),
+    })
+
+
+@async_api_view(['POST'], throttle_classes=REGISTER_THROTTLES)
+async def register_view(request):
+    """User registration endpoint"""
+    serializer = UserRegistrationSerializer(data=request.data)
+    if not await sync_to_async(serializer.is_valid)():
+        return json_response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    encoded_password = await hashing.amake_password(serializer.validated_data['password'])
+    user = await sync_to_async(serializer.save)(encoded_password=encoded_password)
+
+    refresh = RefreshToken.for_user(user)
+    user_data = await sync_to_async(lambda: UserSerializer(user).data)()
+    return json_response({
+        'user': user_data,
+        'refresh': str(refresh),
+        'access': str(refresh.access_token),
+        'message': 'User registered successfully'
+    }, status=status.HTTP_201_CREATED)
+
+
+@async_api_view(['POST'], throttle_classes=PASSWORD_RESET_THROTTLES)
+async def password_reset_request(request):
+    """Request password reset"""
+    serializer = PasswordResetRequestSerializer(data=request.data)
+    if not await sync_to_async(serializer.is_valid)():
+        return json_response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        user = await User.objects.aget(email=serializer.validated_data['email'])
+    except User.DoesNotExist:
+        return json_response(
+            {'error': 'User with this email does not exist.'}, status=status.HTTP_400_BAD_REQUEST
+        )
+
+    # Sent by the notifications worker once this request commits; the reset
+    # link is made then, so the token is never stored
+    await sync_to_async(queue_password_reset)(user)
+
+    return json_response({'message': 'Password reset email sent successfully'})
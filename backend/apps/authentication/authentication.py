@@ -0,0 +1,112 @@
+"""
+JWT authentication with a cached, lightweight user principal.
+
+The access token identifies the user; the attributes needed for permission
+checks and ownership filters come from the cache instead of a query on the
+wide ``users`` row for every request. The ``auth:principal:`` prefix is also
+kept in each process's local tier for AUTH_PRINCIPAL_LOCAL_SECONDS (see
+voucher_project/cache.py), so most requests do not reach Redis either.
+
+The principal is a real ``User`` instance with only ``PRINCIPAL_FIELDS``
+loaded. Other fields are deferred and fetched on first access, so views that
+need the full profile should load it explicitly.
+
+Cached entries are dropped when a user is saved or deleted (see
+``signals.py``). Bulk ``QuerySet.update()`` calls bypass signals and must call
+``invalidate_principal`` themselves.
+"""
+
+import logging
+
+import redis
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+logger = logging.getLogger('voucher_app')
+
+User = get_user_model()
+
+PRINCIPAL_FIELDS = (
+    'id', 'email', 'username', 'first_name', 'last_name',
+    'is_active', 'is_staff', 'is_superuser', 'is_verified', 'institution',
+)
+CACHE_KEY = 'auth:principal:v1:{user_id}'
+
+# Model.from_db expects the loaded fields in model order
+_FIELDS = tuple(
+    field.attname for field in User._meta.concrete_fields
+    if field.attname in PRINCIPAL_FIELDS
+)
+
+
+def _cache_key(user_id):
+    return CACHE_KEY.format(user_id=user_id)
+
+
+def _load_values(user_id):
+    """Principal field values for a user, or None if the user does not exist"""
+    key = _cache_key(user_id)
+    try:
+        values = cache.get(key)
+    except redis.RedisError as e:
+        logger.warning(f'Principal cache read failed: {e}')
+        values = key = None
+
+    if values is None:
+        values = User.objects.filter(pk=user_id).values_list(*_FIELDS).first()
+        if values is None:
+            return None
+        if key is not None:
+            try:
+                cache.set(key, values, settings.AUTH_PRINCIPAL_CACHE_SECONDS)
+            except redis.RedisError as e:
+                logger.warning(f'Principal cache write failed: {e}')
+
+    return tuple(values)
+
+
+def get_principal(user_id):
+    """Return a partially loaded User for ``user_id``, or None"""
+    values = _load_values(user_id)
+    if values is None:
+        return None
+    return User.from_db(DEFAULT_DB_ALIAS, _FIELDS, values)
+
+
+def invalidate_principal(user_id):
+    """Forget the cached principal, in every process"""
+    try:
+        cache.delete(_cache_key(user_id))
+    except redis.RedisError as e:
+        logger.warning(f'Principal cache invalidation failed: {e}')
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication that resolves the user through the principal cache"""
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        try:
+            user_id = User._meta.pk.to_python(user_id)
+        except ValidationError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        user = get_principal(user_id)
+        if user is None:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+
+        if not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        return user
@@ -0,0 +1,111 @@
+"""
+Refresh token revocation stored in Redis.
+
+A revoked token's JTI is kept under ``auth:revoked:<jti>`` with a TTL equal to
+the token's remaining lifetime, so entries disappear on their own once the
+token could no longer be used anyway and there is no table to clean up.
+
+Recently revoked JTIs are also remembered in a small per-process LRU, so
+replays of a token this process has already seen revoked are rejected
+without a Redis round-trip. Misses always ask Redis, which is the source of
+truth shared by every worker.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+import redis
+from django.conf import settings
+from django.utils.translation import gettext_lazy as _
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework_simplejwt.settings import api_settings
+
+from voucher_project.redis_client import get_redis
+
+KEY_PREFIX = 'auth:revoked'
+
+
+class RevocationStoreUnavailable(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = _('Token service temporarily unavailable, try again shortly.')
+    default_code = 'revocation_store_unavailable'
+
+
+class _RevokedLRU:
+    """Bounded map of revoked JTI -> token expiry timestamp"""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def add(self, jti, expires_at):
+        with self.lock:
+            self.entries[jti] = expires_at
+            self.entries.move_to_end(jti)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def __contains__(self, jti):
+        with self.lock:
+            expires_at = self.entries.get(jti)
+            if expires_at is None:
+                return False
+            if expires_at <= time.time():
+                del self.entries[jti]
+                return False
+            self.entries.move_to_end(jti)
+            return True
+
+
+_local = _RevokedLRU(settings.TOKEN_BLACKLIST_LOCAL_ENTRIES)
+
+
+def _key(jti):
+    return f'{KEY_PREFIX}:{jti}'
+
+
+def _claims(token):
+    return token[api_settings.JTI_CLAIM], int(token['exp'])
+
+
+def revoke_token(token):
+    """
+    Revoke a token until it expires.
+
+    Returns False if the token was already revoked, which lets refresh
+    rotation treat a second use of the same refresh token as a replay.
+    """
+    jti, expires_at = _claims(token)
+    if jti in _local:
+        return False
+
+    ttl = expires_at - int(time.time())
+    if ttl <= 0:
+        # Already expired, token verification rejects it on its own
+        return True
+
+    try:
+        created = get_redis().set(_key(jti), 1, ex=ttl, nx=True)
+    except redis.RedisError:
+        raise RevocationStoreUnavailable()
+
+    _local.add(jti, expires_at)
+    return bool(created)
+
+
+def is_revoked(token):
+    jti, expires_at = _claims(token)
+    if jti in _local:
+        return True
+
+    try:
+        revoked = get_redis().exists(_key(jti))
+    except redis.RedisError:
+        raise RevocationStoreUnavailable()
+
+    if revoked:
+        _local.add(jti, expires_at)
+    return bool(revoked)
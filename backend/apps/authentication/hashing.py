@@ -0,0 +1,156 @@
+"""
+Password hashing on a dedicated, bounded thread pool.
+
+PBKDF2 runs inside OpenSSL with the GIL released, so a small thread pool
+hashes in parallel without stealing request threads (or the event loop,
+under ASGI) for the whole work factor. The number of hashes waiting or
+running is capped; once the pool is saturated, new requests are shed with
+a 429 instead of queueing behind a login burst.
+
+Only hashing runs on the pool. Database reads and writes stay on the
+calling thread, so they keep its connection and transaction.
+"""
+
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import (
+    check_password as django_check_password,
+    identify_hasher,
+    make_password as django_make_password,
+)
+from django.contrib.auth.signals import user_login_failed
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import Throttled
+
+User = get_user_model()
+
+_executor = None
+_pending = 0
+_lock = threading.Lock()
+
+
+class HashingOverloaded(Throttled):
+    default_detail = _('Too many sign-in attempts are being processed, try again shortly.')
+    default_code = 'hashing_overloaded'
+
+    def __init__(self):
+        super().__init__(wait=settings.PASSWORD_HASHING_RETRY_AFTER)
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=settings.PASSWORD_HASHING_WORKERS,
+                    thread_name_prefix='password-hashing'
+                )
+    return _executor
+
+
+def _release(future):
+    global _pending
+    with _lock:
+        _pending -= 1
+
+
+def _submit(func, *args):
+    global _pending
+    limit = settings.PASSWORD_HASHING_WORKERS + settings.PASSWORD_HASHING_MAX_QUEUE
+    with _lock:
+        if _pending >= limit:
+            raise HashingOverloaded()
+        _pending += 1
+    try:
+        future = _get_executor().submit(func, *args)
+    except BaseException:
+        _release(None)
+        raise
+    future.add_done_callback(_release)
+    return future
+
+
+def queue_depth():
+    """Hashes currently running or waiting"""
+    return _pending
+
+
+def run(func, *args):
+    return _submit(func, *args).result()
+
+
+async def arun(func, *args):
+    return await asyncio.wrap_future(_submit(func, *args))
+
+
+def make_password(raw_password):
+    return run(django_make_password, raw_password)
+
+
+async def amake_password(raw_password):
+    return await arun(django_make_password, raw_password)
+
+
+def check_password(raw_password, encoded):
+    return run(django_check_password, raw_password, encoded)
+
+
+async def acheck_password(raw_password, encoded):
+    return await arun(django_check_password, raw_password, encoded)
+
+
+def set_password(user, raw_password):
+    """User.set_password with the hash computed on the pool"""
+    user.password = make_password(raw_password)
+    user._password = raw_password
+
+
+def _needs_rehash(encoded):
+    try:
+        return identify_hasher(encoded).must_update(encoded)
+    except ValueError:
+        return False
+
+
+def verify_password(user, raw_password):
+    """User.check_password, upgrading outdated hashes on the calling thread"""
+    if not check_password(raw_password, user.password):
+        return False
+    if _needs_rehash(user.password):
+        user.password = make_password(raw_password)
+        user.save(update_fields=['password'])
+    return True
+
+
+async def averify_password(user, raw_password):
+    if not await acheck_password(raw_password, user.password):
+        return False
+    if _needs_rehash(user.password):
+        user.password = await amake_password(raw_password)
+        await user.asave(update_fields=['password'])
+    return True
+
+
+async def aauthenticate(request, username, password):
+    """Async equivalent of django.contrib.auth.authenticate with PooledModelBackend"""
+    try:
+        user = await User._default_manager.aget(**{User.USERNAME_FIELD: username})
+    except User.DoesNotExist:
+        # Hash anyway so missing accounts take as long as wrong passwords
+        await amake_password(password)
+        user = None
+    else:
+        if not (await averify_password(user, password) and user.is_active):
+            user = None
+    if user is None:
+        await sync_to_async(user_login_failed.send)(
+            sender=__name__, credentials={'username': username, 'password': '********************'},
+            request=request
+        )
+    return user
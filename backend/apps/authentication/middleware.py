@@ -0,0 +1,19 @@
+from django.http import HttpResponse
+from django.utils.deprecation import MiddlewareMixin
+
+from .hashing import HashingOverloaded
+
+
+class HashingOverloadedMiddleware(MiddlewareMixin):
+    """
+    Answer 503 with Retry-After when the hashing pool sheds a password check
+    outside DRF, e.g. on the admin login form. DRF views already turn
+    HashingOverloaded into a 429.
+    """
+
+    def process_exception(self, request, exception):
+        if not isinstance(exception, HashingOverloaded):
+            return None
+        response = HttpResponse(str(exception.detail), status=503, content_type='text/plain; charset=utf-8')
+        response['Retry-After'] = str(exception.wait)
+        return response
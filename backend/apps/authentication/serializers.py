@@ -1,7 +1,14 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model, authenticate
+from django.contrib.auth.signals import user_logged_in
 from django.contrib.auth.password_validation import validate_password
-from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+
+from . import hashing
+from .blacklist import is_revoked, revoke_token
 
 User = get_user_model()
 
@@ -16,6 +23,36 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
         token['full_name'] = user.full_name
         
         return token
+    
+    def validate(self, attrs):
+        data = super().validate(attrs)
+        # Updates last_login and feeds the active user metrics
+        user_logged_in.send(sender=self.user.__class__, request=self.context.get('request'), user=self.user)
+        return data
+
+
+class CustomTokenRefreshSerializer(TokenRefreshSerializer):
+    """Refresh with rotation, using the Redis revocation store as the blacklist"""
+    
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+        
+        if api_settings.ROTATE_REFRESH_TOKENS and api_settings.BLACKLIST_AFTER_ROTATION:
+            # Claiming the old JTI atomically means a replayed token loses the race
+            if not revoke_token(refresh):
+                raise InvalidToken(_('Token is blacklisted'))
+        elif is_revoked(refresh):
+            raise InvalidToken(_('Token is blacklisted'))
+        
+        data = {'access': str(refresh.access_token)}
+        
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            refresh.set_jti()
+            refresh.set_exp()
+            refresh.set_iat()
+            data['refresh'] = str(refresh)
+        
+        return data
 
 
 class UserRegistrationSerializer(serializers.ModelSerializer):
@@ -36,14 +73,24 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
     
     def create(self, validated_data):
         validated_data.pop('password_confirm')
-        user = User.objects.create_user(**validated_data)
+        password = validated_data.pop('password')
+        # Async callers hash on the pool before saving and pass the result in
+        encoded_password = validated_data.pop('encoded_password', None)
+        
+        user = User(**validated_data)
+        user.email = User.objects.normalize_email(user.email)
+        user.username = User.normalize_username(user.username)
+        user.password = encoded_password or hashing.make_password(password)
+        user.save()
         return user
 
 
-class LoginSerializer(serializers.Serializer):
+class LoginCredentialsSerializer(serializers.Serializer):
     email = serializers.EmailField()
     password = serializers.CharField()
-    
+
+
+class LoginSerializer(LoginCredentialsSerializer):
     def validate(self, attrs):
         email = attrs.get('email')
         password = attrs.get('password')
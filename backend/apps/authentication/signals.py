@@ -0,0 +1,17 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .authentication import invalidate_principal
+
+User = get_user_model()
+
+
+@receiver([post_save, post_delete], sender=User)
+def invalidate_cached_principal(sender, instance, **kwargs):
+    """Drop the cached principal so deactivations and role changes apply immediately"""
+    user_id = instance.pk
+    invalidate_principal(user_id)
+    # Also after commit, in case a concurrent request re-cached the old row
+    transaction.on_commit(lambda: invalidate_principal(user_id))
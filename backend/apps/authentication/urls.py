@@ -1,13 +1,25 @@
+from django.conf import settings
 from django.urls import path
-from rest_framework_simplejwt.views import TokenRefreshView
-from . import views
+from . import async_views, views
 
 urlpatterns = [
     path('register/', views.RegisterView.as_view(), name='register'),
     path('login/', views.login_view, name='login'),
     path('logout/', views.logout_view, name='logout'),
     path('token/', views.CustomTokenObtainPairView.as_view(), name='token_obtain_pair'),
-    path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path('token/refresh/', views.CustomTokenRefreshView.as_view(), name='token_refresh'),
     path('password-reset/', views.password_reset_request, name='password_reset_request'),
     path('password-reset-confirm/', views.password_reset_confirm, name='password_reset_confirm'),
 ]
+
+if settings.ASYNC_VIEWS:
+    # Same URLs and names, served by the async views under ASGI
+    urlpatterns = [
+        path('register/', async_views.register_view, name='register'),
+        path('login/', async_views.login_view, name='login'),
+        path('token/', async_views.token_obtain_pair, name='token_obtain_pair'),
+        path('password-reset/', async_views.password_reset_request, name='password_reset_request'),
+    ] + [
+        pattern for pattern in urlpatterns
+        if pattern.name not in ('register', 'login', 'token_obtain_pair', 'password_reset_request')
+    ]
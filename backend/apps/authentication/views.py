@@ -1,27 +1,36 @@
 from rest_framework import status, generics, permissions
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, permission_classes, throttle_classes
 from rest_framework.response import Response
-from rest_framework_simplejwt.views import TokenObtainPairView
+from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.exceptions import TokenError
 from django.contrib.auth import get_user_model
+from django.contrib.auth.signals import user_logged_in
 from django.contrib.auth.tokens import default_token_generator
-from django.core.mail import send_mail
-from django.conf import settings
-from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
-from django.utils.encoding import force_bytes, force_str
+from django.utils.http import urlsafe_base64_decode
+from django.utils.encoding import force_str
 from django.urls import reverse
 
+from . import hashing
+from .blacklist import revoke_token
 from .serializers import (
-    CustomTokenObtainPairSerializer, UserRegistrationSerializer,
+    CustomTokenObtainPairSerializer, CustomTokenRefreshSerializer, UserRegistrationSerializer,
     LoginSerializer, PasswordResetRequestSerializer, PasswordResetConfirmSerializer
 )
+from apps.notifications.emails import queue_password_reset
 from apps.users.serializers import UserSerializer
+from voucher_project.throttling import LOGIN_THROTTLES, PASSWORD_RESET_THROTTLES, REGISTER_THROTTLES
 
 User = get_user_model()
 
 
 class CustomTokenObtainPairView(TokenObtainPairView):
     serializer_class = CustomTokenObtainPairSerializer
+    throttle_classes = LOGIN_THROTTLES
+
+
+class CustomTokenRefreshView(TokenRefreshView):
+    serializer_class = CustomTokenRefreshSerializer
 
 
 class RegisterView(generics.CreateAPIView):
@@ -29,6 +38,7 @@ class RegisterView(generics.CreateAPIView):
     queryset = User.objects.all()
     permission_classes = [permissions.AllowAny]
     serializer_class = UserRegistrationSerializer
+    throttle_classes = REGISTER_THROTTLES
     
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
@@ -48,6 +58,7 @@ class RegisterView(generics.CreateAPIView):
 
 @api_view(['POST'])
 @permission_classes([permissions.AllowAny])
+@throttle_classes(LOGIN_THROTTLES)
 def login_view(request):
     """User login endpoint"""
     serializer = LoginSerializer(data=request.data, context={'request': request})
@@ -55,6 +66,7 @@ def login_view(request):
     if serializer.is_valid():
         user = serializer.validated_data.get('user') # type: ignore
         if user is not None:
+            user_logged_in.send(sender=user.__class__, request=request, user=user)
             refresh = RefreshToken.for_user(user)
             access_token = str(refresh.access_token) # type: ignore
             return Response({
@@ -76,16 +88,16 @@ def logout_view(request):
     try:
         refresh_token = request.data.get('refresh')
         if refresh_token:
-            token = RefreshToken(refresh_token)
-            token.blacklist()
+            revoke_token(RefreshToken(refresh_token))
         
         return Response({'message': 'Logout successful'}, status=status.HTTP_200_OK)
-    except Exception as e:
+    except TokenError:
         return Response({'error': 'Invalid token'}, status=status.HTTP_400_BAD_REQUEST)
 
 
 @api_view(['POST'])
 @permission_classes([permissions.AllowAny])
+@throttle_classes(PASSWORD_RESET_THROTTLES)
 def password_reset_request(request):
     """Request password reset"""
     serializer = PasswordResetRequestSerializer(data=request.data)
@@ -97,37 +109,9 @@ def password_reset_request(request):
         except User.DoesNotExist:
             return Response({'error': 'User with this email does not exist.'}, status=status.HTTP_400_BAD_REQUEST)
         
-        # Generate reset token
-        token = default_token_generator.make_token(user)
-        uid = urlsafe_base64_encode(force_bytes(user.pk))
-        
-        # Create reset URL (you'll need to implement this in your frontend)
-        reset_url = f"{settings.FRONTEND_URL}/reset-password/{uid}/{token}/"
-        
-        # Send email
-        subject = 'Password Reset Request'
-        message = f"""
-        Hi {user.first_name},
-        
-        You requested a password reset. Click the link below to reset your password:
-        {reset_url}
-        
-        If you didn't request this, please ignore this email.
-        
-        Thanks,
-        Voucher App Team
-        """
-        
-        if isinstance(email, str) and email:
-            send_mail(
-                subject,
-                message,
-                settings.DEFAULT_FROM_EMAIL,
-                [email],
-                fail_silently=False,
-            )
-        else:
-            return Response({'error': 'Invalid email address.'}, status=status.HTTP_400_BAD_REQUEST)
+        # Sent by the notifications worker once this request commits; the
+        # reset link is made then, so the token is never stored
+        queue_password_reset(user)
         
         return Response({
             'message': 'Password reset email sent successfully'
@@ -158,7 +142,7 @@ def password_reset_confirm(request):
             user = User.objects.get(pk=user_id)
             
             if default_token_generator.check_token(user, token):
-                user.set_password(password)
+                hashing.set_password(user, password)
                 user.save()
                 
                 return Response({
@@ -0,0 +1,14 @@
+from django.contrib import admin
+from .models import OutboundEmail
+from voucher_project.db_router import ReplicaChangelistMixin
+
+
+@admin.register(OutboundEmail)
+class OutboundEmailAdmin(ReplicaChangelistMixin, admin.ModelAdmin):
+    list_display = ['to_email', 'template', 'status', 'attempts', 'created_at', 'sent_at']
+    list_filter = ['template', 'status', 'created_at']
+    search_fields = ['to_email', 'user__email']
+    readonly_fields = ['created_at', 'sent_at', 'last_error']
+    # Context holds reset links; keep it out of the change form
+    exclude = ['context']
+    ordering = ['-created_at']
@@ -0,0 +1,320 @@
+"""
+Transactional email queue.
+
+``queue_email`` stores an ``OutboundEmail`` row inside the caller's
+transaction and pokes the Celery worker once it commits, so requests never
+wait on the mail relay and rolled back requests send nothing. The worker
+claims due rows in batches and sends each batch over one SMTP connection,
+rescheduling failures with exponential backoff. Finished rows are deleted
+after ``EMAIL_QUEUE_RETENTION_DAYS``.
+"""
+
+import logging
+import smtplib
+from datetime import timedelta
+from textwrap import dedent
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.tokens import default_token_generator
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+from kombu.exceptions import OperationalError
+
+from apps.vouchers.models import Voucher
+from .models import OutboundEmail
+
+logger = logging.getLogger('voucher_app')
+
+User = get_user_model()
+
+# Claimed rows are invisible to other workers for this long
+CLAIM_LEASE = timedelta(minutes=5)
+MAX_RETRY_DELAY = timedelta(hours=1)
+
+
+def queue_email(template, to_email, context=None, user=None, dedupe_key=None):
+    """Queue an email to be sent after the current transaction commits"""
+    fields = dict(template=template, to_email=to_email, context=context or {}, user=user)
+    if dedupe_key:
+        email, created = OutboundEmail.objects.get_or_create(dedupe_key=dedupe_key, defaults=fields)
+        if not created:
+            return email
+    else:
+        email = OutboundEmail.objects.create(**fields)
+    transaction.on_commit(_wake_worker)
+    return email
+
+
+def _wake_worker():
+    from .tasks import send_pending_emails
+    try:
+        send_pending_emails.delay()
+    except OperationalError as e:
+        # The periodic sweep picks the message up once the broker is back
+        logger.warning(f'Could not enqueue email sending: {e}')
+
+
+def queue_password_reset(user):
+    return queue_email(OutboundEmail.PASSWORD_RESET, user.email, {'user_id': user.pk}, user=user)
+
+
+def queue_invitations(users):
+    """Queue account invitations for imported users, returns the number queued"""
+    invitations = OutboundEmail.objects.bulk_create([
+        OutboundEmail(
+            user=user,
+            to_email=user.email,
+            template=OutboundEmail.INVITATION,
+            context={'user_id': user.pk},
+            dedupe_key=f'invitation:{user.pk}',
+        )
+        for user in users
+    ], batch_size=1000)
+    if invitations:
+        transaction.on_commit(_wake_worker)
+    return len(invitations)
+
+
+def queue_voucher_delivery(user, vouchers):
+    return queue_email(OutboundEmail.VOUCHER_DELIVERY, user.email, {
+        'voucher_ids': [str(voucher.id) for voucher in vouchers],
+    }, user=user)
+
+
+def queue_expiry_reminders(days=None):
+    """
+    Queue one reminder per active voucher expiring within ``days`` days.
+    Returns the number of expiring vouchers; already reminded ones are skipped.
+    """
+    days = settings.VOUCHER_EXPIRY_REMINDER_DAYS if days is None else days
+    now = timezone.now()
+    expiring = Voucher.objects.filter(
+        status='active',
+        expires_at__gt=now,
+        expires_at__lte=now + timedelta(days=days)
+    ).select_related('user').only('id', 'user', 'user__email')
+
+    reminders = [
+        OutboundEmail(
+            user=voucher.user,
+            to_email=voucher.user.email,
+            template=OutboundEmail.VOUCHER_EXPIRY,
+            context={'voucher_id': str(voucher.id)},
+            dedupe_key=f'voucher_expiry:{voucher.id}',
+        )
+        for voucher in expiring.iterator(chunk_size=1000)
+    ]
+    # The unique dedupe key skips vouchers that were already reminded
+    OutboundEmail.objects.bulk_create(reminders, batch_size=1000, ignore_conflicts=True)
+    if reminders:
+        transaction.on_commit(_wake_worker)
+    return len(reminders)
+
+
+def _set_password_url(user):
+    # The token is made at send time so it is never stored, and it stops
+    # working once the user sets a password
+    uid = urlsafe_base64_encode(force_bytes(user.pk))
+    token = default_token_generator.make_token(user)
+    return f"{settings.FRONTEND_URL}/reset-password/{uid}/{token}/"
+
+
+def _render_password_reset(context):
+    user = User.objects.filter(id=context['user_id'], is_active=True).first()
+    if user is None:
+        return None
+    subject = 'Password Reset Request'
+    body = dedent(f"""\
+        Hi {user.first_name},
+
+        You requested a password reset. Click the link below to reset your password:
+        {_set_password_url(user)}
+
+        If you didn't request this, please ignore this email.
+
+        Thanks,
+        Voucher App Team
+    """)
+    return subject, body
+
+
+def _render_invitation(context):
+    user = User.objects.filter(id=context['user_id'], is_active=True).first()
+    if user is None or user.has_usable_password():
+        # Deactivated, or the account was already claimed
+        return None
+    invite_url = _set_password_url(user)
+    institution = f" by {user.institution}" if user.institution else ''
+    subject = 'You have been invited to Voucher App'
+    body = dedent(f"""\
+        Hi {user.first_name},
+
+        An account has been created for you{institution}. Set your password to get started:
+        {invite_url}
+
+        Thanks,
+        Voucher App Team
+    """)
+    return subject, body
+
+
+def _render_voucher_delivery(context):
+    vouchers = Voucher.objects.filter(
+        id__in=context['voucher_ids']
+    ).select_related('voucher_type').order_by('issued_at')
+    if not vouchers:
+        return None
+    lines = '\n'.join(
+        f"  {voucher.code} - {voucher.voucher_type.name} (expires {voucher.expires_at:%Y-%m-%d})"
+        for voucher in vouchers
+    )
+    subject = 'Your vouchers are ready'
+    body = dedent("""\
+        Hi,
+
+        Thanks for your purchase. Your vouchers:
+
+        {lines}
+
+        You can also find them in the app under My Vouchers.
+
+        Thanks,
+        Voucher App Team
+    """).format(lines=lines)
+    return subject, body
+
+
+def _render_voucher_expiry(context):
+    voucher = Voucher.objects.filter(
+        id=context['voucher_id'], status='active', expires_at__gt=timezone.now()
+    ).select_related('voucher_type').first()
+    if voucher is None:
+        # Used, cancelled or already expired since the reminder was queued
+        return None
+    subject = f'Your {voucher.voucher_type.name} expires soon'
+    body = dedent(f"""\
+        Hi,
+
+        Your {voucher.voucher_type.name} {voucher.code} expires on {voucher.expires_at:%Y-%m-%d}.
+        Redeem it before then so it doesn't go to waste.
+
+        Thanks,
+        Voucher App Team
+    """)
+    return subject, body
+
+
+RENDERERS = {
+    OutboundEmail.PASSWORD_RESET: _render_password_reset,
+    OutboundEmail.INVITATION: _render_invitation,
+    OutboundEmail.VOUCHER_DELIVERY: _render_voucher_delivery,
+    OutboundEmail.VOUCHER_EXPIRY: _render_voucher_expiry,
+}
+
+
+def claim_batch(batch_size):
+    """Lease up to ``batch_size`` due messages to this worker"""
+    now = timezone.now()
+    with transaction.atomic():
+        due = list(
+            OutboundEmail.objects.select_for_update(skip_locked=True).filter(
+                status='pending', next_attempt_at__lte=now
+            ).order_by('next_attempt_at').values_list('id', 'attempts')[:batch_size]
+        )
+        # A lease that ran out on its last attempt (the worker died mid-send)
+        # fails the message instead of claiming it once more
+        exhausted = [id for id, attempts in due if attempts >= settings.EMAIL_QUEUE_MAX_ATTEMPTS]
+        ids = [id for id, attempts in due if attempts < settings.EMAIL_QUEUE_MAX_ATTEMPTS]
+        OutboundEmail.objects.filter(id__in=exhausted).update(
+            status='failed', last_error='Gave up after the send lease expired on the last attempt'
+        )
+        OutboundEmail.objects.filter(id__in=ids).update(
+            next_attempt_at=now + CLAIM_LEASE, attempts=F('attempts') + 1
+        )
+    return list(OutboundEmail.objects.filter(id__in=ids).order_by('id'))
+
+
+def _retry_later(email, error):
+    email.last_error = str(error)[:1000]
+    if email.attempts >= settings.EMAIL_QUEUE_MAX_ATTEMPTS:
+        email.status = 'failed'
+    else:
+        delay = timedelta(seconds=settings.EMAIL_QUEUE_RETRY_SECONDS * 2 ** (email.attempts - 1))
+        email.next_attempt_at = timezone.now() + min(delay, MAX_RETRY_DELAY)
+    email.save(update_fields=['status', 'last_error', 'next_attempt_at'])
+
+
+def _mark(email, status, error=''):
+    email.status = status
+    email.last_error = error
+    if status == 'sent':
+        email.sent_at = timezone.now()
+    email.save(update_fields=['status', 'last_error', 'sent_at'])
+
+
+def send_batch(batch_size=None):
+    """
+    Send one batch of due messages over a single connection. Returns how many
+    messages were processed, or 0 when there was nothing due or no connection.
+    """
+    emails = claim_batch(batch_size or settings.EMAIL_QUEUE_BATCH_SIZE)
+    if not emails:
+        return 0
+
+    messages = []
+    for email in emails:
+        try:
+            rendered = RENDERERS[email.template](email.context)
+        except (KeyError, ValueError) as e:
+            _mark(email, 'failed', f'Could not render: {e}')
+            continue
+        if rendered is None:
+            _mark(email, 'skipped')
+            continue
+        subject, body = rendered
+        messages.append((email, EmailMessage(subject, body, settings.DEFAULT_FROM_EMAIL, [email.to_email])))
+
+    if not messages:
+        return len(emails)
+
+    connection = get_connection()
+    try:
+        connection.open()
+    except (smtplib.SMTPException, OSError) as e:
+        logger.warning(f'Mail connection failed, retrying {len(messages)} emails later: {e}')
+        for email, _ in messages:
+            _retry_later(email, e)
+        return 0
+
+    try:
+        for email, message in messages:
+            try:
+                connection.send_messages([message])
+            except smtplib.SMTPRecipientsRefused as e:
+                _mark(email, 'failed', str(e)[:1000])
+            except (smtplib.SMTPException, OSError) as e:
+                _retry_later(email, e)
+            else:
+                _mark(email, 'sent')
+    finally:
+        connection.close()
+    return len(emails)
+
+
+def purge_finished_emails(days=None):
+    """
+    Delete sent, skipped and failed messages older than ``days`` days, returns
+    the number deleted. Expiry reminders are long past their window by then,
+    so freeing their dedupe keys does not queue them again.
+    """
+    days = settings.EMAIL_QUEUE_RETENTION_DAYS if days is None else days
+    deleted, _ = OutboundEmail.objects.filter(
+        status__in=['sent', 'skipped', 'failed'],
+        created_at__lt=timezone.now() - timedelta(days=days)
+    ).delete()
+    return deleted
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-19 17:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='outboundemail',
+            name='template',
+            field=models.CharField(choices=[('password_reset', 'Password Reset'), ('invitation', 'Invitation'), ('voucher_delivery', 'Voucher Delivery'), ('voucher_expiry', 'Voucher Expiry Reminder')], max_length=30),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-19 21:55
+
+from django.db import migrations
+
+
+def drop_stored_reset_links(apps, schema_editor):
+    # Reset emails now carry only the user id; their links are made at send time
+    OutboundEmail = apps.get_model('notifications', 'OutboundEmail')
+    resets = OutboundEmail.objects.filter(template='password_reset').exclude(user=None)
+    for email in resets.only('id', 'user_id').iterator(chunk_size=1000):
+        OutboundEmail.objects.filter(id=email.id).update(context={'user_id': email.user_id})
+    OutboundEmail.objects.filter(template='password_reset', user=None).update(context={})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0002_invitation_template'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_stored_reset_links, migrations.RunPython.noop),
+    ]
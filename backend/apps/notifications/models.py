@@ -0,0 +1,60 @@
+from django.conf import settings
+from django.db import models
+from django.utils import timezone
+
+
+class OutboundEmail(models.Model):
+    """Transactional email waiting to be sent, or already sent, by the Celery worker"""
+    
+    PASSWORD_RESET = 'password_reset'
+    INVITATION = 'invitation'
+    VOUCHER_DELIVERY = 'voucher_delivery'
+    VOUCHER_EXPIRY = 'voucher_expiry'
+    
+    TEMPLATE_CHOICES = [
+        (PASSWORD_RESET, 'Password Reset'),
+        (INVITATION, 'Invitation'),
+        (VOUCHER_DELIVERY, 'Voucher Delivery'),
+        (VOUCHER_EXPIRY, 'Voucher Expiry Reminder'),
+    ]
+    
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('sent', 'Sent'),
+        ('skipped', 'Skipped'),
+        ('failed', 'Failed'),
+    ]
+    
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='outbound_emails',
+        null=True,
+        blank=True
+    )
+    to_email = models.EmailField()
+    template = models.CharField(max_length=30, choices=TEMPLATE_CHOICES)
+    # Rendered at send time, so codes and links are not stored as message text
+    context = models.JSONField(default=dict, blank=True)
+    # Guards against queueing the same reminder twice
+    dedupe_key = models.CharField(max_length=100, unique=True, null=True, blank=True)
+    
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    # Also acts as a lease: claimed messages are pushed forward while being sent
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        db_table = 'outbound_emails'
+        verbose_name = 'Outbound Email'
+        verbose_name_plural = 'Outbound Emails'
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.get_template_display()} to {self.to_email} - {self.status}"
@@ -0,0 +1,25 @@
+from celery import shared_task
+from django.conf import settings
+
+from .emails import purge_finished_emails, queue_expiry_reminders, send_batch
+
+
+@shared_task(ignore_result=True)
+def send_pending_emails():
+    """Send due emails in batches, handing off to a fresh task after a few batches"""
+    for _ in range(settings.EMAIL_QUEUE_BATCHES_PER_TASK):
+        if not send_batch():
+            return
+    send_pending_emails.delay()
+
+
+@shared_task(ignore_result=True)
+def send_voucher_expiry_reminders():
+    """Daily: queue reminders for vouchers about to expire"""
+    queue_expiry_reminders()
+
+
+@shared_task(ignore_result=True)
+def purge_old_emails():
+    """Daily: delete finished messages past EMAIL_QUEUE_RETENTION_DAYS"""
+    purge_finished_emails()
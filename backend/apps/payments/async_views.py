@@ -0,0 +1,112 @@
+"""
+Async versions of the Stripe checkout endpoints, routed instead of the DRF
+views when ASYNC_VIEWS is enabled (the default under SERVER_MODE=asgi).
+
+Stripe is awaited over httpx (stripe_async.py), so a worker keeps serving
+other requests while a call is in flight instead of holding a thread for it.
+Payments are read and written with the async ORM; the voucher issuing
+transaction runs in a thread, as Django transactions are synchronous.
+Within a request these calls share one thread (Django's ASGIHandler gives
+each request its own ``ThreadSensitiveContext``), so Redis-only work, which
+needs no database connection, is sent to the default executor instead.
+Responses match the DRF views they replace.
+"""
+
+from asgiref.sync import sync_to_async
+from django.http import Http404
+from rest_framework import permissions, status
+from stripe.error import APIError as StripeError  # type: ignore
+
+from voucher_project.async_api import async_api_view, json_response
+from . import stripe_async
+from .models import Payment
+from .serializers import PaymentIntentSerializer
+from .services import CheckoutError, fulfil_payment, intent_response, new_payment, price_purchase, record_sale
+
+
+@async_api_view(['POST'], permission_classes=[permissions.IsAuthenticated])
+async def create_payment_intent(request):
+    """Create a payment intent for voucher purchase"""
+    serializer = PaymentIntentSerializer(data=request.data)
+    if not serializer.is_valid():
+        return json_response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    validated_data = serializer.validated_data
+    try:
+        voucher_type, quantity, amount, discount_amount = await sync_to_async(price_purchase)(validated_data)
+    except CheckoutError as e:
+        return json_response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        payment = new_payment(request.user, validated_data, voucher_type, quantity, discount_amount)
+        await payment.asave()
+
+        if payment.payment_method != 'stripe':
+            return json_response({
+                'error': 'Payment method not supported yet'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        intent = await stripe_async.create_payment_intent(
+            amount=int(amount * 100),  # Stripe uses cents
+            currency=payment.currency.lower(),
+            metadata={
+                'payment_id': str(payment.id),
+                'user_id': str(request.user.id),
+                'voucher_type': voucher_type.name
+            }
+        )
+        payment.stripe_payment_intent_id = intent.id
+        await payment.asave(update_fields=['stripe_payment_intent_id', 'updated_at'])
+
+        return json_response(intent_response(payment, intent, amount), status=status.HTTP_201_CREATED)
+    except StripeError as e:
+        return json_response({
+            'error': f'Payment processor error: {str(e)}'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    except Exception as e:
+        return json_response({
+            'error': f'Internal error: {str(e)}'
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@async_api_view(['POST'], permission_classes=[permissions.IsAuthenticated])
+async def confirm_payment(request):
+    """Confirm successful payment and create vouchers"""
+    payment_intent_id = request.data.get('payment_intent_id')
+    if not payment_intent_id:
+        return json_response({
+            'error': 'Payment intent ID is required'
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        intent = await stripe_async.retrieve_payment_intent(payment_intent_id)
+        if intent.status != 'succeeded':
+            return json_response({
+                'error': 'Payment not successful'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        payment = await Payment.objects.select_related('user', 'voucher_type').filter(
+            stripe_payment_intent_id=payment_intent_id,
+            user=request.user
+        ).afirst()
+        if payment is None:
+            # Reported like the DRF view, whose get_object_or_404 runs inside the same handler
+            raise Http404('No Payment matches the given query.')
+
+        if payment.status == 'completed':
+            return json_response({
+                'error': 'Payment already processed'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        data = await sync_to_async(fulfil_payment)(payment, intent)
+        # No database access, so it need not wait for the thread the ORM calls share
+        await sync_to_async(record_sale, thread_sensitive=False)(payment)
+        return json_response(data, status=status.HTTP_200_OK)
+    except StripeError as e:
+        return json_response({
+            'error': f'Payment verification failed: {str(e)}'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    except Exception as e:
+        return json_response({
+            'error': f'Internal error: {str(e)}'
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -133,6 +133,8 @@ class Refund(models.Model):
     # Timestamps
     created_at = models.DateTimeField(auto_now_add=True)
     processed_at = models.DateTimeField(null=True, blank=True)
+    # Bumped by every save(); incremental exports watermark on it
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
     
     class Meta:
         db_table = 'refunds'
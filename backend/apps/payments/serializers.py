@@ -1,9 +1,10 @@
 from rest_framework import serializers
 from .models import Payment, Refund
 from apps.vouchers.serializers import VoucherTypeSerializer
+from voucher_project.fieldsets import SparseFieldsMixin
 
 
-class PaymentSerializer(serializers.ModelSerializer):
+class PaymentSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     voucher_type = VoucherTypeSerializer(read_only=True)
     total_amount = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
     
@@ -15,6 +16,10 @@ class PaymentSerializer(serializers.ModelSerializer):
             'total_amount', 'created_at', 'updated_at', 'completed_at'
         ]
         read_only_fields = ['id', 'status', 'created_at', 'updated_at', 'completed_at']
+        # Columns read by fields that are not model fields, for ?fields=
+        field_sources = {
+            'total_amount': ['amount', 'quantity', 'discount_amount'],
+        }
 
 
 class PaymentIntentSerializer(serializers.Serializer):
@@ -32,7 +37,7 @@ class RefundRequestSerializer(serializers.Serializer):
     notes = serializers.CharField(required=False, allow_blank=True)
 
 
-class RefundSerializer(serializers.ModelSerializer):
+class RefundSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Refund
         fields = [
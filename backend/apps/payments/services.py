@@ -0,0 +1,124 @@
+"""
+Checkout steps shared by the payment views and their async versions in
+async_views.py, which differ only in how they wait for Stripe and the
+database.
+"""
+
+from django.db import transaction
+from django.http import Http404
+from django.utils import timezone
+
+from apps.analytics import live
+from apps.notifications.emails import queue_voucher_delivery
+from apps.vouchers.catalog import get_active_voucher_type, get_discount
+from apps.vouchers.models import Voucher, VoucherDiscount
+from .models import Payment, PaymentVoucher
+from .serializers import PaymentSerializer
+
+
+class CheckoutError(Exception):
+    """Answered with ``{'error': message}`` and a 400"""
+
+
+def price_purchase(validated_data):
+    """(voucher type, quantity, amount to charge, discount amount) for PaymentIntentSerializer data"""
+    voucher_type = get_active_voucher_type(validated_data.get('voucher_type_id'))
+    if voucher_type is None:
+        raise Http404
+
+    quantity = validated_data.get('quantity')
+    if quantity is None:
+        raise CheckoutError('Quantity is required')
+    try:
+        quantity = int(quantity)
+    except (TypeError, ValueError):
+        raise CheckoutError('Quantity must be an integer')
+    amount = voucher_type.price * quantity
+    discount_amount = 0
+
+    discount_code = validated_data.get('discount_code')
+    if discount_code:
+        entry = get_discount(discount_code)
+        if entry is None:
+            raise CheckoutError('Invalid discount code')
+        discount, applicable_type_ids = entry
+        if discount.is_valid and voucher_type.pk in applicable_type_ids:
+            if discount.discount_type == 'percentage':
+                discount_amount = amount * (discount.discount_value / 100)
+            else:
+                discount_amount = discount.discount_value
+
+            amount -= discount_amount
+
+    return voucher_type, quantity, amount, discount_amount
+
+
+def new_payment(user, validated_data, voucher_type, quantity, discount_amount):
+    """An unsaved Payment for the priced purchase"""
+    return Payment(
+        user=user,
+        amount=voucher_type.price,
+        currency=validated_data.get('currency', 'usd'),
+        payment_method=validated_data.get('payment_method'),
+        voucher_type=voucher_type,
+        quantity=quantity,
+        discount_amount=discount_amount,
+        discount_code=validated_data.get('discount_code')
+    )
+
+
+def intent_response(payment, intent, amount):
+    return {
+        'payment_id': payment.id,
+        'client_secret': intent.client_secret,
+        'amount': float(amount),
+        'currency': payment.currency,
+        'payment': PaymentSerializer(payment).data
+    }
+
+
+def fulfil_payment(payment, intent):
+    """Complete a payment whose intent succeeded and issue its vouchers; returns the response data"""
+    with transaction.atomic():
+        payment.status = 'completed'
+        payment.completed_at = timezone.now()
+        payment.stripe_charge_id = str(intent.latest_charge) if intent.latest_charge else None
+        payment.save()
+
+        # Create vouchers
+        vouchers = []
+        for _ in range(payment.quantity):
+            voucher = Voucher.objects.create(
+                voucher_type=payment.voucher_type,
+                user=payment.user,
+                transaction_id=str(payment.id)
+            )
+
+            # Link payment to voucher
+            PaymentVoucher.objects.create(
+                payment=payment,
+                voucher=voucher
+            )
+            vouchers.append(voucher)
+
+        queue_voucher_delivery(payment.user, vouchers)
+
+        # Update discount usage if applicable
+        if payment.discount_code:
+            try:
+                discount = VoucherDiscount.objects.get(code=payment.discount_code)
+                discount.current_uses += 1
+                discount.save()
+            except VoucherDiscount.DoesNotExist:
+                pass
+
+    return {
+        'message': 'Payment confirmed and vouchers created',
+        'payment': PaymentSerializer(payment).data,
+        'voucher_codes': [v.code for v in vouchers]
+    }
+
+
+def record_sale(payment):
+    """Add a fulfilled payment to the live dashboard counters (Redis only)"""
+    live.record_purchase(payment.voucher_type.type_code, payment.quantity, payment.total_amount)
@@ -0,0 +1,75 @@
+"""
+Async Stripe calls for the async payment views.
+
+stripe-python 7 only talks HTTP synchronously. Here the request is sent with
+httpx and awaited, while stripe-python still builds the headers and parameters
+and turns the response into a StripeObject or the usual ``stripe.error``
+exception, so callers get what ``stripe.PaymentIntent.create`` and
+``retrieve`` return. Calls are timed like the synchronous ones.
+"""
+
+import asyncio
+import functools
+import uuid
+import weakref
+from urllib.parse import quote_plus
+
+import httpx
+import stripe
+from stripe import api_requestor, util
+
+from voucher_project.metrics import stripe_operation, track_external
+
+# stripe-python's own default
+TIMEOUT = 80
+
+_clients = weakref.WeakKeyDictionary()
+
+
+def _client():
+    # A connection pool per event loop: an httpx client cannot be shared between loops
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        client = _clients[loop] = httpx.AsyncClient(timeout=TIMEOUT)
+    return client
+
+
+@functools.lru_cache(maxsize=None)
+def _headers(api_key):
+    # The client user agent is built from platform details, once
+    return api_requestor.APIRequestor(key=api_key).request_headers(api_key, 'get')
+
+
+async def _request(method, path, params=None):
+    api_key = stripe.api_key
+    if not api_key:
+        raise stripe.error.AuthenticationError('No API key provided.')
+    requestor = api_requestor.APIRequestor(key=api_key)
+    url = f'{stripe.api_base}{path}'
+    encoded = api_requestor.urlencode(list(api_requestor._api_encode(params or {})))
+    headers = dict(_headers(api_key))
+    if method == 'post':
+        headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        headers['Idempotency-Key'] = str(uuid.uuid4())
+        content = encoded
+    else:
+        url = f'{url}?{encoded}' if encoded else url
+        content = None
+
+    try:
+        with track_external('stripe', stripe_operation(method, url)):
+            response = await _client().request(method.upper(), url, headers=headers, content=content)
+    except httpx.HTTPError as e:
+        raise stripe.error.APIConnectionError(f'Unexpected error communicating with Stripe: {e!r}')
+
+    stripe_response = requestor.interpret_response(response.content, response.status_code, response.headers)
+    return util.convert_to_stripe_object(stripe_response, api_key, requestor.api_version, None)
+
+
+async def create_payment_intent(**params):
+    return await _request('post', '/v1/payment_intents', params)
+
+
+async def retrieve_payment_intent(intent_id):
+    return await _request('get', f'/v1/payment_intents/{quote_plus(intent_id)}')
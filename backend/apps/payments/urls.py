@@ -1,5 +1,6 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import async_views, views
 
 urlpatterns = [
     path('history/', views.PaymentHistoryView.as_view(), name='payment-history'),
@@ -8,3 +9,13 @@ urlpatterns = [
     path('refund/request/', views.request_refund, name='request-refund'),
     path('refunds/', views.UserRefundsView.as_view(), name='user-refunds'),
 ]
+
+if settings.ASYNC_VIEWS:
+    # Same URLs and names, served by the async views under ASGI
+    urlpatterns = [
+        path('create-intent/', async_views.create_payment_intent, name='create-payment-intent'),
+        path('confirm/', async_views.confirm_payment, name='confirm-payment'),
+    ] + [
+        pattern for pattern in urlpatterns
+        if pattern.name not in ('create-payment-intent', 'confirm-payment')
+    ]
@@ -1,25 +1,28 @@
 import stripe
 from stripe.error import APIError as StripeError  # type: ignore # If this fails, use: from stripe.error import APIError as StripeError
 from django.conf import settings
-from django.utils import timezone
 from rest_framework import status, generics, permissions
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from django.shortcuts import get_object_or_404
-from django.db import transaction
 
-from .models import Payment, PaymentVoucher, Refund
+from .models import Payment, Refund
 from .serializers import (
     PaymentSerializer, PaymentIntentSerializer, 
     RefundRequestSerializer, RefundSerializer
 )
-from apps.vouchers.models import VoucherType, Voucher, VoucherDiscount
+from .services import CheckoutError, fulfil_payment, intent_response, new_payment, price_purchase, record_sale
+from voucher_project.db_router import ReplicaReadMixin
+from voucher_project.fieldsets import SparseListMixin
+from voucher_project.metrics import instrument_stripe
 
 # Initialize Stripe
 stripe.api_key = settings.STRIPE_SECRET_KEY
+stripe.api_base = settings.STRIPE_API_BASE
+instrument_stripe()
 
 
-class PaymentHistoryView(generics.ListAPIView):
+class PaymentHistoryView(ReplicaReadMixin, SparseListMixin, generics.ListAPIView):
     """List user's payment history"""
     serializer_class = PaymentSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -42,58 +45,21 @@ def create_payment_intent(request):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
     validated_data = serializer.validated_data
-    voucher_type_id = validated_data.get('voucher_type_id') # type: ignore
-    quantity = validated_data.get('quantity') # type: ignore
-    discount_code = validated_data.get('discount_code') # type: ignore
-    payment_method = validated_data.get('payment_method') # type: ignore
-    currency = validated_data.get('currency', 'usd') # type: ignore
-    
-    voucher_type = get_object_or_404(VoucherType, id=voucher_type_id, is_active=True)
-    
-    # Calculate total amount
-    if quantity is None:
-        return Response({'error': 'Quantity is required'}, status=status.HTTP_400_BAD_REQUEST)
     try:
-        quantity = int(quantity)
-    except (TypeError, ValueError):
-        return Response({'error': 'Quantity must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
-    amount = voucher_type.price * quantity
-    discount_amount = 0
-    
-    # Apply discount if provided
-    if discount_code:
-        try:
-            discount = VoucherDiscount.objects.get(code=discount_code, is_active=True)
-            if discount.is_valid and voucher_type in discount.applicable_types.all():
-                if discount.discount_type == 'percentage':
-                    discount_amount = amount * (discount.discount_value / 100)
-                else:
-                    discount_amount = discount.discount_value
-                
-                amount -= discount_amount
-        except VoucherDiscount.DoesNotExist:
-            return Response({
-                'error': 'Invalid discount code'
-            }, status=status.HTTP_400_BAD_REQUEST)
+        voucher_type, quantity, amount, discount_amount = price_purchase(validated_data)
+    except CheckoutError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
     
     try:
         # Create payment record
-        payment = Payment.objects.create(
-            user=request.user,
-            amount=voucher_type.price,
-            currency=currency,
-            payment_method=payment_method,
-            voucher_type=voucher_type,
-            quantity=quantity,
-            discount_amount=discount_amount,
-            discount_code=discount_code
-        )
+        payment = new_payment(request.user, validated_data, voucher_type, quantity, discount_amount)
+        payment.save()
         
-        if payment_method == 'stripe':
+        if payment.payment_method == 'stripe':
             # Create Stripe payment intent
             intent = stripe.PaymentIntent.create(
                 amount=int(amount * 100),  # Stripe uses cents
-                currency=currency.lower(),
+                currency=payment.currency.lower(),
                 metadata={
                     'payment_id': str(payment.id),
                     'user_id': str(request.user.id),
@@ -104,13 +70,7 @@ def create_payment_intent(request):
             payment.stripe_payment_intent_id = intent.id
             payment.save()
             
-            return Response({
-                'payment_id': payment.id,
-                'client_secret': intent.client_secret,
-                'amount': float(amount),
-                'currency': currency,
-                'payment': PaymentSerializer(payment).data
-            }, status=status.HTTP_201_CREATED)
+            return Response(intent_response(payment, intent, amount), status=status.HTTP_201_CREATED)
         
         else:
             return Response({
@@ -124,8 +84,6 @@ def create_payment_intent(request):
         return Response({
             'error': f'Internal error: {str(e)}'
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-    
-    return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
 @api_view(['POST'])
@@ -160,43 +118,9 @@ def confirm_payment(request):
                 'error': 'Payment already processed'
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        with transaction.atomic():
-            # Update payment status
-            payment.status = 'completed'
-            payment.completed_at = timezone.now()
-            payment.stripe_charge_id = str(intent.latest_charge) if intent.latest_charge else None
-            payment.save()
-            
-            # Create vouchers
-            vouchers = []
-            for _ in range(payment.quantity):
-                voucher = Voucher.objects.create(
-                    voucher_type=payment.voucher_type,
-                    user=payment.user,
-                    transaction_id=str(payment.id)
-                )
-                
-                # Link payment to voucher
-                PaymentVoucher.objects.create(
-                    payment=payment,
-                    voucher=voucher
-                )
-                vouchers.append(voucher)
-            
-            # Update discount usage if applicable
-            if payment.discount_code:
-                try:
-                    discount = VoucherDiscount.objects.get(code=payment.discount_code)
-                    discount.current_uses += 1
-                    discount.save()
-                except VoucherDiscount.DoesNotExist:
-                    pass
-        
-        return Response({
-            'message': 'Payment confirmed and vouchers created',
-            'payment': PaymentSerializer(payment).data,
-            'voucher_codes': [v.code for v in vouchers]
-        }, status=status.HTTP_200_OK)
+        data = fulfil_payment(payment, intent)
+        record_sale(payment)
+        return Response(data, status=status.HTTP_200_OK)
     except StripeError as e:
         return Response({
             'error': f'Payment verification failed: {str(e)}'
@@ -253,7 +177,7 @@ def request_refund(request):
 
 from django.db.models.query import QuerySet
 
-class UserRefundsView(generics.ListAPIView):
+class UserRefundsView(ReplicaReadMixin, SparseListMixin, generics.ListAPIView):
     """List user's refund requests"""
     serializer_class = RefundSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -1,10 +1,32 @@
-from django.contrib import admin
+from django import forms
+from django.contrib import admin, messages
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
+from django.shortcuts import redirect
+from django.template.response import TemplateResponse
+from django.urls import path
+
+from apps.vouchers.models import VoucherType
+from .importers import StudentImporter, read_rows
 from .models import User, UserProfile
+from voucher_project.db_router import ReplicaChangelistMixin
+
+
+class StudentImportForm(forms.Form):
+    file = forms.FileField(help_text='CSV or XLSX with an email column; first_name, last_name, '
+                                     'username, student_id, institution, graduation_year and '
+                                     'phone_number are optional.')
+    institution = forms.CharField(required=False, help_text='Used for rows without an institution')
+    voucher_type = forms.ModelChoiceField(
+        queryset=VoucherType.objects.filter(is_active=True),
+        required=False,
+        help_text='Issue vouchers of this type to each new student'
+    )
+    vouchers_per_student = forms.IntegerField(min_value=1, initial=1)
+    send_invitations = forms.BooleanField(required=False, initial=True)
 
 
 @admin.register(User)
-class UserAdmin(BaseUserAdmin):
+class UserAdmin(ReplicaChangelistMixin, BaseUserAdmin):
     list_display = ['email', 'username', 'first_name', 'last_name', 'is_verified', 'date_joined']
     list_filter = ['is_verified', 'is_staff', 'is_active', 'date_joined']
     search_fields = ['email', 'username', 'first_name', 'last_name']
@@ -18,10 +40,59 @@ class UserAdmin(BaseUserAdmin):
             'fields': ('student_id', 'institution', 'graduation_year')
         }),
     ]
+    
+    def get_urls(self):
+        urls = [
+            path(
+                'import-students/',
+                self.admin_site.admin_view(self.import_students_view),
+                name='users_user_import_students'
+            ),
+        ]
+        return urls + super().get_urls()
+    
+    def import_students_view(self, request):
+        """Bulk import students from a spreadsheet"""
+        if not self.has_add_permission(request):
+            return redirect('admin:users_user_changelist')
+        
+        form = StudentImportForm(request.POST or None, request.FILES or None)
+        if request.method == 'POST' and form.is_valid():
+            upload = form.cleaned_data['file']
+            importer = StudentImporter(
+                institution=form.cleaned_data['institution'] or None,
+                voucher_type=form.cleaned_data['voucher_type'],
+                vouchers_per_student=form.cleaned_data['vouchers_per_student'],
+                send_invitations=form.cleaned_data['send_invitations'],
+            )
+            try:
+                result = importer.run(read_rows(upload.file, upload.name))
+            except ValueError as e:
+                form.add_error('file', str(e))
+            else:
+                self.message_user(
+                    request,
+                    f'Created {result.created} student(s) and {result.vouchers} voucher(s), '
+                    f'queued {result.invitations} invitation(s); {result.skipped} already registered.',
+                    messages.SUCCESS
+                )
+                for row_number, message in result.errors[:50]:
+                    self.message_user(request, f'Row {row_number}: {message}', messages.WARNING)
+                if len(result.errors) > 50:
+                    self.message_user(request, f'...and {len(result.errors) - 50} more row errors', messages.WARNING)
+                return redirect('admin:users_user_changelist')
+        
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': 'Import students',
+            'form': form,
+        }
+        return TemplateResponse(request, 'admin/users/user/import_students.html', context)
 
 
 @admin.register(UserProfile)
-class UserProfileAdmin(admin.ModelAdmin):
+class UserProfileAdmin(ReplicaChangelistMixin, admin.ModelAdmin):
     list_display = ['user', 'location', 'created_at']
     search_fields = ['user__email', 'user__username', 'location']
     list_filter = ['created_at']
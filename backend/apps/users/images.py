@@ -0,0 +1,75 @@
+"""
+Profile picture thumbnails.
+
+Uploads are stored as-is by the request, then a Celery worker renders WebP
+variants. JPEGs are decoded at a reduced scale with ``Image.draft`` so a
+phone photo never has to be fully decoded, and each variant is produced by
+shrinking the previous one, so peak memory is roughly one decoded image at
+the largest variant size.
+"""
+
+import io
+import os
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+VARIANT_DIR = 'profile_pics/variants'
+
+
+def variant_sizes():
+    """Variant name -> longest edge in pixels, largest first"""
+    return dict(sorted(settings.PROFILE_PICTURE_VARIANTS.items(), key=lambda item: -item[1]))
+
+
+def _variant_name(user_id, source_name, variant):
+    stem = os.path.splitext(os.path.basename(source_name))[0]
+    return f'{VARIANT_DIR}/{user_id}/{stem}-{variant}.webp'
+
+
+def _open_scaled(file, max_edge):
+    image = Image.open(file)
+    # Refuse decompression bombs before any pixels are decoded
+    if image.width * image.height > settings.PROFILE_PICTURE_MAX_PIXELS:
+        raise ValueError(f'Image is too large ({image.width}x{image.height})')
+    # JPEG only: decode at 1/2, 1/4 or 1/8 scale, still at least max_edge
+    image.draft('RGB', (max_edge, max_edge))
+    image = ImageOps.exif_transpose(image)
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'transparency' in image.info or image.mode in ('LA', 'PA') else 'RGB')
+    return image
+
+
+def render_variants(user_id, source_name, storage=default_storage):
+    """Write WebP variants for a stored picture, returns {variant: storage name}"""
+    sizes = variant_sizes()
+    with storage.open(source_name, 'rb') as file:
+        image = _open_scaled(file, max(sizes.values()))
+        image.load()
+
+    variants = {}
+    for variant, edge in sizes.items():
+        image.thumbnail((edge, edge), Image.LANCZOS)
+        buffer = io.BytesIO()
+        image.save(buffer, 'WEBP', quality=settings.PROFILE_PICTURE_WEBP_QUALITY, method=4)
+        name = _variant_name(user_id, source_name, variant)
+        if storage.exists(name):
+            storage.delete(name)
+        variants[variant] = storage.save(name, ContentFile(buffer.getvalue()))
+    return variants
+
+
+def delete_variants(variants, storage=default_storage):
+    for name in (variants or {}).values():
+        if name and storage.exists(name):
+            storage.delete(name)
+
+
+def variant_urls(user, request=None):
+    urls = {}
+    for variant, name in (user.profile_picture_variants or {}).items():
+        url = default_storage.url(name)
+        urls[variant] = request.build_absolute_uri(url) if request is not None else url
+    return urls
@@ -0,0 +1,294 @@
+"""
+Bulk onboarding of students from institution spreadsheets.
+
+Rows are streamed from CSV or XLSX and processed in chunks. Each chunk is
+validated against the database with case-insensitive queries for existing
+emails and usernames, then users, their profiles and optional vouchers are
+inserted with ``bulk_create`` in one transaction. If someone registers one
+of the chunk's emails or usernames in between, the chunk falls back to one
+insert per row and reports the rows that clash. Imported users get an
+unusable password; they set their own through an invitation link, which uses
+the password reset token flow.
+
+``bulk_create`` sends no ``post_save``, so the profile that the
+``create_user_profile`` signal would add is created here instead.
+"""
+
+import csv
+import io
+import re
+from datetime import timedelta
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import IntegrityError, transaction
+from django.db.models.functions import Lower
+from django.utils import timezone
+from django.utils.crypto import get_random_string
+
+from apps.notifications.emails import queue_invitations
+from apps.vouchers.models import Voucher
+from .models import UserProfile
+
+try:
+    import openpyxl
+except ImportError:  # openpyxl is optional, CSV is always available
+    openpyxl = None
+
+User = get_user_model()
+
+DEFAULT_CHUNK_SIZE = 500
+COLUMNS = (
+    'email', 'first_name', 'last_name', 'username', 'student_id',
+    'institution', 'graduation_year', 'phone_number',
+)
+MAX_CODE_ATTEMPTS = 3
+
+
+class ImportResult:
+    def __init__(self):
+        self.created = 0
+        self.skipped = 0
+        self.vouchers = 0
+        self.invitations = 0
+        self.errors = []
+
+    def add_error(self, row_number, message):
+        self.errors.append((row_number, message))
+
+
+def _normalise_header(value):
+    return re.sub(r'[^a-z0-9]+', '_', str(value or '').strip().lower()).strip('_')
+
+
+def _rows_as_dicts(header, rows):
+    columns = [_normalise_header(name) for name in header]
+    if 'email' not in columns:
+        raise ValueError("The file must have an 'email' column.")
+    for row in rows:
+        values = dict(zip(columns, row))
+        if any(value not in (None, '') for value in values.values()):
+            yield values
+
+
+def read_csv(file):
+    """Yield row dicts from a binary or text CSV file"""
+    if isinstance(file, io.TextIOBase):
+        text = file
+    else:
+        text = io.TextIOWrapper(file, encoding='utf-8-sig', newline='')
+    reader = csv.reader(text)
+    header = next(reader, None)
+    if header is None:
+        return
+    yield from _rows_as_dicts(header, reader)
+
+
+def read_xlsx(file):
+    """Yield row dicts from the first sheet of an XLSX workbook"""
+    if openpyxl is None:
+        raise ValueError("XLSX import needs openpyxl. Install it or upload a CSV file.")
+    workbook = openpyxl.load_workbook(file, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        yield from _rows_as_dicts(header, rows)
+    finally:
+        workbook.close()
+
+
+def read_rows(file, filename):
+    if filename.lower().endswith('.xlsx'):
+        return read_xlsx(file)
+    if filename.lower().endswith('.csv'):
+        return read_csv(file)
+    raise ValueError("Unsupported file type. Upload a .csv or .xlsx file.")
+
+
+def _existing(field, values):
+    """Lowercased values of ``field`` that already exist, compared case-insensitively"""
+    return set(
+        User.objects.annotate(folded=Lower(field)).filter(
+            folded__in=[value.lower() for value in values]
+        ).values_list('folded', flat=True)
+    )
+
+
+def _clean(value):
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        # Spreadsheets turn numeric IDs and years into floats
+        value = int(value)
+    return str(value).strip()
+
+
+class StudentImporter:
+    """Create students, profiles and vouchers from spreadsheet rows"""
+
+    def __init__(self, institution=None, voucher_type=None, vouchers_per_student=1,
+                 send_invitations=False, chunk_size=DEFAULT_CHUNK_SIZE):
+        self.institution = institution
+        self.voucher_type = voucher_type
+        self.vouchers_per_student = vouchers_per_student if voucher_type else 0
+        self.send_invitations = send_invitations
+        self.chunk_size = chunk_size
+        self.batch_id = timezone.now().strftime('%Y%m%d%H%M%S')
+        self.seen_emails = set()
+        self.seen_usernames = set()
+
+    def run(self, rows, dry_run=False):
+        result = ImportResult()
+        numbered = enumerate(rows, start=2)  # Row 1 is the header
+        while True:
+            chunk = list(islice(numbered, self.chunk_size))
+            if not chunk:
+                break
+            with transaction.atomic():
+                self._import_chunk(chunk, result)
+                if dry_run:
+                    transaction.set_rollback(True)
+        return result
+
+    def _validate(self, row_number, row, result):
+        # Lowercases the domain only, as registration does
+        email = User.objects.normalize_email(_clean(row.get('email')))
+        try:
+            validate_email(email)
+        except ValidationError:
+            result.add_error(row_number, f"Invalid email '{email}'")
+            return None
+        if email.lower() in self.seen_emails:
+            result.add_error(row_number, f"Duplicate email '{email}' in file")
+            return None
+
+        graduation_year = _clean(row.get('graduation_year'))
+        if graduation_year:
+            if not graduation_year.isdigit():
+                result.add_error(row_number, f"Invalid graduation year '{graduation_year}'")
+                return None
+            graduation_year = int(graduation_year)
+
+        self.seen_emails.add(email.lower())
+        return {
+            'email': email,
+            'username': _clean(row.get('username')),
+            'first_name': _clean(row.get('first_name'))[:150],
+            'last_name': _clean(row.get('last_name'))[:150],
+            'student_id': _clean(row.get('student_id'))[:50] or None,
+            'institution': (_clean(row.get('institution')) or self.institution or '')[:255] or None,
+            'graduation_year': graduation_year or None,
+            'phone_number': _clean(row.get('phone_number'))[:20] or None,
+        }
+
+    def _username_for(self, requested, email, taken):
+        base = User.normalize_username(requested or email.split('@')[0])[:140] or 'student'
+        username = base
+        while username.lower() in taken:
+            username = f'{base}{get_random_string(4, "0123456789")}'
+        taken.add(username.lower())
+        return username
+
+    def _import_chunk(self, chunk, result):
+        candidates = []
+        for row_number, row in chunk:
+            cleaned = self._validate(row_number, row, result)
+            if cleaned is not None:
+                candidates.append((row_number, cleaned))
+        if not candidates:
+            return
+
+        existing_emails = _existing('email', [data['email'] for _, data in candidates])
+        requested = [
+            data['username'] or data['email'].split('@')[0] for _, data in candidates
+        ]
+        taken = self.seen_usernames | _existing('username', requested)
+
+        rows = []
+        for row_number, data in candidates:
+            if data['email'].lower() in existing_emails:
+                result.skipped += 1
+                continue
+            requested_username = data['username']
+            data['username'] = self._username_for(requested_username, data['email'], taken)
+            rows.append((row_number, data, requested_username))
+
+        # Usernames given a random suffix were never looked up; draw again
+        # for any that turn out to exist
+        unchecked = rows
+        while unchecked:
+            clashes = _existing('username', [data['username'] for _, data, _ in unchecked])
+            taken |= clashes
+            unchecked = [row for row in unchecked if row[1]['username'].lower() in clashes]
+            for _, data, requested_username in unchecked:
+                data['username'] = self._username_for(requested_username, data['email'], taken)
+        self.seen_usernames = taken
+        if not rows:
+            return
+
+        users = self._insert_users([(row_number, data) for row_number, data, _ in rows], result)
+        result.created += len(users)
+        if not users:
+            return
+
+        if self.vouchers_per_student:
+            result.vouchers += self._mint_vouchers(users)
+
+        if self.send_invitations:
+            result.invitations += queue_invitations(users)
+
+    def _insert_users(self, rows, result):
+        """Insert users and their profiles, returns the users inserted"""
+        try:
+            with transaction.atomic():
+                return self._bulk_insert([data for _, data in rows])
+        except IntegrityError:
+            pass
+        # Registered since the check; insert one at a time to find which rows clash
+        users = []
+        for row_number, data in rows:
+            try:
+                with transaction.atomic():
+                    users += self._bulk_insert([data])
+            except IntegrityError:
+                result.add_error(
+                    row_number, f"Email '{data['email']}' or username '{data['username']}' was taken during the import"
+                )
+        return users
+
+    def _bulk_insert(self, rows):
+        users = User.objects.bulk_create([
+            User(password=make_password(None), is_active=True, **data) for data in rows
+        ])
+        UserProfile.objects.bulk_create([UserProfile(user=user) for user in users])
+        return users
+
+    def _mint_vouchers(self, users):
+        expires_at = timezone.now() + timedelta(days=self.voucher_type.validity_days)
+        for attempt in range(MAX_CODE_ATTEMPTS):
+            # Voucher.save() fills these in, bulk_create does not call it
+            vouchers = [
+                Voucher(
+                    voucher_type=self.voucher_type,
+                    user=user,
+                    code=Voucher.generate_voucher_code(),
+                    expires_at=expires_at,
+                    transaction_id=f'import:{self.batch_id}',
+                    metadata={'source': 'student_import'},
+                )
+                for user in users
+                for _ in range(self.vouchers_per_student)
+            ]
+            try:
+                with transaction.atomic():
+                    Voucher.objects.bulk_create(vouchers)
+                return len(vouchers)
+            except IntegrityError:
+                # A code collided, draw a fresh set
+                if attempt == MAX_CODE_ATTEMPTS - 1:
+                    raise
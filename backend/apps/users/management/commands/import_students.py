@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.users.importers import DEFAULT_CHUNK_SIZE, StudentImporter, read_rows
+from apps.vouchers.models import VoucherType
+
+
+class Command(BaseCommand):
+    help = 'Import students from a CSV or XLSX file, optionally issuing vouchers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('file', help='Path to a .csv or .xlsx file with an email column')
+        parser.add_argument('--institution', help='Institution for rows that do not name one')
+        parser.add_argument('--voucher-type', help='Type code of vouchers to issue to each new student')
+        parser.add_argument('--vouchers-per-student', type=int, default=1)
+        parser.add_argument('--send-invitations', action='store_true', help='Email each new student a link to set a password')
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help='Rows validated and inserted per transaction')
+        parser.add_argument('--dry-run', action='store_true', help='Validate and report without saving anything')
+
+    def handle(self, *args, **options):
+        voucher_type = None
+        if options['voucher_type']:
+            try:
+                voucher_type = VoucherType.objects.get(type_code=options['voucher_type'], is_active=True)
+            except VoucherType.DoesNotExist:
+                raise CommandError(f"Unknown or inactive voucher type '{options['voucher_type']}'")
+
+        importer = StudentImporter(
+            institution=options['institution'],
+            voucher_type=voucher_type,
+            vouchers_per_student=options['vouchers_per_student'],
+            send_invitations=options['send_invitations'],
+            chunk_size=options['chunk_size'],
+        )
+
+        try:
+            with open(options['file'], 'rb') as file:
+                result = importer.run(read_rows(file, options['file']), dry_run=options['dry_run'])
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+
+        for row_number, message in result.errors:
+            self.stderr.write(f'Row {row_number}: {message}')
+
+        prefix = 'Dry run: would have created' if options['dry_run'] else 'Created'
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ {prefix} {result.created} student(s) and {result.vouchers} voucher(s), '
+            f'queued {result.invitations} invitation(s); '
+            f'{result.skipped} already registered, {len(result.errors)} row error(s)'
+        ))
@@ -1,10 +1,19 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
+from django.conf import settings
+from .images import variant_urls
 from .models import UserProfile
 
 User = get_user_model()
 
 
+def validate_picture_size(value):
+    if value and value.size > settings.PROFILE_PICTURE_MAX_UPLOAD_BYTES:
+        limit = settings.PROFILE_PICTURE_MAX_UPLOAD_BYTES // (1024 * 1024)
+        raise serializers.ValidationError(f"Profile pictures must be {limit} MB or smaller.")
+    return value
+
+
 class UserProfileSerializer(serializers.ModelSerializer):
     class Meta:
         model = UserProfile
@@ -14,16 +23,23 @@ class UserProfileSerializer(serializers.ModelSerializer):
 class UserSerializer(serializers.ModelSerializer):
     profile = UserProfileSerializer(read_only=True)
     full_name = serializers.CharField(read_only=True)
+    profile_picture_variants = serializers.SerializerMethodField()
     
     class Meta:
         model = User
         fields = [
             'id', 'username', 'email', 'first_name', 'last_name', 'full_name',
-            'phone_number', 'date_of_birth', 'profile_picture', 'is_verified',
-            'student_id', 'institution', 'graduation_year', 'profile',
+            'phone_number', 'date_of_birth', 'profile_picture', 'profile_picture_variants',
+            'is_verified', 'student_id', 'institution', 'graduation_year', 'profile',
             'created_at', 'updated_at'
         ]
         read_only_fields = ['id', 'is_verified', 'created_at', 'updated_at']
+    
+    def get_profile_picture_variants(self, obj):
+        return variant_urls(obj, self.context.get('request'))
+    
+    def validate_profile_picture(self, value):
+        return validate_picture_size(value)
 
 
 class UserUpdateSerializer(serializers.ModelSerializer):
@@ -33,6 +49,9 @@ class UserUpdateSerializer(serializers.ModelSerializer):
             'first_name', 'last_name', 'phone_number', 'date_of_birth',
             'profile_picture', 'student_id', 'institution', 'graduation_year'
         ]
+    
+    def validate_profile_picture(self, value):
+        return validate_picture_size(value)
 
 
 class ChangePasswordSerializer(serializers.Serializer):
@@ -0,0 +1,90 @@
+"""
+Profile read path.
+
+The user and their profile are fetched in one joined query and the
+serialized payload is cached per user. Cache keys carry a per-user version
+that is bumped whenever the user or profile is saved, so stale payloads are
+never read and simply expire. A failed bump is logged rather than failing
+the save; PROFILE_CACHE_SECONDS bounds how long the old payload is served.
+Reads never write: a user without a profile row gets the profile defaults.
+
+The payload is cached with relative media URLs and made absolute per
+request, so one entry serves every host the API is reached on.
+"""
+
+import logging
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+
+from .models import UserProfile
+from .serializers import UserProfileSerializer, UserSerializer
+
+User = get_user_model()
+logger = logging.getLogger('voucher_app')
+
+VERSION_KEY = 'users:profile:version:{user_id}'
+PAYLOAD_KEY = 'users:profile:v{version}:{user_id}'
+# Outlives any payload, so a version that expires and restarts at 1 never
+# meets a payload written under the old 1
+VERSION_TIMEOUT = 60 * 60 * 24
+
+
+def _version(user_id):
+    key = VERSION_KEY.format(user_id=user_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, 1, VERSION_TIMEOUT)
+        version = cache.get(key, 1)
+    return version
+
+
+def invalidate_profile(user_id):
+    """Move the user to a new cache version; cache errors are logged, not raised"""
+    key = VERSION_KEY.format(user_id=user_id)
+    try:
+        cache.add(key, 1, VERSION_TIMEOUT)
+        try:
+            cache.incr(key)
+        except ValueError:
+            # Expired between add and incr
+            cache.add(key, 2, VERSION_TIMEOUT)
+        cache.touch(key, VERSION_TIMEOUT)
+    except Exception as e:
+        logger.warning(f'Profile cache invalidation failed for user {user_id}: {e}')
+
+
+def build_profile_payload(user_id):
+    """Serialize the user and profile from one query, or None for unknown users"""
+    user = User.objects.select_related('profile').filter(pk=user_id).first()
+    if user is None:
+        return None
+    data = UserSerializer(user).data
+    if data['profile'] is None:
+        data['profile'] = UserProfileSerializer(UserProfile(user=user)).data
+    return data
+
+
+def _absolute(data, request):
+    if request is None:
+        return data
+    data = dict(data)
+    if data['profile_picture']:
+        data['profile_picture'] = request.build_absolute_uri(data['profile_picture'])
+    data['profile_picture_variants'] = {
+        variant: request.build_absolute_uri(url)
+        for variant, url in data['profile_picture_variants'].items()
+    }
+    return data
+
+
+def get_profile_payload(user_id, request=None):
+    key = PAYLOAD_KEY.format(version=_version(user_id), user_id=user_id)
+    data = cache.get(key)
+    if data is None:
+        data = build_profile_payload(user_id)
+        if data is None:
+            return None
+        cache.set(key, data, settings.PROFILE_CACHE_SECONDS)
+    return _absolute(data, request)
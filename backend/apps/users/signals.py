@@ -1,6 +1,11 @@
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 from .models import User, UserProfile
+from .services import invalidate_profile
+
+# Saves limited to these fields do not change the profile payload
+UNSERIALIZED_FIELDS = {'last_login', 'password'}
 
 
 @receiver(post_save, sender=User)
@@ -8,3 +13,15 @@ def create_user_profile(sender, instance, created, **kwargs):
     """Create UserProfile when User is created"""
     if created:
         UserProfile.objects.create(user=instance)
+
+
+@receiver([post_save, post_delete], sender=User)
+@receiver([post_save, post_delete], sender=UserProfile)
+def invalidate_cached_profile(sender, instance, update_fields=None, **kwargs):
+    """Move the user's cached profile payload to a new version"""
+    if update_fields and set(update_fields) <= UNSERIALIZED_FIELDS:
+        return
+    user_id = instance.pk if sender is User else instance.user_id
+    invalidate_profile(user_id)
+    # Also after commit, in case a concurrent request cached the old row
+    transaction.on_commit(lambda: invalidate_profile(user_id))
@@ -0,0 +1,32 @@
+import logging
+
+from celery import shared_task
+from django.contrib.auth import get_user_model
+from PIL import Image, UnidentifiedImageError
+
+from .images import delete_variants, render_variants
+from .services import invalidate_profile
+
+logger = logging.getLogger('voucher_app')
+
+User = get_user_model()
+
+
+@shared_task(ignore_result=True, autoretry_for=(OSError,), retry_backoff=True, max_retries=3)
+def process_profile_picture(user_id, source_name):
+    """Render WebP thumbnails for a newly uploaded profile picture"""
+    try:
+        variants = render_variants(user_id, source_name)
+    except (UnidentifiedImageError, ValueError, Image.DecompressionBombError) as e:
+        logger.warning(f'Could not process profile picture {source_name}: {e}')
+        return
+    
+    # Only attach the variants if the picture was not replaced meanwhile
+    updated = User.objects.filter(pk=user_id, profile_picture=source_name).update(
+        profile_picture_variants=variants
+    )
+    if not updated:
+        delete_variants(variants)
+        return
+    # update() sends no post_save
+    invalidate_profile(user_id)
@@ -0,0 +1,52 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from apps.users.models import User, UserProfile
+from apps.users.services import VERSION_KEY
+
+# Nothing listens on port 1; the L1 tier still holds catalog keys
+UNREACHABLE_REDIS = {
+    'default': {
+        'BACKEND': 'voucher_project.cache.TwoTierCache',
+        'LOCATION': 'redis://127.0.0.1:1/0',
+        'OPTIONS': {
+            'L1_POLICIES': {'catalog:': 30},
+            'socket_connect_timeout': 0.1,
+            'socket_timeout': 0.1,
+        },
+    }
+}
+
+
+@override_settings(CACHES=UNREACHABLE_REDIS)
+class RedisUnavailableTests(TestCase):
+    def test_user_saves_without_redis(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            user = User.objects.create_user(
+                email='offline@example.test', username='offline', password='pass', first_name='Off', last_name='Line'
+            )
+            user.first_name = 'Still'
+            user.save()
+
+        self.assertTrue(UserProfile.objects.filter(user=user).exists())
+        self.assertIsNone(cache.incr(VERSION_KEY.format(user_id=user.pk)))
+
+    def test_incr_falls_back_to_the_local_tier(self):
+        cache.set('catalog:counter', 1)
+
+        self.assertEqual(cache.incr('catalog:counter'), 2)
+        self.assertEqual(cache.get('catalog:counter'), 2)
+
+
+class InvalidationFailureTests(TestCase):
+    def test_cache_error_does_not_abort_the_save(self):
+        with mock.patch.object(cache, 'incr', side_effect=RuntimeError('cache down')):
+            with self.assertLogs('voucher_app', 'WARNING'):
+                with self.captureOnCommitCallbacks(execute=True):
+                    user = User.objects.create_user(
+                        email='flaky@example.test', username='flaky', password='pass', first_name='Fla', last_name='Ky'
+                    )
+
+        self.assertTrue(UserProfile.objects.filter(user=user).exists())
@@ -2,7 +2,10 @@ from rest_framework import generics, status, permissions
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from django.contrib.auth import get_user_model
-from django.contrib.auth.hashers import check_password
+from django.db import transaction
+from apps.authentication import hashing
+from .images import delete_variants
+from .services import get_profile_payload
 from .models import UserProfile
 from .serializers import (
     UserSerializer, UserUpdateSerializer, 
@@ -12,22 +15,51 @@ from .serializers import (
 User = get_user_model()
 
 
-class UserProfileView(generics.RetrieveUpdateAPIView):
+class ProfilePictureMixin:
+    """Hand new profile pictures to the thumbnail worker after saving"""
+    
+    def perform_update(self, serializer):
+        previous = serializer.instance.profile_picture.name
+        old_variants = serializer.instance.profile_picture_variants
+        if 'profile_picture' not in serializer.validated_data:
+            serializer.save()
+            return
+        
+        user = serializer.save(profile_picture_variants={})
+        current = user.profile_picture.name
+        if current == previous:
+            return
+        
+        def after_commit():
+            from .tasks import process_profile_picture
+            delete_variants(old_variants)
+            if current:
+                process_profile_picture.delay(user.pk, current)
+        
+        transaction.on_commit(after_commit)
+
+
+class UserProfileView(ProfilePictureMixin, generics.RetrieveUpdateAPIView):
     """Get and update user profile"""
     serializer_class = UserSerializer
     permission_classes = [permissions.IsAuthenticated]
     
+    def retrieve(self, request, *args, **kwargs):
+        return Response(get_profile_payload(request.user.pk, request))
+    
     def get_object(self): # type: ignore
-        return self.request.user
+        # request.user only carries the authentication fields
+        return User.objects.select_related('profile').get(pk=self.request.user.pk)
 
 
-class UpdateUserProfileView(generics.UpdateAPIView):
+class UpdateUserProfileView(ProfilePictureMixin, generics.UpdateAPIView):
     """Update user profile information"""
     serializer_class = UserUpdateSerializer
     permission_classes = [permissions.IsAuthenticated]
     
     def get_object(self): # type: ignore
-        return self.request.user
+        # request.user only carries the authentication fields
+        return User.objects.get(pk=self.request.user.pk)
 
 
 @api_view(['POST'])
@@ -39,7 +71,7 @@ def change_password(request):
     if not serializer.is_valid():
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-    user = request.user
+    user = User.objects.get(pk=request.user.pk)
     old_password = serializer.validated_data.get('old_password') # type: ignore
     new_password = serializer.validated_data.get('new_password') # type: ignore
     
@@ -49,13 +81,13 @@ def change_password(request):
             status=status.HTTP_400_BAD_REQUEST
         )
 
-    if not check_password(old_password, user.password):
+    if not hashing.check_password(old_password, user.password):
         return Response(
             {'error': 'Old password is incorrect.'}, 
             status=status.HTTP_400_BAD_REQUEST
         )
     
-    user.set_password(new_password)
+    hashing.set_password(user, new_password)
     user.save()
     
     return Response(
@@ -69,6 +101,9 @@ class UserProfileDetailView(generics.RetrieveUpdateAPIView):
     serializer_class = UserProfileSerializer
     permission_classes = [permissions.IsAuthenticated]
     
+    def retrieve(self, request, *args, **kwargs):
+        return Response(get_profile_payload(request.user.pk, request)['profile'])
+    
     def get_object(self): # type: ignore
         profile, created = UserProfile.objects.get_or_create(user=self.request.user)
         return profile
@@ -1,5 +1,6 @@
 from django.contrib import admin
 from .models import VoucherType, Voucher, VoucherUsage, VoucherDiscount
+from voucher_project.db_router import ReplicaChangelistMixin
 
 
 @admin.register(VoucherType)
@@ -11,7 +12,7 @@ class VoucherTypeAdmin(admin.ModelAdmin):
 
 
 @admin.register(Voucher)
-class VoucherAdmin(admin.ModelAdmin):
+class VoucherAdmin(ReplicaChangelistMixin, admin.ModelAdmin):
     list_display = ['code', 'voucher_type', 'user', 'status', 'usage_count', 'issued_at', 'expires_at']
     list_filter = ['status', 'voucher_type', 'issued_at']
     search_fields = ['code', 'user__email', 'user__username']
@@ -23,7 +24,7 @@ class VoucherAdmin(admin.ModelAdmin):
 
 
 @admin.register(VoucherUsage)
-class VoucherUsageAdmin(admin.ModelAdmin):
+class VoucherUsageAdmin(ReplicaChangelistMixin, admin.ModelAdmin):
     list_display = ['voucher', 'user', 'service_type', 'used_at']
     list_filter = ['service_type', 'used_at']
     search_fields = ['voucher__code', 'user__email', 'service_type']
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class VouchersConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.vouchers'
+
+    def ready(self):
+        import apps.vouchers.signals
@@ -0,0 +1,89 @@
+"""
+Cached voucher catalog: active voucher types and discount rules.
+
+Both change rarely and are read on every browse, purchase and checkout, so
+they live under the ``catalog:`` prefix, which the cache backend also keeps in
+each process's local tier (see voucher_project/cache.py). Saves and deletes
+invalidate them (see ``signals.py``); bulk ``QuerySet.update()`` calls bypass
+signals and must call ``invalidate_voucher_types`` or ``invalidate_discount``
+themselves.
+
+Cached objects are shared; functions returning model instances hand out copies.
+"""
+
+import copy
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import VoucherDiscount, VoucherType
+
+VOUCHER_TYPES_KEY = 'catalog:voucher_types:v1'
+VOUCHER_TYPE_LIST_KEY = 'catalog:voucher_type_list:v1'
+DISCOUNT_KEY = 'catalog:discount:v1:{digest}'
+
+# Cached for unknown discount codes, so guessing codes does not reach the database
+_NO_DISCOUNT = 'none'
+
+
+def _active_voucher_types():
+    types = cache.get(VOUCHER_TYPES_KEY)
+    if types is None:
+        types = {
+            voucher_type.pk: voucher_type
+            for voucher_type in VoucherType.objects.filter(is_active=True).order_by('id')
+        }
+        cache.set(VOUCHER_TYPES_KEY, types, settings.CATALOG_CACHE_SECONDS)
+    return types
+
+
+def get_active_voucher_type(pk):
+    """An active VoucherType by primary key, or None"""
+    voucher_type = _active_voucher_types().get(pk)
+    return copy.copy(voucher_type) if voucher_type is not None else None
+
+
+def voucher_type_list():
+    """Serialized active voucher types, ordered by id, as listed by the API"""
+    from .serializers import VoucherTypeSerializer
+
+    data = cache.get(VOUCHER_TYPE_LIST_KEY)
+    if data is None:
+        types = _active_voucher_types().values()
+        data = [dict(item) for item in VoucherTypeSerializer(types, many=True).data]
+        cache.set(VOUCHER_TYPE_LIST_KEY, data, settings.CATALOG_CACHE_SECONDS)
+    return data
+
+
+def _discount_key(code):
+    # Codes come from request bodies; hashing keeps the key short and printable
+    return DISCOUNT_KEY.format(digest=hashlib.sha1(code.encode()).hexdigest())
+
+
+def get_discount(code):
+    """
+    ``(discount, applicable_type_ids)`` for an active discount code, or None.
+    Whether it is currently valid is left to ``discount.is_valid``.
+    """
+    key = _discount_key(code)
+    entry = cache.get(key)
+    if entry is None:
+        discount = VoucherDiscount.objects.filter(code=code, is_active=True).first()
+        if discount is None:
+            entry = _NO_DISCOUNT
+        else:
+            entry = (discount, frozenset(discount.applicable_types.values_list('id', flat=True)))
+        cache.set(key, entry, settings.CATALOG_CACHE_SECONDS)
+    if entry == _NO_DISCOUNT:
+        return None
+    discount, type_ids = entry
+    return copy.copy(discount), type_ids
+
+
+def invalidate_voucher_types():
+    cache.delete_many([VOUCHER_TYPES_KEY, VOUCHER_TYPE_LIST_KEY])
+
+
+def invalidate_discount(code):
+    cache.delete(_discount_key(code))
@@ -0,0 +1,147 @@
+"""
+Read-only serialization for the voucher list endpoints.
+
+Builds exactly what ``VoucherSerializer`` and ``VoucherUsageSerializer``
+return, from ``values()`` rows instead of model instances: no serializer or
+field objects per row, one ``timezone.now()`` per page, and each voucher type
+serialized once per request (active ones come from the catalog) instead of
+once per voucher. ``?fields=`` and ``?expand=`` (see
+voucher_project/fieldsets.py) select both the output and the columns read.
+
+A field added to those serializers must be added here as well.
+"""
+
+from operator import itemgetter
+
+from django.utils import timezone
+from rest_framework.response import Response
+
+from voucher_project.fieldsets import FieldSet, SparseListMixin
+
+from .catalog import voucher_type_list
+from .models import VoucherType
+from .serializers import VoucherTypeSerializer
+
+# Field name -> columns it reads, in VoucherSerializer's field order
+VOUCHER_FIELDS = {
+    'id': ('id',),
+    'voucher_type': ('voucher_type_id',),
+    'code': ('code',),
+    'status': ('status',),
+    'usage_count': ('usage_count',),
+    'last_used_at': ('last_used_at',),
+    'issued_at': ('issued_at',),
+    'expires_at': ('expires_at',),
+    'voucher_is_valid': ('status', 'expires_at', 'usage_count', 'voucher_type_id'),
+    'days_until_expiry': ('expires_at',),
+    'metadata': ('metadata',),
+}
+# Same for VoucherUsageSerializer
+USAGE_FIELDS = {
+    'id': ('id',),
+    'voucher_code': ('voucher__code',),
+    'voucher_type_name': ('voucher__voucher_type__name',),
+    'service_type': ('service_type',),
+    'service_data': ('service_data',),
+    'used_at': ('used_at',),
+    'ip_address': ('ip_address',),
+}
+
+
+def format_datetime(value, tz):
+    """Same as DRF's DateTimeField.to_representation with the default ISO 8601 format"""
+    if not value:
+        return None
+    if timezone.is_aware(value):
+        value = value.astimezone(tz)
+    else:
+        value = timezone.make_aware(value, tz)
+    value = value.isoformat()
+    if value.endswith('+00:00'):
+        value = value[:-6] + 'Z'
+    return value
+
+
+def serialized_voucher_types(type_ids):
+    """Serialized voucher types by id; inactive ones are not in the catalog and are loaded here"""
+    types = {item['id']: dict(item) for item in voucher_type_list() if item['id'] in type_ids}
+    missing = set(type_ids) - types.keys()
+    if missing:
+        for item in VoucherTypeSerializer(VoucherType.objects.filter(pk__in=missing), many=True).data:
+            types[item['id']] = dict(item)
+    return types
+
+
+def serialize_vouchers(rows, fieldset=FieldSet()):
+    """VoucherSerializer output for rows with the columns of the requested VOUCHER_FIELDS"""
+    rows = list(rows)
+    names = fieldset.select(VOUCHER_FIELDS)
+    tz = timezone.get_current_timezone()
+    now = timezone.now()
+
+    types = {}
+    if 'voucher_type' in names or 'voucher_is_valid' in names:
+        types = serialized_voucher_types({row['voucher_type_id'] for row in rows})
+    if fieldset.embeds('voucher_type'):
+        embedded = {pk: fieldset.narrow('voucher_type', data) for pk, data in types.items()}
+        voucher_type = lambda row: embedded[row['voucher_type_id']]
+    else:
+        voucher_type = itemgetter('voucher_type_id')
+
+    build = {
+        'id': lambda row: str(row['id']),
+        'voucher_type': voucher_type,
+        'code': itemgetter('code'),
+        'status': itemgetter('status'),
+        'usage_count': itemgetter('usage_count'),
+        'last_used_at': lambda row: format_datetime(row['last_used_at'], tz),
+        'issued_at': lambda row: format_datetime(row['issued_at'], tz),
+        'expires_at': lambda row: format_datetime(row['expires_at'], tz),
+        'voucher_is_valid': lambda row: (
+            row['status'] == 'active' and now <= row['expires_at']
+            and row['usage_count'] < types[row['voucher_type_id']]['usage_limit']
+        ),
+        'days_until_expiry': lambda row: max(0, (row['expires_at'] - now).days) if row['expires_at'] else 0,
+        'metadata': itemgetter('metadata'),
+    }
+    builders = [(name, build[name]) for name in names]
+    return [{name: value(row) for name, value in builders} for row in rows]
+
+
+def serialize_usages(rows, fieldset=FieldSet()):
+    """VoucherUsageSerializer output for rows with the columns of the requested USAGE_FIELDS"""
+    tz = timezone.get_current_timezone()
+    build = {
+        'id': itemgetter('id'),
+        'voucher_code': itemgetter('voucher__code'),
+        'voucher_type_name': itemgetter('voucher__voucher_type__name'),
+        'service_type': itemgetter('service_type'),
+        'service_data': itemgetter('service_data'),
+        'used_at': lambda row: format_datetime(row['used_at'], tz),
+        'ip_address': itemgetter('ip_address'),
+    }
+    builders = [(name, build[name]) for name in fieldset.select(USAGE_FIELDS)]
+    return [{name: value(row) for name, value in builders} for row in rows]
+
+
+class RowListMixin(SparseListMixin):
+    """
+    For read-only ListAPIViews: paginate ``values()`` of the queryset, with
+    the columns the requested ``row_fields`` read, and build the response
+    with ``serialize_rows``.
+    """
+    # Field name -> columns, in output order
+    row_fields = {}
+    # A staticmethod taking the rows of a page and the FieldSet
+    serialize_rows = None
+
+    def list(self, request, *args, **kwargs):
+        fieldset = self.fieldset
+        columns = dict.fromkeys(
+            column for name in fieldset.select(self.row_fields) for column in self.row_fields[name]
+        )
+        queryset = self.filter_queryset(self.get_queryset()).values(*columns)
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(self.serialize_rows(page, fieldset))
+        return Response(self.serialize_rows(queryset, fieldset))
@@ -0,0 +1,342 @@
+"""
+Synthetic production-scale data for load and query testing.
+
+Users are generated in chunks; each chunk is built from its own seeded
+random generator, so a given seed and size always produce the same rows no
+matter how many worker processes run. Primary keys are assigned up front
+(integer ids from offsets past the current maximum, UUIDs from the seeded
+generator), which lets chunks be written in parallel without reading back
+ids. Rows go to PostgreSQL with ``COPY`` and to other backends with
+``bulk_create``.
+
+Every generated account is ``loaduser<id>@example.test`` and shares one
+password hash, so load tests can sign in as any of them.
+"""
+
+import csv
+import io
+import json
+import multiprocessing
+import random
+import uuid
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.color import no_style
+from django.db import connection, connections, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from apps.payments.models import Payment, PaymentVoucher, Refund
+from apps.users.models import User, UserProfile
+from .models import Voucher, VoucherType, VoucherUsage
+
+PRESETS = {
+    'small': 10_000,
+    'medium': 1_000_000,
+    'large': 20_000_000,
+}
+MEAN_VOUCHERS_PER_USER = 20
+EMAIL_DOMAIN = 'example.test'
+DEFAULT_PASSWORD = 'loadtest-pass'
+BATCH_SIZE = 5000
+INSTITUTIONS = [f'Load Test School {n}' for n in range(1, 41)]
+SERVICE_DATA = {'source': 'load_dataset'}
+
+USER_FIELDS = [
+    'id', 'password', 'is_superuser', 'username', 'first_name', 'last_name', 'email',
+    'is_staff', 'is_active', 'date_joined', 'last_login', 'is_verified', 'created_at',
+    'updated_at', 'institution', 'graduation_year',
+]
+PROFILE_FIELDS = ['id', 'user_id', 'created_at', 'updated_at']
+VOUCHER_FIELDS = [
+    'id', 'voucher_type_id', 'user_id', 'code', 'status', 'usage_count',
+    'last_used_at', 'issued_at', 'expires_at', 'transaction_id', 'updated_at',
+]
+PAYMENT_FIELDS = [
+    'id', 'user_id', 'amount', 'quantity', 'currency', 'status', 'payment_method',
+    'stripe_payment_intent_id', 'voucher_type_id', 'discount_amount', 'created_at',
+    'updated_at', 'completed_at',
+]
+LINK_FIELDS = ['id', 'payment_id', 'voucher_id', 'created_at']
+USAGE_FIELDS = ['id', 'voucher_id', 'user_id', 'service_type', 'service_data', 'used_at', 'ip_address']
+REFUND_FIELDS = ['id', 'payment_id', 'amount', 'reason', 'status', 'created_at', 'processed_at', 'updated_at']
+
+# Insert order respects foreign keys
+TABLES = [
+    (User, USER_FIELDS),
+    (UserProfile, PROFILE_FIELDS),
+    (Payment, PAYMENT_FIELDS),
+    (Voucher, VOUCHER_FIELDS),
+    (PaymentVoucher, LINK_FIELDS),
+    (VoucherUsage, USAGE_FIELDS),
+    (Refund, REFUND_FIELDS),
+]
+
+
+class Plan:
+    """Everything a worker needs, picklable for the process pool"""
+
+    def __init__(self, vouchers, seed, chunk_users, password_hash, voucher_types, offsets, now):
+        self.users = max(1, vouchers // MEAN_VOUCHERS_PER_USER)
+        self.seed = seed
+        self.chunk_users = chunk_users
+        self.password_hash = password_hash
+        # (id, type_code, price, validity_days, usage_limit)
+        self.voucher_types = voucher_types
+        self.offsets = offsets
+        self.now = now
+        self.max_vouchers_per_user = 2 * MEAN_VOUCHERS_PER_USER - 1
+        self.max_usage_limit = max(vt[4] for vt in voucher_types)
+
+    @property
+    def chunks(self):
+        return [
+            (index, start, min(start + self.chunk_users, self.users))
+            for index, start in enumerate(range(0, self.users, self.chunk_users))
+        ]
+
+
+def make_plan(vouchers, seed=1, chunk_users=1000, password=DEFAULT_PASSWORD):
+    voucher_types = list(VoucherType.objects.filter(is_active=True).order_by('id').values_list(
+        'id', 'type_code', 'price', 'validity_days', 'usage_limit'
+    ))
+    if not voucher_types:
+        raise ValueError('No active voucher types. Run create_sample_vouchers first.')
+    offsets = {
+        model: (model.objects.aggregate(top=Max('id'))['top'] or 0) + 1
+        for model in (User, UserProfile, PaymentVoucher, VoucherUsage)
+    }
+    return Plan(
+        vouchers, seed, chunk_users, make_password(password), voucher_types, offsets, timezone.now()
+    )
+
+
+def _uuid(rng):
+    return uuid.UUID(int=rng.getrandbits(128), version=4)
+
+
+def _base36(number, width):
+    digits = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+    out = ''
+    while number:
+        number, rest = divmod(number, 36)
+        out = digits[rest] + out
+    return out.rjust(width, '0')
+
+
+def _between(rng, start, end):
+    if end <= start:
+        return start
+    return start + timedelta(seconds=rng.uniform(0, (end - start).total_seconds()))
+
+
+def generate_chunk(plan, chunk_index, start, end):
+    """Rows per table for users [start, end), as {model: [tuple, ...]}"""
+    rng = random.Random(f'{plan.seed}:{chunk_index}')
+    now = plan.now
+    rows = {model: [] for model, _ in TABLES}
+    user_base = plan.offsets[User]
+
+    for user_index in range(start, end):
+        user_id = user_base + user_index
+        joined = now - timedelta(days=rng.uniform(0, 540))
+        rows[User].append((
+            user_id, plan.password_hash, False, f'loaduser{user_id}', 'Load', f'User {user_id}',
+            f'loaduser{user_id}@{EMAIL_DOMAIN}', False, rng.random() > 0.01, joined,
+            _between(rng, joined, now) if rng.random() < 0.8 else None, rng.random() < 0.6,
+            joined, joined, rng.choice(INSTITUTIONS), joined.year + rng.randint(0, 4),
+        ))
+        rows[UserProfile].append((plan.offsets[UserProfile] + user_index, user_id, joined, joined))
+
+        # 1..39 vouchers, 20 on average, bought in purchases of one to three
+        count = rng.randint(1, plan.max_vouchers_per_user)
+        slot_base = user_index * plan.max_vouchers_per_user
+        k = 0
+        while k < count:
+            type_id, type_code, price, validity_days, usage_limit = rng.choice(plan.voucher_types)
+            quantity = min(rng.choices((1, 2, 3), weights=(70, 20, 10))[0], count - k)
+            bought = _between(rng, joined, now)
+            online = rng.random() < 0.85
+
+            payment_id = None
+            if online:
+                payment_id = _uuid(rng)
+                discount = Decimal('0.00') if rng.random() < 0.9 else (price * quantity / 10).quantize(Decimal('0.01'))
+                refunded = rng.random() < 0.03
+                rows[Payment].append((
+                    payment_id, user_id, price, quantity, 'USD', 'refunded' if refunded else 'completed',
+                    'stripe', f'pi_load{payment_id.hex[:24]}', type_id, discount, bought, bought, bought,
+                ))
+                if refunded:
+                    rows[Refund].append((
+                        _uuid(rng), payment_id, price * quantity - discount,
+                        rng.choice(('customer_request', 'duplicate_payment', 'other')),
+                        rng.choices(('completed', 'pending', 'failed'), weights=(80, 15, 5))[0],
+                        bought + timedelta(days=1), bought + timedelta(days=2), bought + timedelta(days=2),
+                    ))
+
+            for _ in range(quantity):
+                slot = slot_base + k
+                voucher_id = _uuid(rng)
+                expires = bought + timedelta(days=validity_days)
+                used = 0
+                if rng.random() < 0.02:
+                    status = 'cancelled'
+                else:
+                    # Most vouchers get used at least once, some before they expire
+                    used = rng.choices(range(usage_limit + 1), weights=[30] + [70 // usage_limit] * usage_limit)[0]
+                    if used >= usage_limit:
+                        status = 'used'
+                    elif expires < now:
+                        status = 'expired'
+                    else:
+                        status = 'active'
+                use_times = sorted(_between(rng, bought, min(expires, now)) for _ in range(used))
+                rows[Voucher].append((
+                    voucher_id, type_id, user_id, 'L' + _base36(user_id, 7) + _base36(k, 4), status, used,
+                    use_times[-1] if use_times else None, bought, expires,
+                    str(payment_id) if payment_id else None, use_times[-1] if use_times else bought,
+                ))
+                if payment_id:
+                    rows[PaymentVoucher].append((plan.offsets[PaymentVoucher] + slot, payment_id, voucher_id, bought))
+                for n, used_at in enumerate(use_times):
+                    rows[VoucherUsage].append((
+                        plan.offsets[VoucherUsage] + slot * plan.max_usage_limit + n, voucher_id, user_id,
+                        type_code, SERVICE_DATA, used_at, f'10.{rng.randint(0, 255)}.{rng.randint(0, 255)}.{rng.randint(1, 254)}',
+                    ))
+                k += 1
+
+        # Abandoned and failed checkouts leave payments without vouchers
+        if rng.random() < 0.1:
+            type_id, _, price, _, _ = rng.choice(plan.voucher_types)
+            created = _between(rng, joined, now)
+            payment_id = _uuid(rng)
+            rows[Payment].append((
+                payment_id, user_id, price, 1, 'USD', rng.choice(('pending', 'failed', 'cancelled')),
+                'stripe', f'pi_load{payment_id.hex[:24]}', type_id, Decimal('0.00'), created, created, None,
+            ))
+    return rows
+
+
+@contextmanager
+def historical_timestamps(models):
+    """Let bulk_create keep the generated created/issued/used times"""
+    changed = []
+    for model in models:
+        for field in model._meta.concrete_fields:
+            if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False):
+                changed.append((field, field.auto_now, field.auto_now_add))
+                field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in changed:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def _bulk_create(model, field_names, rows):
+    for start in range(0, len(rows), BATCH_SIZE):
+        model.objects.bulk_create(
+            [model(**dict(zip(field_names, row))) for row in rows[start:start + BATCH_SIZE]],
+            batch_size=BATCH_SIZE
+        )
+
+
+def _copy_value(field, value):
+    if value is None:
+        return r'\N'
+    if field.get_internal_type() == 'JSONField':
+        return json.dumps(value)
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    return str(value)
+
+
+def _copy(model, field_names, rows):
+    """Stream rows with COPY; columns left out take their model defaults"""
+    meta = model._meta
+    given = [meta.get_field(name) for name in field_names]
+    given_names = {field.attname for field in given}
+    defaults = [
+        (field, field.get_default()) for field in meta.concrete_fields if field.attname not in given_names
+    ]
+    columns = [field.column for field in given] + [field.column for field, _ in defaults]
+    default_values = [_copy_value(field, value) for field, value in defaults]
+
+    for start in range(0, len(rows), BATCH_SIZE * 4):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows[start:start + BATCH_SIZE * 4]:
+            writer.writerow([_copy_value(field, value) for field, value in zip(given, row)] + default_values)
+        buffer.seek(0)
+        quoted = ', '.join(connection.ops.quote_name(column) for column in columns)
+        with connection.cursor() as cursor:
+            cursor.cursor.copy_expert(
+                f"COPY {connection.ops.quote_name(meta.db_table)} ({quoted}) FROM STDIN WITH (FORMAT csv, NULL '\\N')",
+                buffer
+            )
+
+
+def write_chunk(plan, chunk):
+    """Generate and insert one chunk in its own transaction, returns row counts"""
+    rows = generate_chunk(plan, *chunk)
+    use_copy = connection.vendor == 'postgresql'
+    with transaction.atomic(), historical_timestamps([model for model, _ in TABLES]):
+        for model, field_names in TABLES:
+            if use_copy:
+                _copy(model, field_names, rows[model])
+            else:
+                _bulk_create(model, field_names, rows[model])
+    return {model.__name__: len(rows[model]) for model, _ in TABLES}
+
+
+def _write_chunk_in_worker(args):
+    plan, chunk = args
+    try:
+        return write_chunk(plan, chunk)
+    finally:
+        connections.close_all()
+
+
+def reset_sequences():
+    """Move id sequences past the explicitly assigned ids (PostgreSQL only needs this)"""
+    statements = connection.ops.sequence_reset_sql(no_style(), [User, UserProfile, PaymentVoucher, VoucherUsage])
+    if statements:
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
+
+
+def generate(plan, workers=1, progress=None):
+    """Write every chunk, in a process pool when workers > 1; returns total row counts"""
+    totals = {}
+    chunks = plan.chunks
+
+    def add(counts):
+        for name, count in counts.items():
+            totals[name] = totals.get(name, 0) + count
+        if progress:
+            progress(totals)
+
+    if workers > 1 and connection.vendor != 'sqlite':
+        # Children must open their own connections
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        with context.Pool(workers) as pool:
+            for counts in pool.imap_unordered(_write_chunk_in_worker, [(plan, chunk) for chunk in chunks]):
+                add(counts)
+    else:
+        for chunk in chunks:
+            add(write_chunk(plan, chunk))
+
+    reset_sequences()
+    return totals
+
+
+def clear():
+    """Delete previously generated users; their vouchers, payments and usage cascade"""
+    deleted, _ = User.objects.filter(email__endswith=f'@{EMAIL_DOMAIN}', username__startswith='loaduser').delete()
+    return deleted
@@ -0,0 +1,65 @@
+import io
+import timeit
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from apps.payments.models import Payment
+from apps.payments.serializers import PaymentSerializer
+from apps.vouchers.models import Voucher
+from apps.vouchers.serializers import VoucherSerializer
+from voucher_project import fastjson
+from voucher_project.fastjson import FastJSONParser, FastJSONRenderer
+
+
+class Command(BaseCommand):
+    help = "Compare DRF's JSON renderer and parser with the orjson ones on voucher and payment lists"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100, help='Objects per list')
+        parser.add_argument('--repeat', type=int, default=200, help='Runs per measurement')
+
+    def handle(self, *args, **options):
+        if fastjson.orjson is None:
+            raise CommandError('orjson is not installed; FastJSONRenderer is the stock renderer')
+        rows, repeat = options['rows'], options['repeat']
+
+        vouchers = list(Voucher.objects.select_related('voucher_type').order_by('-id')[:rows])
+        payments = list(Payment.objects.select_related('voucher_type').order_by('-id')[:rows])
+        if not vouchers:
+            raise CommandError('No vouchers; run generate_load_dataset first')
+
+        payloads = {
+            'vouchers': VoucherSerializer(vouchers, many=True),
+            'payments': PaymentSerializer(payments, many=True),
+        }
+        stock_renderer, fast_renderer = JSONRenderer(), FastJSONRenderer()
+        stock_parser, fast_parser = JSONParser(), FastJSONParser()
+
+        self.stdout.write(f'{"payload":<10} {"rows":>5} {"step":<10} {"stock ms":>9} {"orjson ms":>10} {"speedup":>8}')
+        for name, serializer in payloads.items():
+            data = serializer.data
+            body = stock_renderer.render(data)
+            if fast_renderer.render(data) != body:
+                raise CommandError(f'{name}: orjson output differs from the stock renderer')
+            if fast_parser.parse(io.BytesIO(body)) != stock_parser.parse(io.BytesIO(body)):
+                raise CommandError(f'{name}: orjson parses the body differently')
+
+            serialize = self._time(lambda: serializer.child.__class__(serializer.instance, many=True).data, repeat)
+            self.stdout.write(f'{name:<10} {len(data):>5} {"serialize":<10} {serialize:>9.3f}')
+            steps = {
+                'render': (lambda: stock_renderer.render(data), lambda: fast_renderer.render(data)),
+                'parse': (lambda: stock_parser.parse(io.BytesIO(body)), lambda: fast_parser.parse(io.BytesIO(body))),
+            }
+            for step, (stock, fast) in steps.items():
+                stock_ms, fast_ms = self._time(stock, repeat), self._time(fast, repeat)
+                self.stdout.write(
+                    f'{name:<10} {len(data):>5} {step:<10} {stock_ms:>9.3f} {fast_ms:>10.3f} {stock_ms / fast_ms:>7.1f}x'
+                )
+
+        self.stdout.write(self.style.SUCCESS('✅ orjson output is identical to the stock renderer'))
+
+    def _time(self, func, repeat):
+        """Best of five, in milliseconds per call"""
+        return min(timeit.repeat(func, number=repeat, repeat=5)) / repeat * 1000
@@ -0,0 +1,65 @@
+import os
+import time
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from apps.vouchers import load_dataset
+from apps.users.models import User
+from apps.vouchers.models import VoucherType
+
+
+class Command(BaseCommand):
+    help = 'Generate a production-scale synthetic dataset (users, vouchers, payments, usage, refunds) for load testing'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--preset', choices=sorted(load_dataset.PRESETS), default='small',
+                            help='small: 10k vouchers, medium: 1M, large: 20M')
+        parser.add_argument('--vouchers', type=int, help='Approximate voucher count, overrides --preset')
+        parser.add_argument('--seed', type=int, default=1, help='Same seed and size, same data')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help='Writer processes (always 1 on SQLite)')
+        parser.add_argument('--chunk-users', type=int, default=1000, help='Users per worker transaction')
+        parser.add_argument('--clear', action='store_true', help='Delete previously generated users first')
+
+    def handle(self, *args, **options):
+        vouchers = options['vouchers'] or load_dataset.PRESETS[options['preset']]
+        if vouchers < 1 or options['chunk_users'] < 1:
+            raise CommandError('--vouchers and --chunk-users must be positive')
+
+        if options['clear']:
+            deleted = load_dataset.clear()
+            self.stdout.write(f'Deleted {deleted} rows from earlier runs')
+
+        if not VoucherType.objects.filter(is_active=True).exists():
+            call_command('create_sample_vouchers', stdout=self.stdout)
+
+        plan = load_dataset.make_plan(vouchers, options['seed'], options['chunk_users'])
+        workers = 1 if connection.vendor == 'sqlite' else max(1, options['workers'])
+        method = 'COPY' if connection.vendor == 'postgresql' else 'bulk_create'
+        self.stdout.write(
+            f'Generating {plan.users} users / ~{vouchers} vouchers in {len(plan.chunks)} chunk(s), '
+            f'{workers} worker(s), {method}'
+        )
+
+        start = time.monotonic()
+        done = {'Voucher': 0}
+
+        def progress(totals):
+            if totals['Voucher'] - done['Voucher'] >= 100_000:
+                done['Voucher'] = totals['Voucher']
+                rate = totals['Voucher'] / (time.monotonic() - start)
+                self.stdout.write(f'  {totals["Voucher"]} vouchers ({rate:.0f}/s)')
+
+        totals = load_dataset.generate(plan, workers, progress)
+        elapsed = time.monotonic() - start
+        first_id = plan.offsets[User]
+
+        for name, count in totals.items():
+            self.stdout.write(f'  {name}: {count}')
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Generated {totals["Voucher"]} vouchers in {elapsed:.1f}s. '
+            f'Sign in as loaduser<id>@{load_dataset.EMAIL_DOMAIN} / {load_dataset.DEFAULT_PASSWORD}, '
+            f'ids {first_id} to {first_id + plan.users - 1}'
+        ))
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.7 on 2026-10-19 19:05
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+import django.utils.timezone
+
+
+def backfill_updated_at(apps, schema_editor):
+    # The last change known for existing rows: their last use, else their issue
+    Voucher = apps.get_model('vouchers', 'Voucher')
+    Voucher.objects.update(updated_at=Coalesce('last_used_at', 'issued_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vouchers', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='voucher',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.RunPython(backfill_updated_at, migrations.RunPython.noop),
+    ]
@@ -69,6 +69,8 @@ class Voucher(models.Model):
     # Dates
     issued_at = models.DateTimeField(auto_now_add=True)
     expires_at = models.DateTimeField()
+    # Bumped by every save(); incremental exports watermark on it
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
     
     # Transaction reference
     transaction_id = models.CharField(max_length=100, blank=True, null=True)
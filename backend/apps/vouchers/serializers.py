@@ -1,7 +1,10 @@
 from rest_framework import serializers
 from .models import VoucherType, Voucher, VoucherUsage, VoucherDiscount
+from .catalog import get_active_voucher_type, get_discount
 from django.utils import timezone
 
+from voucher_project.fieldsets import SparseFieldsMixin
+
 
 class VoucherTypeSerializer(serializers.ModelSerializer):
     class Meta:
@@ -14,7 +17,7 @@ class VoucherTypeSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at', 'updated_at']
 
 
-class VoucherSerializer(serializers.ModelSerializer):
+class VoucherSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     voucher_type = VoucherTypeSerializer(read_only=True)
     voucher_is_valid = serializers.SerializerMethodField()
     days_until_expiry = serializers.IntegerField(read_only=True)
@@ -33,6 +36,11 @@ class VoucherSerializer(serializers.ModelSerializer):
             'id', 'code', 'usage_count', 'last_used_at',
             'issued_at', 'expires_at', 'voucher_is_valid', 'days_until_expiry'
         ]
+        # Columns read by fields that are not model fields, for ?fields=
+        field_sources = {
+            'voucher_is_valid': ['status', 'expires_at', 'usage_count', 'voucher_type__usage_limit'],
+            'days_until_expiry': ['expires_at'],
+        }
 
 
 class VoucherPurchaseSerializer(serializers.Serializer):
@@ -41,20 +49,17 @@ class VoucherPurchaseSerializer(serializers.Serializer):
     discount_code = serializers.CharField(required=False, allow_blank=True)
     
     def validate_voucher_type_id(self, value):
-        try:
-            voucher_type = VoucherType.objects.get(id=value, is_active=True)
-        except VoucherType.DoesNotExist:
+        if get_active_voucher_type(value) is None:
             raise serializers.ValidationError("Invalid or inactive voucher type.")
         return value
     
     def validate_discount_code(self, value):
         if value:
-            try:
-                discount = VoucherDiscount.objects.get(code=value, is_active=True)
-                if not discount.is_valid:
-                    raise serializers.ValidationError("Discount code is not valid or has expired.")
-            except VoucherDiscount.DoesNotExist:
+            entry = get_discount(value)
+            if entry is None:
                 raise serializers.ValidationError("Invalid discount code.")
+            if not entry[0].is_valid:
+                raise serializers.ValidationError("Discount code is not valid or has expired.")
         return value
 
 
@@ -73,7 +78,7 @@ class VoucherRedemptionSerializer(serializers.Serializer):
         return value.upper()
 
 
-class VoucherUsageSerializer(serializers.ModelSerializer):
+class VoucherUsageSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     voucher_code = serializers.CharField(source='voucher.code', read_only=True)
     voucher_type_name = serializers.CharField(source='voucher.voucher_type.name', read_only=True)
     
@@ -0,0 +1,45 @@
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from .catalog import invalidate_discount, invalidate_voucher_types
+from .models import VoucherDiscount, VoucherType
+
+
+def _invalidate(invalidate, *args):
+    invalidate(*args)
+    # Also after commit, in case a concurrent request re-cached the old rows
+    transaction.on_commit(lambda: invalidate(*args))
+
+
+@receiver([post_save, post_delete], sender=VoucherType)
+def invalidate_cached_voucher_types(sender, instance, **kwargs):
+    _invalidate(invalidate_voucher_types)
+
+
+@receiver(post_init, sender=VoucherDiscount)
+def remember_discount_code(sender, instance, **kwargs):
+    # A renamed code must drop the entry cached under the old one
+    instance._catalog_code = instance.__dict__.get('code')
+
+
+@receiver([post_save, post_delete], sender=VoucherDiscount)
+def invalidate_cached_discount(sender, instance, **kwargs):
+    for code in {instance._catalog_code, instance.code} - {None}:
+        _invalidate(invalidate_discount, code)
+    instance._catalog_code = instance.code
+
+
+@receiver(m2m_changed, sender=VoucherDiscount.applicable_types.through)
+def invalidate_discount_types(sender, instance, action, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if isinstance(instance, VoucherDiscount):
+        codes = [instance.code]
+    elif action == 'post_clear':
+        # pk_set is not given when clearing from the voucher type's side
+        codes = list(VoucherDiscount.objects.values_list('code', flat=True))
+    else:
+        codes = list(VoucherDiscount.objects.filter(pk__in=pk_set).values_list('code', flat=True))
+    for code in codes:
+        _invalidate(invalidate_discount, code)
@@ -1,18 +1,24 @@
 from rest_framework import generics, status, permissions
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, permission_classes, throttle_classes
 from rest_framework.response import Response
 from django.db.models import Sum, Count, Q
 from django.utils import timezone
-from django.shortcuts import get_object_or_404
-
-from .models import VoucherType, Voucher, VoucherUsage, VoucherDiscount
+from django.http import Http404
+
+from .models import VoucherType, Voucher, VoucherUsage
+from . import listing
+from .catalog import get_active_voucher_type, get_discount, voucher_type_list
+from apps.analytics import live
+from apps.notifications.emails import queue_voucher_delivery
+from voucher_project.db_router import ReplicaReadMixin
+from voucher_project.throttling import REDEEM_THROTTLES
 from .serializers import (
     VoucherTypeSerializer, VoucherSerializer, VoucherPurchaseSerializer,
     VoucherRedemptionSerializer, VoucherUsageSerializer, VoucherStatsSerializer
 )
 
 
-class VoucherTypeListView(generics.ListAPIView):
+class VoucherTypeListView(ReplicaReadMixin, generics.ListAPIView):
     """List all active voucher types"""
     serializer_class = VoucherTypeSerializer
     permission_classes = [permissions.AllowAny]
@@ -20,11 +26,21 @@ class VoucherTypeListView(generics.ListAPIView):
     def get_queryset(self): # type: ignore
         return VoucherType.objects.filter(is_active=True)
 
+    def list(self, request, *args, **kwargs):
+        # Served from the catalog cache, already serialized
+        data = voucher_type_list()
+        page = self.paginate_queryset(data)
+        if page is not None:
+            return self.get_paginated_response(page)
+        return Response(data)
+
 
-class UserVouchersListView(generics.ListAPIView):
+class UserVouchersListView(ReplicaReadMixin, listing.RowListMixin, generics.ListAPIView):
     """List user's vouchers"""
     serializer_class = VoucherSerializer
     permission_classes = [permissions.IsAuthenticated]
+    row_fields = listing.VOUCHER_FIELDS
+    serialize_rows = staticmethod(listing.serialize_vouchers)
     
     from typing import Any
     from django.db.models.query import QuerySet
@@ -52,25 +68,25 @@ def purchase_voucher(request):
     quantity = serializer.validated_data['quantity'] # type: ignore
     discount_code = serializer.validated_data.get('discount_code') # type: ignore
     
-    voucher_type = get_object_or_404(VoucherType, id=voucher_type_id, is_active=True)
+    voucher_type = get_active_voucher_type(voucher_type_id)
+    if voucher_type is None:
+        raise Http404
     
     # Calculate total price
     total_price = voucher_type.price * quantity
     
     # Apply discount if provided
     discount_amount = 0
-    if discount_code:
-        try:
-            discount = VoucherDiscount.objects.get(code=discount_code, is_active=True)
-            if discount.is_valid and voucher_type in discount.applicable_types.all():
-                if discount.discount_type == 'percentage':
-                    discount_amount = total_price * (discount.discount_value / 100)
-                else:
-                    discount_amount = discount.discount_value
-                
-                total_price -= discount_amount
-        except VoucherDiscount.DoesNotExist:
-            pass
+    entry = get_discount(discount_code) if discount_code else None
+    if entry is not None:
+        discount, applicable_type_ids = entry
+        if discount.is_valid and voucher_type.pk in applicable_type_ids:
+            if discount.discount_type == 'percentage':
+                discount_amount = total_price * (discount.discount_value / 100)
+            else:
+                discount_amount = discount.discount_value
+            
+            total_price -= discount_amount
     
     # This would integrate with your payment system
     # For now, we'll assume payment is successful and create vouchers
@@ -84,6 +100,9 @@ def purchase_voucher(request):
         )
         vouchers.append(voucher)
     
+    queue_voucher_delivery(request.user, vouchers)
+    live.record_purchase(voucher_type.type_code, quantity, total_price)
+    
     return Response({
         'message': f'Successfully purchased {quantity} voucher(s)',
         'vouchers': VoucherSerializer(vouchers, many=True).data,
@@ -94,6 +113,7 @@ def purchase_voucher(request):
 
 @api_view(['POST'])
 @permission_classes([permissions.IsAuthenticated])
+@throttle_classes(REDEEM_THROTTLES)
 def redeem_voucher(request):
     """Redeem voucher endpoint"""
     serializer = VoucherRedemptionSerializer(data=request.data)
@@ -179,10 +199,12 @@ def user_voucher_stats(request):
     return Response(serializer.data)
 
 
-class UserVoucherUsageListView(generics.ListAPIView):
+class UserVoucherUsageListView(ReplicaReadMixin, listing.RowListMixin, generics.ListAPIView):
     """List user's voucher usage history"""
     serializer_class = VoucherUsageSerializer
     permission_classes = [permissions.IsAuthenticated]
+    row_fields = listing.USAGE_FIELDS
+    serialize_rows = staticmethod(listing.serialize_usages)
     
     def get_queryset(self): # type: ignore
         return VoucherUsage.objects.filter(
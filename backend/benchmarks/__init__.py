@@ -0,0 +1,15 @@
+"""
+Load test harness for a running API server.
+
+Virtual users on one asyncio event loop sign in and run scripted journeys
+(checkout through Stripe, direct purchase and redeem, browsing, analytics)
+against a live server, while ``fake_stripe`` stands in for the Stripe API.
+Every request is timed per endpoint; a run is saved as JSON so runs on
+different commits can be compared.
+
+    python -m benchmarks fake-stripe
+    python -m benchmarks run --users-from 1 --users 200 --output results/main.json
+    python -m benchmarks compare results/main.json results/branch.json
+
+The harness does not import Django; it only talks HTTP.
+"""
@@ -0,0 +1,97 @@
+import argparse
+import asyncio
+import sys
+
+from . import fake_stripe, modes, results, runner
+from .journeys import DEFAULT_MIX, parse_mix
+
+
+def _emails(args):
+    return [args.email_template.format(id=user_id) for user_id in range(args.users_from, args.users_from + args.users)]
+
+
+def run(args):
+    emails = _emails(args)
+    mix = parse_mix(args.mix)
+    recorder = asyncio.run(runner.run(
+        args.base_url, emails, args.password, args.vus, args.duration, args.ramp_up, mix,
+        think=args.think_ms / 1000, timeout=args.timeout
+    ))
+    summary = results.summarize(recorder, {
+        'base_url': args.base_url,
+        'virtual_users': args.vus,
+        'accounts': len(emails),
+        'duration_s': args.duration,
+        'ramp_up_s': args.ramp_up,
+        'think_ms': args.think_ms,
+        'mix': mix,
+        'label': args.label,
+    })
+    print(results.format_table(summary))
+    if args.output:
+        results.save(summary, args.output)
+        print(f'Saved {args.output}')
+
+
+def compare(args):
+    table, regressions = results.compare(results.load(args.base), results.load(args.head), args.threshold)
+    print(table)
+    if regressions:
+        print(f'p95 regressed by more than {args.threshold}%: {", ".join(regressions)}')
+        return 1
+    return 0
+
+
+def _add_load_arguments(parser, mix=DEFAULT_MIX):
+    parser.add_argument('--vus', type=int, default=50, help='Concurrent virtual users')
+    parser.add_argument('--duration', type=float, default=60, help='Measured seconds')
+    parser.add_argument('--ramp-up', type=float, default=10, help='Seconds over which users start and sign in (not measured)')
+    parser.add_argument('--think-ms', type=float, default=0, help='Mean pause between journeys')
+    parser.add_argument('--mix', default=mix, help='Journey weights')
+    parser.add_argument('--users-from', type=int, default=1, help='First account id')
+    parser.add_argument('--users', type=int, default=100, help='Accounts to sign in as, shared round-robin by the virtual users')
+    parser.add_argument('--email-template', default='loaduser{id}@example.test')
+    parser.add_argument('--password', default='loadtest-pass')
+    parser.add_argument('--timeout', type=float, default=30)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description='Load test a running API server')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help='Run virtual users against a server')
+    run_parser.add_argument('--base-url', default='http://127.0.0.1:8000')
+    _add_load_arguments(run_parser)
+    run_parser.add_argument('--label', help='Free text stored with the results')
+    run_parser.add_argument('--output', help='Write the results to this JSON file')
+
+    compare_parser = commands.add_parser('compare', help='Compare two result files')
+    compare_parser.add_argument('base')
+    compare_parser.add_argument('head')
+    compare_parser.add_argument('--threshold', type=float, help='Exit 1 when any p95 grew by more than this percentage')
+
+    stripe_parser = commands.add_parser('fake-stripe', help='Serve the fake Stripe API')
+    stripe_parser.add_argument('--host', default='127.0.0.1')
+    stripe_parser.add_argument('--port', type=int, default=12111)
+    stripe_parser.add_argument('--latency-ms', type=float, default=0, help='Delay added to every response')
+
+    modes_parser = commands.add_parser('modes', help='Start gunicorn in each SERVER_MODE in turn and load test it')
+    modes_parser.add_argument('--modes', default='wsgi,asgi', help='Comma-separated SERVER_MODE values')
+    modes_parser.add_argument('--workers', type=int, default=2, help='WEB_CONCURRENCY, the same for every mode')
+    modes_parser.add_argument('--port', type=int, default=8077)
+    modes_parser.add_argument('--stripe-latency-ms', type=float, default=150, help='Delay added to every fake Stripe response')
+    _add_load_arguments(modes_parser, mix='checkout=1')
+    modes_parser.add_argument('--output-dir', help='Write <mode>.json result files here, for compare')
+
+    args = parser.parse_args(argv)
+    if args.command == 'run':
+        return run(args)
+    if args.command == 'compare':
+        return compare(args)
+    if args.command == 'modes':
+        return modes.compare_modes(args, _emails(args), parse_mix(args.mix))
+    fake_stripe.serve(args.host, args.port, args.latency_ms / 1000)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
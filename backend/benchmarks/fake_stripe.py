@@ -0,0 +1,113 @@
+"""
+Local stand-in for the parts of the Stripe API the payment views call.
+
+Point the server at it with STRIPE_API_BASE=http://127.0.0.1:12111 (and any
+STRIPE_SECRET_KEY). Payment intents are created as requires_payment_method
+and read back as succeeded, as if the client had confirmed the card. An
+optional delay emulates Stripe's own latency.
+"""
+
+import json
+import secrets
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl
+
+INTENTS_PATH = '/v1/payment_intents'
+
+
+class FakeStripe:
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.intents = {}
+        self.lock = threading.Lock()
+
+    def create_intent(self, form):
+        intent_id = f'pi_{secrets.token_hex(12)}'
+        intent = {
+            'id': intent_id,
+            'object': 'payment_intent',
+            'amount': int(form.get('amount', 0)),
+            'currency': form.get('currency', 'usd'),
+            'status': 'requires_payment_method',
+            'client_secret': f'{intent_id}_secret_{secrets.token_hex(12)}',
+            'latest_charge': None,
+            'metadata': {
+                key[len('metadata['):-1]: value for key, value in form.items() if key.startswith('metadata[')
+            },
+            'created': int(time.time()),
+            'livemode': False,
+        }
+        with self.lock:
+            self.intents[intent_id] = intent
+        return 200, intent
+
+    def retrieve_intent(self, intent_id):
+        with self.lock:
+            intent = self.intents.get(intent_id)
+            if intent is None:
+                return 404, {'error': {
+                    'type': 'invalid_request_error',
+                    'code': 'resource_missing',
+                    'message': f"No such payment_intent: '{intent_id}'",
+                }}
+            if intent['status'] != 'succeeded':
+                intent['status'] = 'succeeded'
+                intent['latest_charge'] = f'ch_{secrets.token_hex(12)}'
+            return 200, dict(intent)
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server_version = 'FakeStripe/1.0'
+
+    def _respond(self, status, body):
+        if self.server.stripe.latency:
+            time.sleep(self.server.stripe.latency)
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.send_header('Request-Id', f'req_{secrets.token_hex(7)}')
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _not_found(self):
+        self._respond(404, {'error': {'type': 'invalid_request_error', 'message': f'Unrecognized request URL ({self.path})'}})
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        form = dict(parse_qsl(self.rfile.read(length).decode()))
+        if self.path.split('?')[0] == INTENTS_PATH:
+            self._respond(*self.server.stripe.create_intent(form))
+        else:
+            self._not_found()
+
+    def do_GET(self):
+        path = self.path.split('?')[0]
+        if path.startswith(INTENTS_PATH + '/'):
+            self._respond(*self.server.stripe.retrieve_intent(path[len(INTENTS_PATH) + 1:]))
+        else:
+            self._not_found()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_server(host='127.0.0.1', port=12111, latency=0.0):
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    server.stripe = FakeStripe(latency)
+    return server
+
+
+def serve(host='127.0.0.1', port=12111, latency=0.0):
+    server = make_server(host, port, latency)
+    print(f'Fake Stripe listening on http://{host}:{server.server_address[1]} (latency {latency * 1000:.0f}ms)')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
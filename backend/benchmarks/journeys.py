@@ -0,0 +1,77 @@
+"""
+Scripted user journeys. Each is a coroutine taking a signed-in VirtualUser;
+the requests it makes are timed by the user's client.
+"""
+
+import random
+
+
+async def checkout(user):
+    """Pay through Stripe: create a payment intent, then confirm it"""
+    voucher_type = random.choice(user.voucher_types)
+    response = await user.post('/api/payments/create-intent/', {
+        'voucher_type_id': voucher_type['id'],
+        'quantity': random.choice((1, 1, 1, 2)),
+        'payment_method': 'stripe',
+    })
+    if response is None or response.status_code != 201:
+        return
+    # Stripe client secrets are "<intent id>_secret_<random>"
+    intent_id = response.json()['client_secret'].split('_secret_')[0]
+    response = await user.post('/api/payments/confirm/', {'payment_intent_id': intent_id})
+    if response is not None and response.status_code == 200:
+        user.codes.extend(response.json()['voucher_codes'])
+
+
+async def purchase_and_redeem(user):
+    """Buy a voucher directly and redeem it"""
+    voucher_type = random.choice(user.voucher_types)
+    response = await user.post('/api/vouchers/purchase/', {'voucher_type_id': voucher_type['id'], 'quantity': 1})
+    if response is not None and response.status_code == 201:
+        user.codes.extend(voucher['code'] for voucher in response.json()['vouchers'])
+    await redeem(user)
+
+
+async def redeem(user):
+    """Redeem one of the vouchers this user bought during the run"""
+    if not user.codes:
+        return
+    code = user.codes.pop()
+    await user.post('/api/vouchers/redeem/', {
+        'code': code,
+        'service_type': 'load_test',
+        'service_data': {'source': 'benchmarks'},
+    })
+
+
+async def browse(user):
+    """What the dashboard loads"""
+    await user.get('/api/vouchers/types/')
+    await user.get('/api/vouchers/my-vouchers/')
+    await user.get('/api/vouchers/stats/')
+    await user.get('/api/payments/history/')
+
+
+async def analytics(user):
+    await user.get('/api/analytics/user/')
+    await user.get('/api/vouchers/usage-history/')
+
+
+JOURNEYS = {
+    'checkout': checkout,
+    'purchase': purchase_and_redeem,
+    'browse': browse,
+    'analytics': analytics,
+}
+DEFAULT_MIX = 'checkout=3,purchase=2,browse=4,analytics=1'
+
+
+def parse_mix(text):
+    """'checkout=3,browse=1' -> {'checkout': 3, 'browse': 1}"""
+    mix = {}
+    for part in text.split(','):
+        name, _, weight = part.strip().partition('=')
+        if name not in JOURNEYS:
+            raise ValueError(f'Unknown journey {name!r}, choose from {", ".join(JOURNEYS)}')
+        mix[name] = int(weight or 1)
+    return mix
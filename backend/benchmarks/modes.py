@@ -0,0 +1,179 @@
+"""
+WSGI against ASGI on the same box: starts the fake Stripe and, for each
+SERVER_MODE in turn, gunicorn from gunicorn.conf.py with the same number of
+workers, runs the same virtual users against it and samples the workers'
+resident memory. Linux only (memory is read from /proc).
+"""
+
+import asyncio
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+import httpx
+
+from . import fake_stripe, results, runner
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+def _rss_bytes(pid):
+    try:
+        with open(f'/proc/{pid}/status') as status:
+            for line in status:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return 0
+
+
+def _children(pid):
+    children = []
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as stat:
+                # The command name is in parentheses and may contain spaces
+                fields = stat.read().rsplit(')', 1)[1].split()
+        except OSError:
+            continue
+        if int(fields[1]) == pid:
+            children.append(int(entry))
+    return children
+
+
+def workers_rss(master_pid):
+    """Resident memory of the gunicorn workers, in bytes"""
+    return sum(_rss_bytes(pid) for pid in _children(master_pid))
+
+
+async def _sample_memory(master_pid, samples, interval=1.0):
+    while True:
+        samples.append(workers_rss(master_pid))
+        await asyncio.sleep(interval)
+
+
+def _wait_until_up(base_url, process, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'gunicorn exited with status {process.returncode}')
+        try:
+            if httpx.get(f'{base_url}/api/health/', timeout=2).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    raise RuntimeError(f'{base_url} did not come up within {timeout}s')
+
+
+def start_server(mode, port, workers, stripe_base):
+    env = {
+        **os.environ,
+        'SERVER_MODE': mode,
+        'PORT': str(port),
+        'WEB_CONCURRENCY': str(workers),
+        'THROTTLING_ENABLED': 'False',
+        'STRIPE_SECRET_KEY': 'sk_test_fake',
+        'STRIPE_API_BASE': stripe_base,
+    }
+    return subprocess.Popen(
+        ['gunicorn', '--max-requests', '0'],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL,
+    )
+
+
+def stop_server(process):
+    process.send_signal(signal.SIGTERM)
+    try:
+        process.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+async def _measure(base_url, master_pid, emails, args, mix):
+    samples = []
+    sampler = asyncio.create_task(_sample_memory(master_pid, samples))
+    try:
+        recorder = await runner.run(
+            base_url, emails, args.password, args.vus, args.duration, args.ramp_up, mix,
+            think=args.think_ms / 1000, timeout=args.timeout
+        )
+    finally:
+        sampler.cancel()
+    return recorder, samples
+
+
+def run_mode(mode, emails, args, mix, stripe_base):
+    """Results summary of one mode, with the workers' memory under load"""
+    base_url = f'http://127.0.0.1:{args.port}'
+    process = start_server(mode, args.port, args.workers, stripe_base)
+    try:
+        _wait_until_up(base_url, process)
+        idle_rss = workers_rss(process.pid)
+        recorder, samples = asyncio.run(_measure(base_url, process.pid, emails, args, mix))
+    finally:
+        stop_server(process)
+
+    latencies = sorted(seconds for values in recorder.latencies.values() for seconds in values)
+    summary = results.summarize(recorder, {
+        'base_url': base_url,
+        'server_mode': mode,
+        'workers': args.workers,
+        'virtual_users': args.vus,
+        'accounts': len(emails),
+        'duration_s': args.duration,
+        'ramp_up_s': args.ramp_up,
+        'think_ms': args.think_ms,
+        'stripe_latency_ms': args.stripe_latency_ms,
+        'mix': mix,
+    })
+    summary['all_requests'] = {
+        'p95_ms': round(results.percentile(latencies, 95) * 1000, 2) if latencies else None,
+        'errors': sum(endpoint['errors'] for endpoint in summary['endpoints'].values()),
+    }
+    summary['memory'] = {
+        'idle_mb': round(idle_rss / 2**20, 1),
+        'peak_mb': round(max(samples, default=idle_rss) / 2**20, 1),
+    }
+    return summary
+
+
+def format_modes(summaries):
+    lines = [f'{"mode":<6} {"workers":>7} {"rps":>8} {"p95":>10} {"errors":>7} {"idle RSS":>10} {"peak RSS":>10}']
+    for mode, summary in summaries.items():
+        p95 = summary['all_requests']['p95_ms']
+        lines.append(
+            f'{mode:<6} {summary["meta"]["workers"]:>7} {summary["total"]["rps"]:>8.1f} '
+            f'{p95 if p95 is not None else 0:>8.1f}ms {summary["all_requests"]["errors"]:>7} '
+            f'{summary["memory"]["idle_mb"]:>8.1f}MB {summary["memory"]["peak_mb"]:>8.1f}MB'
+        )
+    return '\n'.join(lines)
+
+
+def compare_modes(args, emails, mix):
+    stripe = fake_stripe.make_server(port=0, latency=args.stripe_latency_ms / 1000)
+    threading.Thread(target=stripe.serve_forever, daemon=True).start()
+    stripe_base = f'http://127.0.0.1:{stripe.server_address[1]}'
+
+    summaries = {}
+    try:
+        for mode in args.modes.split(','):
+            print(f'Running {mode} ...', file=sys.stderr)
+            summaries[mode] = run_mode(mode, emails, args, mix, stripe_base)
+            print(results.format_table(summaries[mode]))
+            if args.output_dir:
+                path = Path(args.output_dir) / f'{mode}.json'
+                results.save(summaries[mode], path)
+                print(f'Saved {path}')
+    finally:
+        stripe.shutdown()
+        stripe.server_close()
+    print(format_modes(summaries))
@@ -0,0 +1,117 @@
+import json
+import math
+import platform
+import subprocess
+from datetime import datetime, timezone
+from pathlib import Path
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def _stats(latencies, elapsed):
+    values = sorted(latencies)
+
+    def ms(seconds):
+        return round(seconds * 1000, 2)
+
+    return {
+        'count': len(values),
+        'rps': round(len(values) / elapsed, 2),
+        'mean_ms': ms(sum(values) / len(values)),
+        'p50_ms': ms(percentile(values, 50)),
+        'p95_ms': ms(percentile(values, 95)),
+        'p99_ms': ms(percentile(values, 99)),
+        'max_ms': ms(values[-1]),
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def summarize(recorder, config):
+    elapsed = recorder.elapsed
+    endpoints = {}
+    for endpoint, latencies in sorted(recorder.latencies.items()):
+        stats = _stats(latencies, elapsed)
+        statuses = dict(recorder.statuses[endpoint])
+        stats['statuses'] = statuses
+        stats['errors'] = sum(count for status, count in statuses.items() if status == 'error' or status.startswith('5'))
+        endpoints[endpoint] = stats
+    total = sum(stats['count'] for stats in endpoints.values())
+    return {
+        'meta': {
+            'started_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'commit': _git_commit(),
+            'python': platform.python_version(),
+            'elapsed_s': round(elapsed, 2),
+            **config,
+        },
+        'total': {'count': total, 'rps': round(total / elapsed, 2)},
+        'endpoints': endpoints,
+        'journeys': {name: _stats(latencies, elapsed) for name, latencies in sorted(recorder.journeys.items())},
+    }
+
+
+def save(summary, path):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(summary, indent=2) + '\n')
+
+
+def load(path):
+    return json.loads(Path(path).read_text())
+
+
+def format_table(summary):
+    lines = [f'{"endpoint":<40} {"count":>7} {"rps":>8} {"p50":>8} {"p95":>8} {"p99":>8} {"errors":>6}']
+    rows = list(summary['endpoints'].items()) + [(f'journey {name}', s) for name, s in summary['journeys'].items()]
+    for name, s in rows:
+        lines.append(
+            f'{name:<40} {s["count"]:>7} {s["rps"]:>8.1f} {s["p50_ms"]:>7.1f}ms {s["p95_ms"]:>6.1f}ms '
+            f'{s["p99_ms"]:>6.1f}ms {s.get("errors", 0):>6}'
+        )
+    lines.append(f'{"total":<40} {summary["total"]["count"]:>7} {summary["total"]["rps"]:>8.1f}')
+    return '\n'.join(lines)
+
+
+def _change(old, new):
+    if not old:
+        return '    n/a'
+    return f'{(new - old) / old * 100:>+6.1f}%'
+
+
+def compare(base, head, threshold=None):
+    """
+    Table of RPS and p95 changes per endpoint from `base` to `head`, plus the
+    endpoints whose p95 grew by more than `threshold` percent.
+    """
+    lines = [f'{"endpoint":<40} {"rps":>17} {"change":>8} {"p95":>19} {"change":>8}']
+    regressions = []
+    for name in sorted(set(base['endpoints']) | set(head['endpoints'])):
+        old, new = base['endpoints'].get(name), head['endpoints'].get(name)
+        if old is None or new is None:
+            lines.append(f'{name:<40} only in {"head" if old is None else "base"}')
+            continue
+        lines.append(
+            f'{name:<40} {old["rps"]:>8.1f} → {new["rps"]:>6.1f} {_change(old["rps"], new["rps"]):>8} '
+            f'{old["p95_ms"]:>7.1f} → {new["p95_ms"]:>7.1f}ms {_change(old["p95_ms"], new["p95_ms"]):>8}'
+        )
+        if threshold is not None and old['p95_ms'] and (new['p95_ms'] - old['p95_ms']) / old['p95_ms'] * 100 > threshold:
+            regressions.append(name)
+    lines.append(
+        f'{"total":<40} {base["total"]["rps"]:>8.1f} → {head["total"]["rps"]:>6.1f} '
+        f'{_change(base["total"]["rps"], head["total"]["rps"]):>8}'
+    )
+    return '\n'.join(lines), regressions
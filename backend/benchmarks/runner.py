@@ -0,0 +1,135 @@
+import asyncio
+import random
+import sys
+import time
+from collections import defaultdict
+
+import httpx
+
+from .journeys import JOURNEYS
+
+
+class Recorder:
+    """Latencies and status codes per endpoint and per journey, inside the measurement window"""
+
+    def __init__(self):
+        self.recording = False
+        self.started = self.stopped = None
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+        self.journeys = defaultdict(list)
+
+    def start(self):
+        self.recording = True
+        self.started = time.perf_counter()
+
+    def stop(self):
+        self.recording = False
+        self.stopped = time.perf_counter()
+
+    @property
+    def elapsed(self):
+        return (self.stopped or time.perf_counter()) - self.started
+
+    def request(self, endpoint, status, seconds):
+        if self.recording:
+            self.latencies[endpoint].append(seconds)
+            self.statuses[endpoint][str(status)] += 1
+
+    def journey(self, name, seconds):
+        if self.recording:
+            self.journeys[name].append(seconds)
+
+
+class VirtualUser:
+    def __init__(self, client, recorder, email, password, voucher_types):
+        self.client = client
+        self.recorder = recorder
+        self.email = email
+        self.password = password
+        self.voucher_types = voucher_types
+        self.headers = {}
+        # Codes of vouchers bought during the run, still unredeemed
+        self.codes = []
+
+    async def request(self, method, path, json=None):
+        """Timed request; transport errors are counted as status 'error' and return None"""
+        start = time.perf_counter()
+        try:
+            response = await self.client.request(method, path, json=json, headers=self.headers)
+        except httpx.HTTPError:
+            self.recorder.request(f'{method} {path}', 'error', time.perf_counter() - start)
+            return None
+        self.recorder.request(f'{method} {path}', response.status_code, time.perf_counter() - start)
+        return response
+
+    async def get(self, path):
+        return await self.request('GET', path)
+
+    async def post(self, path, data):
+        return await self.request('POST', path, json=data)
+
+    async def login(self):
+        response = await self.post('/api/auth/login/', {'email': self.email, 'password': self.password})
+        if response is None or response.status_code != 200:
+            status = 'no response' if response is None else f'{response.status_code} {response.text[:200]}'
+            raise RuntimeError(f'Login failed for {self.email}: {status}')
+        self.headers = {'Authorization': f'Bearer {response.json()["access"]}'}
+
+
+async def fetch_voucher_types(client):
+    response = await client.get('/api/vouchers/types/')
+    response.raise_for_status()
+    data = response.json()
+    voucher_types = data['results'] if isinstance(data, dict) else data
+    if not voucher_types:
+        raise RuntimeError('The server has no active voucher types')
+    return voucher_types
+
+
+async def _virtual_user(user, mix, deadline, think, start_delay):
+    await asyncio.sleep(start_delay)
+    try:
+        await user.login()
+    except RuntimeError as e:
+        # The rest of the run goes on with one user fewer
+        print(e, file=sys.stderr)
+        return
+    names, weights = list(mix), list(mix.values())
+    loop = asyncio.get_running_loop()
+    while loop.time() < deadline:
+        name = random.choices(names, weights)[0]
+        start = time.perf_counter()
+        await JOURNEYS[name](user)
+        user.recorder.journey(name, time.perf_counter() - start)
+        if think:
+            await asyncio.sleep(random.expovariate(1 / think))
+
+
+async def run(base_url, emails, password, vus, duration, ramp_up, mix, think=0.0, timeout=30.0):
+    """
+    Run `vus` virtual users for `duration` seconds after a `ramp_up` during
+    which they start and sign in; only the `duration` window is measured.
+    """
+    recorder = Recorder()
+    limits = httpx.Limits(max_connections=vus, max_keepalive_connections=vus)
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limits) as client:
+        voucher_types = await fetch_voucher_types(client)
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + ramp_up + duration
+        tasks = [
+            asyncio.create_task(_virtual_user(
+                VirtualUser(client, recorder, emails[n % len(emails)], password, voucher_types),
+                mix, deadline, think, ramp_up * n / vus
+            ))
+            for n in range(vus)
+        ]
+        await asyncio.sleep(ramp_up)
+        recorder.start()
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            recorder.stop()
+            for task in tasks:
+                task.cancel()
+    return recorder
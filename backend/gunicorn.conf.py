@@ -0,0 +1,79 @@
+"""
+Gunicorn settings. Picked up automatically when gunicorn runs from this
+directory; elsewhere pass ``--config backend/gunicorn.conf.py``. The
+application comes from SERVER_MODE, so start gunicorn without one:
+
+    SERVER_MODE=wsgi (default)  voucher_project.wsgi on gthread workers
+    SERVER_MODE=asgi            voucher_project.asgi on uvicorn workers
+
+WEB_CONCURRENCY, GUNICORN_THREADS and ASGI_MAX_CONCURRENCY are read by
+settings.py as well, to size database connections: each WSGI thread keeps one
+persistent connection, each ASGI request in progress opens one.
+"""
+
+import glob
+import os
+import signal
+
+# Imported as a module: a top-level name "config" would be read as gunicorn's --config
+import decouple
+
+bind = f"0.0.0.0:{decouple.config('PORT', default='8000')}"
+workers = decouple.config('WEB_CONCURRENCY', default=2, cast=int)
+threads = decouple.config('GUNICORN_THREADS', default=4, cast=int)
+if decouple.config('SERVER_MODE', default='wsgi') == 'asgi':
+    # One event loop per worker; Stripe calls and other awaits do not hold a thread
+    wsgi_app = 'voucher_project.asgi:application'
+    worker_class = 'voucher_project.workers.ASGIWorker'
+else:
+    wsgi_app = 'voucher_project.wsgi:application'
+    worker_class = 'gthread' if threads > 1 else 'sync'
+timeout = decouple.config('GUNICORN_TIMEOUT', default=30, cast=int)
+graceful_timeout = timeout
+keepalive = 5
+# Recycle workers now and then; the jitter keeps them from restarting together
+max_requests = decouple.config('GUNICORN_MAX_REQUESTS', default=2000, cast=int)
+max_requests_jitter = max_requests // 10
+accesslog = '-'
+errorlog = '-'
+
+
+def on_starting(server):
+    # Snapshots left by the previous deployment's workers would be merged into /metrics forever
+    directory = decouple.config('METRICS_MULTIPROC_DIR', default='')
+    if directory:
+        for path in glob.glob(os.path.join(directory, '*.json')):
+            os.remove(path)
+
+
+def child_exit(server, worker):
+    # Keep the exited worker's counters in retired.json instead of one file per worker ever started
+    directory = decouple.config('METRICS_MULTIPROC_DIR', default='')
+    if not directory:
+        return
+    # Workers are reaped in the SIGCHLD handler; hold the next one so two exits never merge at once
+    signal.pthread_sigmask(signal.SIG_BLOCK, {signal.SIGCHLD})
+    try:
+        from voucher_project.metrics import retire_worker
+        retire_worker(directory, worker.pid)
+    finally:
+        signal.pthread_sigmask(signal.SIG_UNBLOCK, {signal.SIGCHLD})
+
+
+def when_ready(server):
+    """Run the database checks (connection budget) once, in the master"""
+    import django
+    from django.conf import settings
+    from django.core import checks
+    from django.db import connections
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'voucher_project.settings')
+    django.setup()
+    try:
+        for message in checks.run_checks(tags=[checks.Tags.database], databases=list(settings.DATABASES)):
+            server.log.warning(str(message))
+    except Exception as e:
+        server.log.warning(f'Database checks could not run: {e}')
+    finally:
+        # Workers are forked from the master and must not share its connection
+        connections.close_all()
@@ -0,0 +1,12 @@
+from django.apps import AppConfig
+from django.core.checks import Tags, register
+
+
+class ProjectConfig(AppConfig):
+    name = 'voucher_project'
+    verbose_name = 'Voucher Project'
+
+    def ready(self):
+        from .checks import check_connection_budget
+
+        register(check_connection_budget, Tags.database)
@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'voucher_project.settings')
+# Route the async views (apps/*/async_views.py) and size database connections for ASGI
+os.environ.setdefault('SERVER_MODE', 'asgi')
 
 application = get_asgi_application()
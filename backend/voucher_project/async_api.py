@@ -0,0 +1,123 @@
+"""
+Small helpers for plain Django async views that speak the same JSON dialect
+as the DRF views they stand in for under ASGI.
+
+DRF 3.14 views are synchronous, so the async endpoints are ordinary
+``async def`` Django views. ``async_api_view`` gives them method checks, JSON
+body parsing, DRF authentication, permissions and throttles, and DRF-style
+error responses. Bodies are rendered with the API's renderer, so they are
+byte for byte what the DRF views return.
+"""
+
+import functools
+import json
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import AnonymousUser
+from django.core.exceptions import PermissionDenied as DjangoPermissionDenied
+from django.http import Http404, HttpResponse
+from rest_framework.exceptions import (
+    APIException, AuthenticationFailed, NotAuthenticated, NotFound, PermissionDenied, Throttled
+)
+from rest_framework.settings import api_settings
+
+from .fastjson import FastJSONRenderer
+
+_renderer = FastJSONRenderer()
+
+
+def json_response(data, status=200, headers=None):
+    return HttpResponse(
+        _renderer.render(data), status=status, content_type=_renderer.media_type, headers=headers
+    )
+
+
+def error_response(exc, request=None):
+    """Render an APIException the way DRF's exception handler does"""
+    headers = {}
+    if isinstance(exc, Throttled) and exc.wait is not None:
+        headers['Retry-After'] = str(int(exc.wait))
+    if isinstance(exc, (NotAuthenticated, AuthenticationFailed)) and request is not None:
+        authenticator = api_settings.DEFAULT_AUTHENTICATION_CLASSES[0]()
+        headers['WWW-Authenticate'] = authenticator.authenticate_header(request)
+    data = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+    return json_response(data, status=exc.status_code, headers=headers)
+
+
+def parse_json(request):
+    if not request.body:
+        return {}
+    try:
+        return json.loads(request.body)
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError('JSON parse error')
+
+
+def _authenticate(request):
+    """Set request.user and request.auth with the DRF authentication classes"""
+    for authentication_class in api_settings.DEFAULT_AUTHENTICATION_CLASSES:
+        result = authentication_class().authenticate(request)
+        if result is not None:
+            request.user, request.auth = result
+            return
+    request.user, request.auth = AnonymousUser(), None
+
+
+def _check_permissions(request, permission_classes, view):
+    for permission_class in permission_classes:
+        if not permission_class().has_permission(request, view):
+            if request.auth is None:
+                raise NotAuthenticated()
+            raise PermissionDenied()
+
+
+def _check_request(request, permission_classes, throttle_classes, view):
+    """Authentication, permissions and throttles, in DRF's order"""
+    if permission_classes:
+        _authenticate(request)
+        _check_permissions(request, permission_classes, view)
+    _check_throttles(request, throttle_classes, view)
+
+
+def _check_throttles(request, throttle_classes, view):
+    waits = []
+    for throttle_class in throttle_classes:
+        throttle = throttle_class()
+        if not throttle.allow_request(request, view):
+            waits.append(throttle.wait())
+    if waits:
+        waits = [wait for wait in waits if wait is not None]
+        raise Throttled(wait=max(waits) if waits else None)
+
+
+def async_api_view(methods, throttle_classes=(), permission_classes=()):
+    """
+    Wrap an ``async def view(request)`` with parsing, throttling and error
+    handling. With ``permission_classes`` the request is authenticated first.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            if request.method not in methods:
+                return json_response(
+                    {'detail': f'Method "{request.method}" not allowed.'}, status=405
+                )
+            try:
+                # Throttles read request.data, as they would on a DRF request
+                request.data = parse_json(request)
+            except ValueError as e:
+                return json_response({'detail': str(e)}, status=400)
+            try:
+                await sync_to_async(_check_request)(request, permission_classes, throttle_classes, view)
+                return await view(request, *args, **kwargs)
+            except Http404:
+                return error_response(NotFound())
+            except DjangoPermissionDenied:
+                return error_response(PermissionDenied())
+            except APIException as exc:
+                return error_response(exc, request)
+
+        # Token based endpoints, like DRF's APIView
+        wrapper.csrf_exempt = True
+        return wrapper
+    return decorator
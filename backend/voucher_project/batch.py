@@ -0,0 +1,156 @@
+"""
+Request batching: ``POST /api/batch/`` runs several GET requests in one round trip.
+
+    {"requests": [{"path": "/api/vouchers/stats/"},
+                  {"id": "vouchers", "path": "/api/vouchers/my-vouchers/?fields=code,status"}]}
+
+returns, in the same order,
+
+    {"responses": [{"status": 200, "body": {...}},
+                   {"id": "vouchers", "status": 200, "body": {...}}]}
+
+The batch is authenticated once and every sub-request runs as that user. They
+are resolved and called in-process one after another, without a JWT check,
+user lookup or middleware of their own, and cache keys outside the local tier
+are read from Redis at most once per batch (``cache.batch_memo``).
+
+Only GET requests to /api/ endpoints can be batched, at most
+BATCH_MAX_REQUESTS of them. Sub-requests not started within BATCH_MAX_SECONDS
+are answered with a 504; a running one is not interrupted. A failed
+sub-request has its own status and does not fail the batch. Streaming
+endpoints (live stream, exports) cannot be batched.
+"""
+
+import io
+import json
+import logging
+import time
+from urllib.parse import urlsplit
+
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.conf import settings
+from django.core.exceptions import PermissionDenied
+from django.http import Http404, HttpRequest, QueryDict
+from django.urls import Resolver404, resolve
+from rest_framework import permissions, serializers, status
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.response import Response
+
+from .cache import batch_memo
+from .metrics import registry
+
+logger = logging.getLogger('voucher_app')
+
+BATCH_PATH = '/api/batch/'
+
+
+class SubRequestSerializer(serializers.Serializer):
+    id = serializers.CharField(required=False, max_length=100)
+    method = serializers.ChoiceField(choices=['GET'], default='GET')
+    path = serializers.CharField(max_length=2000)
+
+    def validate_path(self, value):
+        path = urlsplit(value).path
+        if not path.startswith('/api/') or path.startswith(BATCH_PATH):
+            raise serializers.ValidationError('Only /api/ endpoints other than /api/batch/ can be batched.')
+        return value
+
+
+class BatchSerializer(serializers.Serializer):
+    requests = SubRequestSerializer(many=True, allow_empty=False)
+
+    def validate_requests(self, value):
+        if len(value) > settings.BATCH_MAX_REQUESTS:
+            raise serializers.ValidationError(f'At most {settings.BATCH_MAX_REQUESTS} requests per batch.')
+        return value
+
+
+class SubRequest(HttpRequest):
+    """A GET request for ``path`` with the headers, cookies and user of the batch request"""
+
+    def __init__(self, batch_request, path, user):
+        super().__init__()
+        url = urlsplit(path)
+        self.method = 'GET'
+        self.path = self.path_info = url.path
+        self.GET = QueryDict(url.query)
+        self.COOKIES = batch_request.COOKIES
+        self.META = {
+            key: value for key, value in batch_request.META.items()
+            if key not in ('CONTENT_TYPE', 'CONTENT_LENGTH', 'wsgi.input')
+        }
+        self.META.update(REQUEST_METHOD='GET', PATH_INFO=url.path, QUERY_STRING=url.query)
+        self._scheme = batch_request.scheme
+        self._stream = io.BytesIO()
+        self._read_started = False
+        self.user = user
+
+    def _get_scheme(self):
+        return self._scheme
+
+
+def _body(response):
+    if isinstance(response, Response):
+        return response.data
+    if response.get('Content-Type', '').startswith('application/json'):
+        return json.loads(response.content) if response.content else None
+    return response.content.decode(response.charset, errors='replace')
+
+
+def _dispatch(request, path):
+    """(route, status, body) of a GET for ``path`` made by the batch's user"""
+    sub = SubRequest(request._request, path, request.user)
+    # DRF uses these instead of running the authenticators again
+    sub._force_auth_user = request.user
+    sub._force_auth_token = request.auth
+    try:
+        match = resolve(sub.path_info)
+    except Resolver404:
+        return 'unmatched', status.HTTP_404_NOT_FOUND, {'detail': 'Not found.'}
+    sub.resolver_match = match
+    route = '/' + match.route
+
+    try:
+        if iscoroutinefunction(match.func):
+            response = async_to_sync(match.func)(sub, *match.args, **match.kwargs)
+        else:
+            response = match.func(sub, *match.args, **match.kwargs)
+    except Http404:
+        return route, status.HTTP_404_NOT_FOUND, {'detail': 'Not found.'}
+    except PermissionDenied:
+        return route, status.HTTP_403_FORBIDDEN, {'detail': 'You do not have permission to perform this action.'}
+    except Exception:
+        logger.exception(f'Batched request for {path} failed')
+        return route, status.HTTP_500_INTERNAL_SERVER_ERROR, {'detail': 'A server error occurred.'}
+
+    if response.streaming:
+        response.close()
+        return route, status.HTTP_400_BAD_REQUEST, {'detail': 'Streaming endpoints cannot be batched.'}
+    return route, response.status_code, _body(response)
+
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def batch_view(request):
+    """Run several GET requests as the authenticated user and return all their responses"""
+    serializer = BatchSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    # Nothing is written, so the client is not pinned to the primary database
+    request._request.db_read_only = True
+    deadline = time.monotonic() + settings.BATCH_MAX_SECONDS
+    responses = []
+    with batch_memo():
+        for item in serializer.validated_data['requests']:
+            if time.monotonic() < deadline:
+                route, code, body = _dispatch(request, item['path'])
+            else:
+                route, code, body = 'skipped', status.HTTP_504_GATEWAY_TIMEOUT, {'detail': 'Batch time limit exceeded.'}
+            registry.inc('http_batch_subrequests_total', (('route', route), ('status', str(code))))
+
+            entry = {'id': item['id']} if 'id' in item else {}
+            entry.update(status=code, body=body)
+            responses.append(entry)
+
+    return Response({'responses': responses})
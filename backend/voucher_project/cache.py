@@ -0,0 +1,401 @@
+"""
+Two-tier cache backend: a bounded per-process LRU (L1) in front of Redis.
+
+Only keys under a configured prefix are kept in L1, each prefix with its own
+time to live; everything else behaves exactly like the Redis backend:
+
+    'OPTIONS': {
+        'L1_POLICIES': {'catalog:': 30, 'auth:principal:': 5},
+        'L1_MAX_ENTRIES': 10000,
+    }
+
+L1 holds the unpickled values, shared by every thread of the process, so
+treat what ``get()`` returns for those keys as read-only.
+
+Writes and deletes of L1 keys are published on a Redis channel. Every process
+listens in a background thread and drops its copy, so other workers normally
+see the change within milliseconds and at worst after the prefix's TTL. When
+the subscription drops, L1 is cleared once it is back, as invalidations may
+have been missed.
+
+If Redis is unreachable, reads are served from L1 alone (other keys miss),
+writes only fill L1, and a warning is logged at most once a minute.
+
+Inside ``batch_memo()`` (the sub-requests of one ``/api/batch/`` request)
+other keys are read from Redis at most once: the first read is kept, pickled
+so every caller still gets its own copy, until the key is written or deleted.
+"""
+
+import logging
+import os
+import pickle
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+import redis
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+
+from .metrics import InstrumentedRedisCache, current_stats, registry
+
+logger = logging.getLogger('voucher_app')
+
+CHANNEL = 'cache:l1:invalidate'
+CLEAR_ALL = '*'
+_MISSING = object()
+
+_batch_memo = ContextVar('cache_batch_memo', default=None)
+
+
+@contextmanager
+def batch_memo():
+    """Read each key outside the local tier from Redis at most once in this block"""
+    token = _batch_memo.set({})
+    try:
+        yield
+    finally:
+        _batch_memo.reset(token)
+
+
+def _count_request_hits(count=1):
+    stats = current_stats()
+    if stats is not None:
+        stats.cache_hits += count
+
+
+class LocalLRU:
+    """Thread-safe LRU with a per-entry expiry"""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return _MISSING
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return _MISSING
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def add(self, key, value, ttl):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[0] >= time.monotonic():
+                return False
+        self.set(key, value, ttl)
+        return True
+
+    def delete(self, key):
+        with self._lock:
+            return self._data.pop(key, None) is not None
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class TwoTierCache(InstrumentedRedisCache):
+    def __init__(self, server, params):
+        options = dict(params.get('OPTIONS', {}))
+        # Longest prefixes first, so a more specific prefix wins
+        self.policies = sorted(options.pop('L1_POLICIES', {}).items(), key=lambda item: -len(item[0]))
+        max_entries = options.pop('L1_MAX_ENTRIES', 10000)
+        super().__init__(server, {**params, 'OPTIONS': options})
+        self.local = LocalLRU(max_entries)
+        self._instance = uuid.uuid4().hex
+        self._listener_pid = None
+        self._listener_lock = threading.Lock()
+        self._last_warning = 0.0
+
+    # Policies and statistics
+
+    def _policy(self, key):
+        for prefix, ttl in self.policies:
+            if key.startswith(prefix):
+                return prefix, ttl
+        return None
+
+    def _count(self, prefix, result):
+        registry.inc('cache_tier_gets_total', (('prefix', prefix), ('result', result)))
+
+    def _warn(self, action, error):
+        now = time.monotonic()
+        if now - self._last_warning >= 60:
+            self._last_warning = now
+            logger.warning(f'Redis cache {action} failed, serving from the local tier only: {error}')
+
+    def _local_ttl(self, policy_ttl, timeout):
+        if timeout is DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        return policy_ttl if timeout is None else min(policy_ttl, timeout)
+
+    # Cross-process invalidation
+
+    @property
+    def _origin(self):
+        # Tells this process's own invalidation messages apart; forked children get their own
+        return f'{self._instance}.{os.getpid()}'
+
+    def _ensure_listener(self):
+        # Threads do not survive fork, so each gunicorn worker starts its own
+        if self._listener_pid == os.getpid():
+            return
+        with self._listener_lock:
+            if self._listener_pid == os.getpid():
+                return
+            self._listener_pid = os.getpid()
+            threading.Thread(target=self._listen, name='cache-l1-invalidation', daemon=True).start()
+
+    def _listen(self):
+        while True:
+            try:
+                pubsub = self._cache.get_client().pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(CHANNEL)
+                # Whatever changed while we were not listening is unknown
+                self.local.clear()
+                for message in pubsub.listen():
+                    origin, _, key = message['data'].decode().partition(':')
+                    if origin == self._origin:
+                        continue
+                    if key == CLEAR_ALL:
+                        self.local.clear()
+                    else:
+                        self.local.delete(key)
+            except redis.RedisError as e:
+                self._warn('subscription', e)
+                time.sleep(1)
+
+    def _publish(self, key):
+        try:
+            self._cache.get_client(key, write=True).publish(CHANNEL, f'{self._origin}:{key}')
+        except redis.RedisError as e:
+            self._warn('invalidation', e)
+
+    # Cache API
+
+    def _remote_get(self, key, default, version):
+        try:
+            return super().get(key, default, version)
+        except redis.RedisError as e:
+            self._warn('read', e)
+            return default
+
+    def _forget(self, key, version):
+        memo = _batch_memo.get()
+        if memo is not None:
+            memo.pop(self.make_and_validate_key(key, version=version), None)
+
+    def get(self, key, default=None, version=None):
+        policy = self._policy(key)
+        if policy is None:
+            memo = _batch_memo.get()
+            if memo is None:
+                return self._remote_get(key, default, version)
+            full_key = self.make_and_validate_key(key, version=version)
+            if full_key in memo:
+                _count_request_hits()
+                return pickle.loads(memo[full_key])
+            value = self._remote_get(key, _MISSING, version)
+            if value is _MISSING:
+                return default
+            memo[full_key] = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+            return value
+
+        self._ensure_listener()
+        prefix, ttl = policy
+        full_key = self.make_and_validate_key(key, version=version)
+        value = self.local.get(full_key)
+        if value is not _MISSING:
+            self._count(prefix, 'local_hit')
+            _count_request_hits()
+            return value
+
+        value = self._remote_get(key, _MISSING, version)
+        if value is _MISSING:
+            self._count(prefix, 'miss')
+            return default
+        self._count(prefix, 'redis_hit')
+        self.local.set(full_key, value, ttl)
+        return value
+
+    def get_many(self, keys, version=None):
+        found, remote = {}, []
+        memo = _batch_memo.get()
+        for key in keys:
+            policy = self._policy(key)
+            value = _MISSING
+            if policy is not None:
+                self._ensure_listener()
+                value = self.local.get(self.make_and_validate_key(key, version=version))
+                if value is not _MISSING:
+                    self._count(policy[0], 'local_hit')
+            elif memo is not None:
+                pickled = memo.get(self.make_and_validate_key(key, version=version))
+                if pickled is not None:
+                    value = pickle.loads(pickled)
+            if value is _MISSING:
+                remote.append(key)
+            else:
+                found[key] = value
+        if found:
+            _count_request_hits(len(found))
+        if remote:
+            try:
+                values = super().get_many(remote, version)
+            except redis.RedisError as e:
+                self._warn('read', e)
+                values = {}
+            for key in remote:
+                policy = self._policy(key)
+                if policy is None:
+                    if memo is not None and key in values:
+                        full_key = self.make_and_validate_key(key, version=version)
+                        memo[full_key] = pickle.dumps(values[key], pickle.HIGHEST_PROTOCOL)
+                    continue
+                if key in values:
+                    self._count(policy[0], 'redis_hit')
+                    self.local.set(self.make_and_validate_key(key, version=version), values[key], policy[1])
+                else:
+                    self._count(policy[0], 'miss')
+            found.update(values)
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self._forget(key, version)
+        try:
+            super().set(key, value, timeout, version)
+        except redis.RedisError as e:
+            self._warn('write', e)
+        policy = self._policy(key)
+        if policy is not None:
+            full_key = self.make_and_validate_key(key, version=version)
+            ttl = self._local_ttl(policy[1], timeout)
+            if ttl > 0:
+                self.local.set(full_key, value, ttl)
+            else:
+                self.local.delete(full_key)
+            self._publish(full_key)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self._forget(key, version)
+        policy = self._policy(key)
+        try:
+            added = super().add(key, value, timeout, version)
+        except redis.RedisError as e:
+            self._warn('write', e)
+            if policy is None:
+                return False
+            return self.local.add(
+                self.make_and_validate_key(key, version=version), value, self._local_ttl(policy[1], timeout)
+            )
+        if added and policy is not None:
+            full_key = self.make_and_validate_key(key, version=version)
+            self.local.set(full_key, value, self._local_ttl(policy[1], timeout))
+            self._publish(full_key)
+        return added
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        rest = {}
+        for key, value in data.items():
+            if self._policy(key) is None:
+                self._forget(key, version)
+                rest[key] = value
+            else:
+                self.set(key, value, timeout, version)
+        try:
+            return super().set_many(rest, timeout, version)
+        except redis.RedisError as e:
+            self._warn('write', e)
+            return list(rest)
+
+    def _drop(self, key, version):
+        self._forget(key, version)
+        if self._policy(key) is not None:
+            full_key = self.make_and_validate_key(key, version=version)
+            self.local.delete(full_key)
+            self._publish(full_key)
+
+    # Redis first, then the invalidation: a worker that refills its L1 on the
+    # message must not read the old value back from Redis
+
+    def delete(self, key, version=None):
+        try:
+            deleted = super().delete(key, version)
+        except redis.RedisError as e:
+            self._warn('delete', e)
+            deleted = False
+        self._drop(key, version)
+        return deleted
+
+    def delete_many(self, keys, version=None):
+        keys = list(keys)
+        try:
+            super().delete_many(keys, version)
+        except redis.RedisError as e:
+            self._warn('delete', e)
+        for key in keys:
+            self._drop(key, version)
+
+    def incr(self, key, delta=1, version=None):
+        """The new value; None when Redis is unreachable and L1 does not hold the key"""
+        try:
+            value = super().incr(key, delta, version)
+        except redis.RedisError as e:
+            self._warn('write', e)
+            policy = self._policy(key)
+            if policy is None:
+                return None
+            full_key = self.make_and_validate_key(key, version=version)
+            value = self.local.get(full_key)
+            if value is _MISSING:
+                return None
+            value += delta
+            self.local.set(full_key, value, policy[1])
+            return value
+        self._drop(key, version)
+        return value
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        try:
+            return super().touch(key, timeout, version)
+        except redis.RedisError as e:
+            self._warn('write', e)
+            return False
+
+    def has_key(self, key, version=None):
+        if self._policy(key) is not None:
+            if self.local.get(self.make_and_validate_key(key, version=version)) is not _MISSING:
+                return True
+        try:
+            return super().has_key(key, version)
+        except redis.RedisError as e:
+            self._warn('read', e)
+            return False
+
+    def clear(self):
+        memo = _batch_memo.get()
+        if memo is not None:
+            memo.clear()
+        cleared = super().clear()
+        self.local.clear()
+        self._publish(CLEAR_ALL)
+        return cleared
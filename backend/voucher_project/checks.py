@@ -0,0 +1,85 @@
+"""
+Deployment checks for database connection sizing.
+
+Every gunicorn thread and every Celery worker process uses one database
+connection at a time, and with persistent connections keeps it open. ASGI
+workers (SERVER_MODE=asgi) open one per request in progress, up to
+ASGI_MAX_CONCURRENCY per worker. These
+checks need a database, so they run with ``migrate``, ``check --database
+<alias>`` and when gunicorn starts (see gunicorn.conf.py). They are
+registered by ``ProjectConfig.ready()``.
+"""
+
+from django.conf import settings
+from django.core.checks import Info, Warning
+from django.db import DatabaseError, connections
+
+
+def _web_slots():
+    """(per-worker connections, what they are) for the server mode"""
+    if settings.SERVER_MODE == 'asgi':
+        return settings.ASGI_MAX_CONCURRENCY, 'concurrent request(s)'
+    return settings.GUNICORN_THREADS, 'thread(s)'
+
+
+def connection_budget():
+    """Connections the deployment holds open at most, by source"""
+    return {
+        'web': settings.WEB_INSTANCES * settings.WEB_CONCURRENCY * _web_slots()[0],
+        'celery': settings.CELERY_WORKER_CONCURRENCY,
+        'reserved': settings.DB_RESERVED_CONNECTIONS,
+    }
+
+
+def server_connection_limit(connection):
+    """max_connections minus the slots reserved for superusers, or None when not PostgreSQL"""
+    if connection.vendor != 'postgresql':
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT current_setting('max_connections')::int - current_setting('superuser_reserved_connections')::int"
+        )
+        return cursor.fetchone()[0]
+
+
+def check_connection_budget(app_configs, databases=None, **kwargs):
+    """Run for the primary and each read replica: every thread may hold a connection to each"""
+    aliases = [alias for alias in databases or () if alias in settings.DATABASES]
+    if not aliases:
+        return []
+
+    budget = connection_budget()
+    total = sum(budget.values())
+    slots, unit = _web_slots()
+    breakdown = (
+        f"{settings.WEB_INSTANCES} instance(s) x {settings.WEB_CONCURRENCY} worker(s) x "
+        f"{slots} {unit} = {budget['web']} web, {budget['celery']} Celery, "
+        f"{budget['reserved']} reserved"
+    )
+    if settings.DB_PGBOUNCER:
+        return [Info(
+            f'{total} client connections to PgBouncer per database ({breakdown}); '
+            f'size its max_client_conn for them.',
+            id='voucher_project.I001',
+        )]
+
+    messages = []
+    for alias in aliases:
+        try:
+            limit = server_connection_limit(connections[alias])
+        except DatabaseError as e:
+            messages.append(Warning(
+                f'Could not read max_connections of database "{alias}": {e}',
+                id='voucher_project.W002',
+            ))
+            continue
+        if limit is not None and total > limit:
+            messages.append(Warning(
+                f'The deployment can open {total} connections to database "{alias}" ({breakdown}) '
+                f'but the server accepts {limit}.',
+                hint='Lower WEB_CONCURRENCY, GUNICORN_THREADS (ASGI_MAX_CONCURRENCY under ASGI) or '
+                     'CELERY_WORKER_CONCURRENCY, raise max_connections, or put PgBouncer in front of '
+                     'the database and set DB_PGBOUNCER=True.',
+                id='voucher_project.W001',
+            ))
+    return messages
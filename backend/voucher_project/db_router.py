@@ -0,0 +1,294 @@
+"""
+Read replica routing.
+
+Reads go to a replica only inside ``use_replica()`` (or the ``replica_reads``
+decorator and ``ReplicaReadMixin``), which analytics, exports, list views
+and admin changelists opt into; everything else, and every write, uses the
+primary. Inside a replica block reads still go to the primary when:
+
+- the request already wrote something (request-scoped stickiness),
+- the user wrote something in the last REPLICA_STICKY_SECONDS (recorded in
+  the cache by ``ReplicaStickinessMiddleware``), so users read their own
+  writes from any client,
+- a transaction is open on the primary, or
+- every replica lags more than REPLICA_MAX_LAG_SECONDS behind, or is down.
+
+Lag is measured every REPLICA_LAG_CHECK_SECONDS by a background thread per
+process; routing only reads the last result. Until the first measurement
+reads stay on the primary.
+"""
+
+import functools
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError, connections
+
+logger = logging.getLogger('voucher_app')
+
+PRIMARY = 'default'
+STICKY_KEY = 'db_primary_until:{user_id}'
+
+
+class _RouteState:
+    __slots__ = ('replica', 'pinned', 'request')
+
+    def __init__(self, replica=False, pinned=False, request=None):
+        self.replica = replica
+        self.pinned = pinned
+        self.request = request
+
+
+_state = ContextVar('db_route', default=None)
+
+
+def replica_aliases():
+    return [alias for alias in settings.DATABASES if alias.startswith('replica')]
+
+
+@contextmanager
+def use_replica():
+    """Send reads in this block to a replica, unless pinned to the primary"""
+    current = _state.get()
+    token = _state.set(_RouteState(
+        replica=True,
+        pinned=bool(current and current.pinned),
+        request=current.request if current else None,
+    ))
+    try:
+        yield
+    finally:
+        # Keep a write made inside the block pinning the rest of the request
+        pinned = _state.get().pinned
+        _state.reset(token)
+        if pinned and current is not None:
+            current.pinned = True
+
+
+def replica_reads(view):
+    """Decorator for function views; goes under @api_view"""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        with use_replica():
+            return view(*args, **kwargs)
+    return wrapper
+
+
+def replica_stream(iterable):
+    """
+    Iterate a lazy response body (StreamingHttpResponse) with replica reads;
+    it is consumed after the view returned, outside its replica block.
+    """
+    iterator = iter(iterable)
+    while True:
+        with use_replica():
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+        yield item
+
+
+class ReplicaReadMixin:
+    """
+    For read-only generic views: GET and HEAD requests read from a replica.
+    Only the handler is wrapped, so authentication, permissions and throttles
+    read from the primary; a fresh login may not have replicated yet.
+    """
+
+    def get(self, request, *args, **kwargs):
+        with use_replica():
+            return super().get(request, *args, **kwargs)
+
+
+class ReplicaChangelistMixin:
+    """For ModelAdmins: changelist pages read from a replica"""
+
+    def changelist_view(self, request, extra_context=None):
+        # Checking the user loads the session and user from the primary first;
+        # a fresh login may not have replicated yet
+        if request.method != 'GET' or not request.user.is_authenticated:
+            return super().changelist_view(request, extra_context)
+        with use_replica():
+            response = super().changelist_view(request, extra_context)
+            # TemplateResponse runs the changelist queries when it renders
+            if hasattr(response, 'render'):
+                response.render()
+        return response
+
+
+def pin_to_primary():
+    """Read from the primary for the rest of this request or replica block"""
+    state = _state.get()
+    if state is not None:
+        state.pinned = True
+
+
+class _LagMonitor:
+    """
+    Replica lag in seconds per alias, refreshed by a background thread per
+    process; None when the replica is unreachable or not measured yet
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._lags = {}
+        self._thread = None
+
+    def lag(self, alias):
+        self._ensure_running()
+        return self._lags.get(alias)
+
+    def _ensure_running(self):
+        # Started on first use, so each forked worker runs its own
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='replica-lag', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            for alias in replica_aliases():
+                self._lags[alias] = self.measure(alias)
+            # Not part of the connection budget: close this thread's connections between rounds
+            connections.close_all()
+            time.sleep(settings.REPLICA_LAG_CHECK_SECONDS)
+
+    def measure(self, alias):
+        connection = connections[alias]
+        if connection.vendor != 'postgresql':
+            return 0.0
+        try:
+            with connection.cursor() as cursor:
+                # pg_last_xact_replay_timestamp() stands still while the primary is idle,
+                # so a replica that has replayed everything it received counts as current
+                cursor.execute(
+                    "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+                    "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+                )
+                return float(cursor.fetchone()[0])
+        except DatabaseError as e:
+            logger.warning(f'Replica {alias} unavailable: {e}')
+            return None
+
+    def reset(self):
+        self._lags.clear()
+
+
+lag_monitor = _LagMonitor()
+
+
+def healthy_replicas():
+    limit = settings.REPLICA_MAX_LAG_SECONDS
+    healthy = []
+    for alias in replica_aliases():
+        lag = lag_monitor.lag(alias)
+        if lag is not None and lag <= limit:
+            healthy.append(alias)
+    return healthy
+
+
+def _user_recently_wrote(request):
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated:
+        return False
+    pinned_until = cache.get(STICKY_KEY.format(user_id=user.pk))
+    return pinned_until is not None and pinned_until > time.time()
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if state is None or not state.replica or state.pinned:
+            return PRIMARY
+        if connections[PRIMARY].in_atomic_block:
+            return PRIMARY
+        if state.request is not None:
+            request, state.request = state.request, None
+            # Pinned while checking, so loading a lazy session user reads the primary
+            state.pinned = True
+            state.pinned = _user_recently_wrote(request)
+            if state.pinned:
+                return PRIMARY
+        healthy = healthy_replicas()
+        return random.choice(healthy) if healthy else PRIMARY
+
+    def db_for_write(self, model, **hints):
+        pin_to_primary()
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == PRIMARY
+
+
+class ReplicaStickinessMiddleware:
+    """
+    Pins users who just wrote to the primary: a successful unsafe request by
+    an authenticated user stores ``db_primary_until:<user id>`` in the cache
+    for REPLICA_STICKY_SECONDS, and the router reads from the primary only
+    while it is set. Keyed on the user rather than a cookie, so it holds for
+    cross-site API clients too. Views that only read over POST set
+    ``request.db_read_only``.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def _wrote(self, request, response):
+        return (
+            request.method not in ('GET', 'HEAD', 'OPTIONS') and response.status_code < 400
+            and not getattr(request, 'db_read_only', False)
+        )
+
+    def _sticky_key(self, request):
+        # DRF sets the authenticated user on the underlying request; a session
+        # user may still be lazy and load from the database here
+        user = getattr(request, 'user', None)
+        if user is None or not user.is_authenticated:
+            return None
+        return STICKY_KEY.format(user_id=user.pk)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        token = _state.set(_RouteState(request=request))
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.reset(token)
+        key = self._sticky_key(request) if self._wrote(request, response) else None
+        if key:
+            seconds = settings.REPLICA_STICKY_SECONDS
+            cache.set(key, time.time() + seconds, seconds)
+        return response
+
+    async def __acall__(self, request):
+        token = _state.set(_RouteState(request=request))
+        try:
+            response = await self.get_response(request)
+        finally:
+            _state.reset(token)
+        key = await sync_to_async(self._sticky_key)(request) if self._wrote(request, response) else None
+        if key:
+            seconds = settings.REPLICA_STICKY_SECONDS
+            await cache.aset(key, time.time() + seconds, seconds)
+        return response
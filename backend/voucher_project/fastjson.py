@@ -0,0 +1,71 @@
+"""
+orjson-based DRF renderer and parser.
+
+For what serializers return the output is byte for byte that of DRF's
+``JSONRenderer``: strings (DecimalField and DateTimeField values arrive
+already formatted), numbers, booleans, None, lists and dicts, and raw UUID,
+date and datetime values (UTC written as ``Z``). Types orjson does not know
+(Decimal, timedelta, lazy translations, querysets...) go through DRF's own
+``JSONEncoder.default``, so a raw Decimal is still written as a float.
+
+Known differences: floats of 1e16 and up or below 1e-4 are written as
+``1e16`` rather than ``1e+16`` (the same number), and NaN and Infinity are
+written as null instead of failing the request. Indented output (``Accept:
+application/json; indent=4``) and values orjson cannot represent (integers
+over 64 bits) use the stock renderer. Bodies orjson rejects are parsed again
+by the stock parser, for its error message or because it accepts them; an
+integer over 64 bits in a request body is read as a float, which integer
+serializer fields reject as invalid.
+
+Without orjson installed both classes behave exactly like DRF's.
+"""
+
+import io
+
+from django.conf import settings
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # orjson is optional, the stdlib encoder is always available
+    orjson = None
+
+if orjson is not None:
+    DUMPS_OPTIONS = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+
+_default = JSONEncoder().default
+
+
+class FastJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (
+            orjson is None or data is None or self.ensure_ascii or not self.compact
+            or self.get_indent(accepted_media_type, renderer_context or {}) is not None
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(data, default=_default, option=DUMPS_OPTIONS)
+        except orjson.JSONEncodeError:
+            # Raises the same error as DRF for types neither encoder supports
+            return super().render(data, accepted_media_type, renderer_context)
+        # Like DRF, escape U+2028 and U+2029 so the output is valid JavaScript
+        if b'\xe2\x80' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
+
+
+class FastJSONParser(JSONParser):
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        if orjson is None or encoding.lower().replace('_', '-') not in ('utf-8', 'utf8'):
+            return super().parse(stream, media_type, parser_context)
+        body = stream.read()
+        try:
+            return orjson.loads(body)
+        except orjson.JSONDecodeError:
+            return super().parse(io.BytesIO(body), media_type, parser_context)
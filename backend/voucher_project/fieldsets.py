@@ -0,0 +1,251 @@
+"""
+Sparse fieldsets for list endpoints: ``?fields=`` and ``?expand=``.
+
+    ?fields=code,status,expires_at     only these fields
+    ?fields=code,voucher_type.name     only some fields of a nested object
+    ?expand=                           nested objects as their id
+    ?expand=voucher_type               ... except the ones named
+
+Without ``fields`` every field is returned, and without ``expand`` every
+nested object is embedded, as before. Unknown names are a 400.
+
+The requested fields drive the queryset too: ``only()`` loads the columns
+they read and ``select_related`` keeps the relations they still need. Fields
+that are not model columns (properties, method fields) name the columns they
+read in the serializer's ``Meta.field_sources``; a field without one loads
+the full rows.
+
+Views add ``SparseListMixin`` and their serializers ``SparseFieldsMixin``.
+"""
+
+import functools
+
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+
+
+def _names(value):
+    return [name.strip() for name in value.split(',') if name.strip()]
+
+
+class FieldSet:
+    """The fields (name -> set of sub-field names, or None for all) and expansions a request asked for"""
+
+    def __init__(self, fields=None, expand=None):
+        self.fields = fields
+        self.expand = expand
+
+    @classmethod
+    def from_request(cls, request):
+        params = request.query_params
+        fields = expand = None
+        if 'fields' in params:
+            fields = {}
+            for name in _names(params['fields']):
+                name, _, sub = name.partition('.')
+                if sub:
+                    if fields.get(name, set()) is not None:
+                        fields.setdefault(name, set()).add(sub)
+                else:
+                    fields[name] = None
+        if 'expand' in params:
+            expand = set(_names(params['expand']))
+        return cls(fields, expand)
+
+    @property
+    def is_default(self):
+        return self.fields is None and self.expand is None
+
+    def includes(self, name):
+        return self.fields is None or name in self.fields
+
+    def embeds(self, name):
+        return self.expand is None or name in self.expand
+
+    def subfields(self, name):
+        """Sub-fields requested for a nested object, or None for all"""
+        return None if self.fields is None else self.fields.get(name)
+
+    def select(self, names):
+        """The requested names among ``names``, in that order"""
+        return [name for name in names if self.includes(name)]
+
+    def narrow(self, name, data):
+        """A nested object's serialized dict, limited to the requested sub-fields"""
+        sub = self.subfields(name)
+        if sub is None:
+            return data
+        return {key: value for key, value in data.items() if key in sub}
+
+    def validate(self, serializer_class):
+        """Raise a 400 for names the serializer does not have"""
+        layout = describe(serializer_class)
+        errors = {}
+        for name, sub in (self.fields or {}).items():
+            if name not in layout:
+                errors.setdefault('fields', []).append(f'Unknown field "{name}".')
+            elif sub and layout[name].nested is None:
+                errors.setdefault('fields', []).append(f'"{name}" has no sub-fields.')
+            elif sub and not sub <= layout[name].nested.keys():
+                unknown = ', '.join(sorted(sub - layout[name].nested.keys()))
+                errors.setdefault('fields', []).append(f'Unknown sub-field(s) of "{name}": {unknown}.')
+        for name in self.expand or ():
+            if name not in layout or layout[name].nested is None:
+                errors.setdefault('expand', []).append(f'"{name}" cannot be expanded.')
+        if errors:
+            raise serializers.ValidationError(errors)
+
+    def apply(self, fields):
+        """Prune a serializer's fields (a BindingDict) in place"""
+        for name in list(fields):
+            if not self.includes(name):
+                del fields[name]
+                continue
+            field = fields[name]
+            nested = getattr(field, 'child', field)
+            if not isinstance(nested, serializers.BaseSerializer):
+                continue
+            if not self.embeds(name):
+                source = field.source or name
+                kwargs = {} if source == name else {'source': source}
+                fields[name] = serializers.PrimaryKeyRelatedField(read_only=True, many=nested is not field, **kwargs)
+            else:
+                sub = self.subfields(name)
+                if sub is not None:
+                    for subname in list(nested.fields):
+                        if subname not in sub:
+                            del nested.fields[subname]
+        return fields
+
+    def shape(self, queryset, serializer_class):
+        """``only()`` and ``select_related`` for the requested fields"""
+        if self.is_default:
+            return queryset
+        layout = describe(serializer_class)
+        columns = {queryset.model._meta.pk.name}
+        for name, info in layout.items():
+            if not self.includes(name):
+                continue
+            if info.nested is not None and info.relation:
+                columns.add(info.relation)
+                if not self.embeds(name):
+                    continue
+                sub = self.subfields(name)
+                for subname, subcolumns in info.nested.items():
+                    if sub is None or subname in sub:
+                        if subcolumns is None:
+                            # Unknown columns: the full related row
+                            columns.update(
+                                f'{info.relation}__{field.name}'
+                                for field in _concrete_fields(queryset.model, info.relation)
+                            )
+                        else:
+                            columns.update(f'{info.relation}__{column}' for column in subcolumns)
+            elif info.columns is None:
+                return queryset
+            else:
+                columns.update(info.columns)
+
+        # Every relation on the way to a column is joined, and its foreign key must not be deferred
+        relations = set()
+        for column in columns:
+            parts = column.split('__')
+            relations.update('__'.join(parts[:end]) for end in range(1, len(parts)))
+        columns |= relations
+        queryset = queryset.select_related(None)
+        if relations:
+            queryset = queryset.select_related(*relations)
+        return queryset.only(*columns)
+
+
+def _concrete_fields(model, relation):
+    for part in relation.split('__'):
+        model = model._meta.get_field(part).related_model
+    return model._meta.concrete_fields
+
+
+class _FieldInfo:
+    __slots__ = ('columns', 'nested', 'relation')
+
+    def __init__(self, columns=None, nested=None, relation=None):
+        # Model paths the field reads, or None when unknown
+        self.columns = columns
+        # For nested serializers: sub-field name -> model paths relative to the relation
+        self.nested = nested
+        self.relation = relation
+
+
+def _model_path(model, source):
+    """'voucher.code' -> 'voucher__code' when every step is a model field, else None"""
+    parts = source.split('.')
+    for index, part in enumerate(parts):
+        try:
+            field = model._meta.get_field(part)
+        except FieldDoesNotExist:
+            return None
+        if index < len(parts) - 1:
+            if not field.is_relation or field.many_to_many or field.one_to_many:
+                return None
+            model = field.related_model
+    return '__'.join(parts)
+
+
+def _columns(serializer, name, field):
+    meta_sources = getattr(getattr(serializer, 'Meta', None), 'field_sources', {})
+    if name in meta_sources:
+        return tuple(meta_sources[name])
+    if field.source == '*':
+        return None
+    path = _model_path(serializer.Meta.model, field.source)
+    return None if path is None else (path,)
+
+
+@functools.lru_cache(maxsize=None)
+def describe(serializer_class):
+    """Field name -> _FieldInfo for a ModelSerializer class"""
+    serializer = serializer_class()
+    layout = {}
+    for name, field in serializer.fields.items():
+        nested = getattr(field, 'child', field)
+        if isinstance(nested, serializers.ModelSerializer):
+            relation = _model_path(serializer.Meta.model, field.source)
+            layout[name] = _FieldInfo(
+                nested={subname: _columns(nested, subname, subfield) for subname, subfield in nested.fields.items()},
+                relation=relation if relation and nested is field else None,
+            )
+        else:
+            layout[name] = _FieldInfo(columns=_columns(serializer, name, field))
+    return layout
+
+
+class SparseFieldsMixin:
+    """For ModelSerializers: apply the request's FieldSet passed in the context as 'fieldset'"""
+
+    def get_fields(self):
+        fields = super().get_fields()
+        fieldset = self.context.get('fieldset')
+        # Only the serializer of the list items, not serializers nested in them
+        if fieldset is not None and not fieldset.is_default and self.root in (self, self.parent):
+            fieldset.apply(fields)
+        return fields
+
+
+class SparseListMixin:
+    """For ListAPIViews: read ?fields= and ?expand=, shape the queryset and the serializer"""
+
+    @property
+    def fieldset(self):
+        fieldset = getattr(self.request, '_fieldset', None)
+        if fieldset is None:
+            fieldset = FieldSet.from_request(self.request)
+            fieldset.validate(self.get_serializer_class())
+            self.request._fieldset = fieldset
+        return fieldset
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['fieldset'] = self.fieldset
+        return context
+
+    def filter_queryset(self, queryset):
+        return self.fieldset.shape(super().filter_queryset(queryset), self.get_serializer_class())
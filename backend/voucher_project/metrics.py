@@ -0,0 +1,424 @@
+"""
+Request metrics in Prometheus text format.
+
+``MetricsMiddleware`` times every request and, through a database execute
+wrapper and an instrumented cache backend, counts queries, DB time, cache
+hits and outbound HTTP time for it. Everything is recorded per route (the
+URL pattern, not the path) into a small in-process registry: a lock and a
+few dict updates per request, no I/O.
+
+Under gunicorn each worker has its own registry. With METRICS_MULTIPROC_DIR
+set, workers write a snapshot to ``<dir>/<pid>.json`` at most every
+METRICS_FLUSH_SECONDS, and ``/metrics`` merges the snapshots of the live
+workers with ``retired.json``. When a worker exits, gunicorn's ``child_exit``
+hook folds its snapshot into ``retired.json`` and removes it, so counters
+survive worker restarts without a file per worker ever started.
+"""
+
+import atexit
+import bisect
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+from contextvars import ContextVar
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache.backends.redis import RedisCache
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.http import HttpResponse
+from django.utils.crypto import constant_time_compare
+
+logger = logging.getLogger('voucher_app')
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+# name -> (type, help, buckets)
+METRICS = {
+    'http_request_duration_seconds': (
+        'histogram', 'Time until the response is returned, by route', LATENCY_BUCKETS
+    ),
+    'http_request_db_queries': (
+        'histogram', 'Database queries per request, by route', QUERY_BUCKETS
+    ),
+    'http_request_db_seconds_total': (
+        'counter', 'Time spent in database queries, by route', None
+    ),
+    'http_request_cache_gets_total': (
+        'counter', 'Cache lookups made while serving requests, by route and result', None
+    ),
+    'http_request_external_seconds_total': (
+        'counter', 'Time spent in outbound HTTP calls, by route and service', None
+    ),
+    'http_batch_subrequests_total': (
+        'counter', 'Sub-requests served through /api/batch/, by route and status', None
+    ),
+    'cache_tier_gets_total': (
+        'counter', 'Lookups of keys kept in the in-process cache tier, by key prefix and result', None
+    ),
+    'external_request_duration_seconds': (
+        'histogram', 'Outbound HTTP call duration, by service and operation', LATENCY_BUCKETS
+    ),
+}
+
+
+class Registry:
+    """Counters and histograms keyed by (metric name, label pairs)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        # Histogram state: per-bucket counts (non-cumulative), then sum, then count
+        self._histograms = {}
+
+    def inc(self, name, labels, value=1):
+        key = (name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, labels, value):
+        buckets = METRICS[name][2]
+        index = bisect.bisect_left(buckets, value)
+        key = (name, labels)
+        with self._lock:
+            state = self._histograms.get(key)
+            if state is None:
+                state = self._histograms[key] = [0] * (len(buckets) + 3)
+            state[index] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'counters': [[name, labels, value] for (name, labels), value in self._counters.items()],
+                'histograms': [[name, labels, list(state)] for (name, labels), state in self._histograms.items()],
+            }
+
+
+registry = Registry()
+
+
+class RequestStats:
+    __slots__ = ('queries', 'db_seconds', 'cache_hits', 'cache_misses', 'external')
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.external = {}
+
+
+_current = ContextVar('request_metrics', default=None)
+
+
+def current_stats():
+    """Stats of the request being served, or None outside a request"""
+    return _current.get()
+
+
+def record_query(execute, sql, params, many, context):
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.queries += 1
+        stats.db_seconds += time.perf_counter() - start
+
+
+@receiver(connection_created)
+def instrument_connection(sender, connection, **kwargs):
+    """Time queries on every connection, including those opened in sync_to_async threads"""
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def observe_external(service, operation, seconds):
+    registry.observe('external_request_duration_seconds', (('service', service), ('operation', operation)), seconds)
+    stats = _current.get()
+    if stats is not None:
+        stats.external[service] = stats.external.get(service, 0.0) + seconds
+
+
+class track_external:
+    """Context manager that times an outbound call"""
+
+    def __init__(self, service, operation):
+        self.service = service
+        self.operation = operation
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        observe_external(self.service, self.operation, time.perf_counter() - self.start)
+
+
+_MISSING = object()
+
+
+class InstrumentedRedisCache(RedisCache):
+    """RedisCache that counts hits and misses against the current request"""
+
+    def get(self, key, default=None, version=None):
+        value = super().get(key, _MISSING, version)
+        stats = _current.get()
+        if stats is not None:
+            if value is _MISSING:
+                stats.cache_misses += 1
+            else:
+                stats.cache_hits += 1
+        return default if value is _MISSING else value
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        values = super().get_many(keys, version)
+        stats = _current.get()
+        if stats is not None:
+            stats.cache_hits += len(values)
+            stats.cache_misses += len(keys) - len(values)
+        return values
+
+
+# Stripe object ids look like pi_3OaBc..., cus_P1x...; resource names are all lowercase
+_STRIPE_ID = re.compile(r'^[a-z]{2,8}_(?=[a-z]*[A-Z0-9])[A-Za-z0-9]{6,}$')
+
+
+def stripe_operation(method, url):
+    path = re.sub(r'^https?://[^/]+', '', url).split('?')[0]
+    segments = ['{id}' if _STRIPE_ID.match(segment) else segment for segment in path.split('/')]
+    return f"{method.upper()} {'/'.join(segments)}"
+
+
+class TimedHTTPClientMixin:
+    """Mixed into Stripe's HTTP client class; each attempt, including retries, is timed"""
+
+    def request(self, method, url, headers, post_data=None):
+        with track_external('stripe', stripe_operation(method, url)):
+            return super().request(method, url, headers, post_data)
+
+
+def instrument_stripe():
+    """Route Stripe API calls through a timed copy of the default HTTP client"""
+    import stripe
+
+    if isinstance(stripe.default_http_client, TimedHTTPClientMixin):
+        return
+    base = stripe.default_http_client or stripe.new_default_http_client()
+    timed_class = type(f'Timed{type(base).__name__}', (TimedHTTPClientMixin, type(base)), {})
+    stripe.default_http_client = timed_class(verify_ssl_certs=stripe.verify_ssl_certs, proxy=stripe.proxy)
+
+
+def _route(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unmatched'
+    return '/' + match.route
+
+
+def record_request(request, response, stats, duration):
+    route = _route(request)
+    method = request.method
+    registry.observe(
+        'http_request_duration_seconds',
+        (('method', method), ('route', route), ('status', str(response.status_code))),
+        duration
+    )
+    labels = (('method', method), ('route', route))
+    registry.observe('http_request_db_queries', labels, stats.queries)
+    if stats.db_seconds:
+        registry.inc('http_request_db_seconds_total', labels, stats.db_seconds)
+    if stats.cache_hits:
+        registry.inc('http_request_cache_gets_total', (('route', route), ('result', 'hit')), stats.cache_hits)
+    if stats.cache_misses:
+        registry.inc('http_request_cache_gets_total', (('route', route), ('result', 'miss')), stats.cache_misses)
+    for service, seconds in stats.external.items():
+        registry.inc('http_request_external_seconds_total', (('route', route), ('service', service)), seconds)
+
+    if duration >= settings.METRICS_SLOW_REQUEST_SECONDS:
+        external = sum(stats.external.values())
+        logger.warning(
+            f'Slow request {method} {route} {response.status_code} {duration * 1000:.0f}ms: '
+            f'{stats.queries} queries ({stats.db_seconds * 1000:.0f}ms), external {external * 1000:.0f}ms'
+        )
+    flush()
+
+
+class MetricsMiddleware:
+    """Record latency, queries, cache and outbound time per route. Goes first in MIDDLEWARE."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        stats = RequestStats()
+        token = _current.set(stats)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        record_request(request, response, stats, time.perf_counter() - start)
+        return response
+
+    async def __acall__(self, request):
+        stats = RequestStats()
+        token = _current.set(stats)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        record_request(request, response, stats, time.perf_counter() - start)
+        return response
+
+
+_last_flush = 0.0
+
+
+def flush(force=False):
+    """Write this process's snapshot for the multiprocess /metrics view"""
+    global _last_flush
+    directory = settings.METRICS_MULTIPROC_DIR
+    now = time.monotonic()
+    if not directory or (not force and now - _last_flush < settings.METRICS_FLUSH_SECONDS):
+        return
+    _last_flush = now
+    try:
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(fd, 'w') as file:
+            json.dump(registry.snapshot(), file)
+        os.replace(tmp, os.path.join(directory, f'{os.getpid()}.json'))
+    except OSError as e:
+        logger.warning(f'Could not write metrics snapshot: {e}')
+
+
+atexit.register(lambda: flush(force=True))
+
+
+def _load_snapshots():
+    directory = settings.METRICS_MULTIPROC_DIR
+    if not directory:
+        return [registry.snapshot()]
+    flush(force=True)
+    snapshots = []
+    for path in Path(directory).glob('*.json'):
+        try:
+            snapshots.append(json.loads(path.read_text()))
+        except (OSError, ValueError):
+            # Removed or replaced while reading
+            continue
+    return snapshots
+
+
+def _merge(snapshots):
+    merged = {name: {} for name in METRICS}
+    for snapshot in snapshots:
+        for name, labels, value in snapshot['counters']:
+            labels = tuple(tuple(pair) for pair in labels)
+            merged[name][labels] = merged[name].get(labels, 0) + value
+        for name, labels, state in snapshot['histograms']:
+            labels = tuple(tuple(pair) for pair in labels)
+            current = merged[name].get(labels)
+            merged[name][labels] = state if current is None else [a + b for a, b in zip(current, state)]
+    return merged
+
+
+def collect():
+    """Merge snapshots into {name: {labels: value or histogram state}}"""
+    return _merge(_load_snapshots())
+
+
+def retire_worker(directory, pid):
+    """Fold an exited worker's snapshot into retired.json; run by the gunicorn master only"""
+    path = os.path.join(directory, f'{pid}.json')
+    retired = os.path.join(directory, 'retired.json')
+    if not os.path.exists(path):
+        # Exited before its first flush
+        return
+    snapshots = []
+    for source in (retired, path):
+        try:
+            with open(source) as file:
+                snapshots.append(json.load(file))
+        except (OSError, ValueError):
+            continue
+    merged = _merge(snapshots)
+    snapshot = {
+        'counters': [
+            [name, labels, value] for name, series in merged.items()
+            if METRICS[name][0] == 'counter' for labels, value in series.items()
+        ],
+        'histograms': [
+            [name, labels, state] for name, series in merged.items()
+            if METRICS[name][0] == 'histogram' for labels, state in series.items()
+        ],
+    }
+    try:
+        fd, tmp = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(fd, 'w') as file:
+            json.dump(snapshot, file)
+        os.replace(tmp, retired)
+        os.remove(path)
+    except OSError as e:
+        logger.warning(f'Could not retire metrics snapshot of worker {pid}: {e}')
+
+
+def _escape(value):
+    return str(value).replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"')
+
+
+def _labels(pairs):
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in pairs) + '}'
+
+
+def render(merged):
+    lines = []
+    for name, (kind, help_text, buckets) in METRICS.items():
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        for labels, value in sorted(merged[name].items()):
+            if kind == 'counter':
+                lines.append(f'{name}{_labels(labels)} {value}')
+                continue
+            cumulative = 0
+            for bound, count in zip(buckets, value):
+                cumulative += count
+                lines.append(f'{name}_bucket{_labels(labels + (("le", repr(float(bound))),))} {cumulative}')
+            lines.append(f'{name}_bucket{_labels(labels + (("le", "+Inf"),))} {value[-1]}')
+            lines.append(f'{name}_sum{_labels(labels)} {value[-2]}')
+            lines.append(f'{name}_count{_labels(labels)} {value[-1]}')
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view(request):
+    """Prometheus scrape endpoint; outside DEBUG it is hidden until METRICS_TOKEN is set"""
+    token = settings.METRICS_TOKEN
+    if not token:
+        if not settings.DEBUG:
+            return HttpResponse(status=404)
+    elif not constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return HttpResponse(status=403)
+    return HttpResponse(render(collect()), content_type='text/plain; version=0.0.4; charset=utf-8')
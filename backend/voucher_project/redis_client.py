@@ -0,0 +1,21 @@
+"""
+Shared Redis connection for features that talk to Redis directly rather
+than through the Django cache (live counters, rate limits, token revocation).
+"""
+
+import redis
+from django.conf import settings
+
+_client = None
+
+
+def get_redis():
+    """Return the process-wide Redis client (connections are pooled and thread-safe)"""
+    global _client
+    if _client is None:
+        _client = redis.Redis.from_url(
+            settings.REDIS_URL,
+            socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+            socket_connect_timeout=settings.REDIS_SOCKET_TIMEOUT,
+        )
+    return _client
@@ -47,23 +47,28 @@ THIRD_PARTY_APPS = [
 ]
 
 LOCAL_APPS = [
+    # Project-wide system checks (voucher_project/apps.py)
+    'voucher_project',
     'apps.authentication',
     'apps.vouchers',
     'apps.payments',
     'apps.users',
     'apps.analytics',
+    'apps.notifications',
 ]
 
 INSTALLED_APPS = DJANGO_APPS + THIRD_PARTY_APPS + LOCAL_APPS
 
 MIDDLEWARE = [
+    'voucher_project.metrics.MetricsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'voucher_project.staticfiles.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'apps.authentication.middleware.HashingOverloadedMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -91,12 +96,60 @@ WSGI_APPLICATION = 'voucher_project.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
+# 'wsgi': gthread workers. 'asgi': uvicorn workers serving voucher_project.asgi, with the async
+# views (apps/*/async_views.py) routed instead of their DRF versions. Read by gunicorn.conf.py too.
+SERVER_MODE = config('SERVER_MODE', default='wsgi')
+ASYNC_VIEWS = config('ASYNC_VIEWS', default=SERVER_MODE == 'asgi', cast=bool)
+
+# Each gunicorn thread keeps its connection open for DB_CONN_MAX_AGE seconds and
+# checks it before reusing it, instead of connecting (TLS, auth) on every request.
+# Under ASGI requests do not run on long-lived threads and connections would pile
+# up, so they are closed after each request; use PgBouncer there.
 DATABASES = {
     'default': dj_database_url.config(
-        default=config('DATABASE_URL', default="sqlite:///db.sqlite3") # type: ignore
+        default=config('DATABASE_URL', default="sqlite:///db.sqlite3"), # type: ignore
+        conn_max_age=config('DB_CONN_MAX_AGE', default=0 if SERVER_MODE == 'asgi' else 600, cast=int),
+        conn_health_checks=config('DB_CONN_HEALTH_CHECKS', default=True, cast=bool),
     )
 }
 
+# Behind PgBouncer in transaction mode: consecutive queries may run on different server
+# connections, so server-side cursors (QuerySet.iterator()) cannot be used
+DB_PGBOUNCER = config('DB_PGBOUNCER', default=False, cast=bool)
+if DB_PGBOUNCER:
+    DATABASES['default']['DISABLE_SERVER_SIDE_CURSORS'] = True
+
+# Read replicas (comma-separated URLs) become the "replica1", "replica2", ... aliases.
+# Reads opted in with voucher_project.db_router.use_replica go to the replicas that are
+# no more than REPLICA_MAX_LAG_SECONDS behind; users who wrote something in the
+# last REPLICA_STICKY_SECONDS keep reading from the primary.
+DATABASE_REPLICA_URLS = config('DATABASE_REPLICA_URLS', default='', cast=lambda v: [s.strip() for s in v.split(',') if s.strip()])
+for index, url in enumerate(DATABASE_REPLICA_URLS, start=1):
+    DATABASES[f'replica{index}'] = {
+        **dj_database_url.parse(
+            url,
+            conn_max_age=DATABASES['default']['CONN_MAX_AGE'],
+            conn_health_checks=DATABASES['default']['CONN_HEALTH_CHECKS'],
+        ),
+        'TEST': {'MIRROR': 'default'},
+    }
+if DATABASE_REPLICA_URLS:
+    DATABASE_ROUTERS = ['voucher_project.db_router.ReplicaRouter']
+    MIDDLEWARE.insert(1, 'voucher_project.db_router.ReplicaStickinessMiddleware')
+REPLICA_MAX_LAG_SECONDS = config('REPLICA_MAX_LAG_SECONDS', default=5.0, cast=float)
+REPLICA_LAG_CHECK_SECONDS = config('REPLICA_LAG_CHECK_SECONDS', default=5.0, cast=float)
+REPLICA_STICKY_SECONDS = config('REPLICA_STICKY_SECONDS', default=15, cast=int)
+
+# Process layout, for sizing database connections (voucher_project/checks.py).
+# WEB_CONCURRENCY, GUNICORN_THREADS and ASGI_MAX_CONCURRENCY are also read by gunicorn.conf.py.
+WEB_INSTANCES = config('WEB_INSTANCES', default=1, cast=int)
+WEB_CONCURRENCY = config('WEB_CONCURRENCY', default=2, cast=int)
+GUNICORN_THREADS = config('GUNICORN_THREADS', default=4, cast=int)
+# ASGI workers: connections and requests in progress per worker, beyond which uvicorn answers 503
+ASGI_MAX_CONCURRENCY = config('ASGI_MAX_CONCURRENCY', default=200, cast=int)
+# Migrations, shells, cron jobs and admin tools
+DB_RESERVED_CONNECTIONS = config('DB_RESERVED_CONNECTIONS', default=5, cast=int)
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -139,6 +192,20 @@ STATICFILES_DIRS = [
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Uploads above this size are streamed to a temporary file instead of memory
+FILE_UPLOAD_MAX_MEMORY_SIZE = config('FILE_UPLOAD_MAX_MEMORY_SIZE', default=1024 * 1024, cast=int)
+
+# Profile pictures (apps/users/images.py)
+PROFILE_PICTURE_MAX_UPLOAD_BYTES = config('PROFILE_PICTURE_MAX_UPLOAD_BYTES', default=10 * 1024 * 1024, cast=int)
+PROFILE_PICTURE_MAX_PIXELS = config('PROFILE_PICTURE_MAX_PIXELS', default=40_000_000, cast=int)
+PROFILE_PICTURE_WEBP_QUALITY = config('PROFILE_PICTURE_WEBP_QUALITY', default=80, cast=int)
+PROFILE_CACHE_SECONDS = config('PROFILE_CACHE_SECONDS', default=300, cast=int)
+PROFILE_PICTURE_VARIANTS = {
+    'small': 64,
+    'medium': 256,
+    'large': 512,
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
@@ -150,23 +217,46 @@ AUTH_USER_MODEL = 'users.User'
 # Django REST Framework
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'apps.authentication.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    # orjson when installed, same output as DRF's JSONRenderer (voucher_project/fastjson.py)
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
+        'voucher_project.fastjson.FastJSONRenderer',
     ],
     'DEFAULT_PARSER_CLASSES': [
-        'rest_framework.parsers.JSONParser',
+        'voucher_project.fastjson.FastJSONParser',
         'rest_framework.parsers.MultiPartParser',
         'rest_framework.parsers.FormParser',
     ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 20,
+    # Proxies in front of the app that append to X-Forwarded-For. The per-IP throttles take the
+    # address that many hops back; at 0 they use REMOTE_ADDR and ignore the client-supplied header
+    'NUM_PROXIES': config('NUM_PROXIES', default=0, cast=int),
+    # Used by the GCRA throttles in voucher_project/throttling.py
+    'DEFAULT_THROTTLE_RATES': {
+        'login_ip': config('THROTTLE_LOGIN_IP', default='30/min'),
+        'login_email': config('THROTTLE_LOGIN_EMAIL', default='5/min'),
+        'register_ip': config('THROTTLE_REGISTER_IP', default='10/hour'),
+        'password_reset_ip': config('THROTTLE_PASSWORD_RESET_IP', default='10/hour'),
+        'password_reset_email': config('THROTTLE_PASSWORD_RESET_EMAIL', default='3/hour'),
+        'redeem_user': config('THROTTLE_REDEEM_USER', default='20/min'),
+        'redeem_ip': config('THROTTLE_REDEEM_IP', default='60/min'),
+        'redeem_code_prefix': config('THROTTLE_REDEEM_CODE_PREFIX', default='30/min'),
+    },
 }
 
+# Turns the GCRA throttles off, for load tests and query budget runs
+THROTTLING_ENABLED = config('THROTTLING_ENABLED', default=True, cast=bool)
+
+# POST /api/batch/ (voucher_project/batch.py): sub-requests per batch, and seconds after which
+# the ones not started yet are answered with a 504
+BATCH_MAX_REQUESTS = config('BATCH_MAX_REQUESTS', default=10, cast=int)
+BATCH_MAX_SECONDS = config('BATCH_MAX_SECONDS', default=5.0, cast=float)
+
 # JWT Settings
 from datetime import timedelta
 
@@ -174,8 +264,8 @@ SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=60),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=7),
     'ROTATE_REFRESH_TOKENS': True,
-    'BLACKLIST_AFTER_ROTATION': True,
-    'UPDATE_LAST_LOGIN': True,
+    'BLACKLIST_AFTER_ROTATION': True,  # Revoked JTIs live in Redis, see apps/authentication/blacklist.py
+    'UPDATE_LAST_LOGIN': False,  # Handled by the user_logged_in signal
     'ALGORITHM': 'HS256',
     'SIGNING_KEY': SECRET_KEY,
     'VERIFYING_KEY': None,
@@ -186,6 +276,18 @@ SIMPLE_JWT = {
     'TOKEN_TYPE_CLAIM': 'token_type',
 }
 
+# Cached JWT principal (see apps/authentication/authentication.py)
+AUTH_PRINCIPAL_CACHE_SECONDS = config('AUTH_PRINCIPAL_CACHE_SECONDS', default=300, cast=int)
+AUTH_PRINCIPAL_LOCAL_SECONDS = config('AUTH_PRINCIPAL_LOCAL_SECONDS', default=5, cast=int)
+
+TOKEN_BLACKLIST_LOCAL_ENTRIES = config('TOKEN_BLACKLIST_LOCAL_ENTRIES', default=10000, cast=int)
+
+# Password hashing pool (apps/authentication/hashing.py)
+AUTHENTICATION_BACKENDS = ['apps.authentication.backends.PooledModelBackend']
+PASSWORD_HASHING_WORKERS = config('PASSWORD_HASHING_WORKERS', default=os.cpu_count() or 2, cast=int)
+PASSWORD_HASHING_MAX_QUEUE = config('PASSWORD_HASHING_MAX_QUEUE', default=32, cast=int)
+PASSWORD_HASHING_RETRY_AFTER = config('PASSWORD_HASHING_RETRY_AFTER', default=2, cast=int)
+
 # CORS Settings
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000",
@@ -203,33 +305,106 @@ CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
+CELERY_WORKER_CONCURRENCY = config('CELERY_WORKER_CONCURRENCY', default=os.cpu_count() or 1, cast=int)
+
+from celery.schedules import crontab
+
+CELERY_BEAT_SCHEDULE = {
+    'rebuild-cohort-reports': {
+        'task': 'apps.analytics.tasks.rebuild_cohort_reports',
+        'schedule': crontab(hour=2, minute=0),
+    },
+    'flush-active-users': {
+        'task': 'apps.analytics.tasks.flush_active_users',
+        'schedule': 60.0,
+    },
+    'send-pending-emails': {
+        'task': 'apps.notifications.tasks.send_pending_emails',
+        'schedule': 60.0,
+    },
+    'send-voucher-expiry-reminders': {
+        'task': 'apps.notifications.tasks.send_voucher_expiry_reminders',
+        'schedule': crontab(hour=9, minute=0),
+    },
+    'purge-old-emails': {
+        'task': 'apps.notifications.tasks.purge_old_emails',
+        'schedule': crontab(hour=3, minute=30),
+    },
+}
+
+# Direct Redis access (live metrics and other non-cache data)
+REDIS_URL = config('REDIS_URL', default='redis://localhost:6379/0')
+REDIS_SOCKET_TIMEOUT = config('REDIS_SOCKET_TIMEOUT', default=0.5, cast=float)
+
+# Live operations counters
+LIVE_METRICS_RETENTION_MINUTES = config('LIVE_METRICS_RETENTION_MINUTES', default=24 * 60, cast=int)
+LIVE_STREAM_MAX_SECONDS = config('LIVE_STREAM_MAX_SECONDS', default=300, cast=int)
 
 # Redis Cache
+# Voucher types and discount rules (apps/vouchers/catalog.py)
+CATALOG_CACHE_SECONDS = config('CATALOG_CACHE_SECONDS', default=300, cast=int)
+CATALOG_LOCAL_SECONDS = config('CATALOG_LOCAL_SECONDS', default=30, cast=int)
+
+# Redis, with an in-process tier for hot keys (voucher_project/cache.py)
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'BACKEND': 'voucher_project.cache.TwoTierCache',
         'LOCATION': config('REDIS_URL', default='redis://localhost:6379/1'),
+        'OPTIONS': {
+            'L1_POLICIES': {
+                'catalog:': CATALOG_LOCAL_SECONDS,
+                'auth:principal:': AUTH_PRINCIPAL_LOCAL_SECONDS,
+            },
+            'L1_MAX_ENTRIES': config('CACHE_LOCAL_MAX_ENTRIES', default=10000, cast=int),
+        },
     }
 }
 
+USER_ANALYTICS_CACHE_SECONDS = config('USER_ANALYTICS_CACHE_SECONDS', default=300, cast=int)
+
 # Stripe Settings
 STRIPE_PUBLISHABLE_KEY = config('STRIPE_PUBLISHABLE_KEY', default='')
 STRIPE_SECRET_KEY = config('STRIPE_SECRET_KEY', default='')
 STRIPE_WEBHOOK_SECRET = config('STRIPE_WEBHOOK_SECRET', default='')
+# Point at benchmarks/fake_stripe.py (http://127.0.0.1:12111) for load tests
+STRIPE_API_BASE = config('STRIPE_API_BASE', default='https://api.stripe.com')
 
 # Email Configuration
-EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+# Use django.core.mail.backends.filebased.EmailBackend or .console.EmailBackend locally and in tests
+EMAIL_BACKEND = config('EMAIL_BACKEND', default='django.core.mail.backends.smtp.EmailBackend')
+EMAIL_FILE_PATH = config('EMAIL_FILE_PATH', default=str(BASE_DIR / 'sent_emails'))
 EMAIL_HOST = config('EMAIL_HOST', default='smtp.gmail.com')
 EMAIL_PORT = config('EMAIL_PORT', default=587, cast=int)
 EMAIL_USE_TLS = config('EMAIL_USE_TLS', default=True, cast=bool)
 EMAIL_HOST_USER = config('EMAIL_HOST_USER', default='')
 EMAIL_HOST_PASSWORD = config('EMAIL_HOST_PASSWORD', default='')
 DEFAULT_FROM_EMAIL = config('DEFAULT_FROM_EMAIL', default='noreply@voucherapp.com')
+EMAIL_TIMEOUT = config('EMAIL_TIMEOUT', default=10, cast=int)
+
+# Outbound email queue (apps/notifications)
+EMAIL_QUEUE_BATCH_SIZE = config('EMAIL_QUEUE_BATCH_SIZE', default=50, cast=int)
+EMAIL_QUEUE_BATCHES_PER_TASK = config('EMAIL_QUEUE_BATCHES_PER_TASK', default=10, cast=int)
+EMAIL_QUEUE_MAX_ATTEMPTS = config('EMAIL_QUEUE_MAX_ATTEMPTS', default=6, cast=int)
+EMAIL_QUEUE_RETRY_SECONDS = config('EMAIL_QUEUE_RETRY_SECONDS', default=60, cast=int)
+# Sent, skipped and failed messages are deleted after this many days
+EMAIL_QUEUE_RETENTION_DAYS = config('EMAIL_QUEUE_RETENTION_DAYS', default=30, cast=int)
+VOUCHER_EXPIRY_REMINDER_DAYS = config('VOUCHER_EXPIRY_REMINDER_DAYS', default=3, cast=int)
+
+# Base URL of the frontend, used for links in emails
+FRONTEND_URL = config('FRONTEND_URL', default='http://localhost:3000')
 
 # Crispy Forms
 CRISPY_ALLOWED_TEMPLATE_PACKS = "bootstrap5"
 CRISPY_TEMPLATE_PACK = "bootstrap5"
 
+# Request metrics (voucher_project/metrics.py), scraped from /metrics
+# Set METRICS_MULTIPROC_DIR under gunicorn so every worker is included
+METRICS_MULTIPROC_DIR = config('METRICS_MULTIPROC_DIR', default='')
+METRICS_FLUSH_SECONDS = config('METRICS_FLUSH_SECONDS', default=1.0, cast=float)
+METRICS_SLOW_REQUEST_SECONDS = config('METRICS_SLOW_REQUEST_SECONDS', default=1.0, cast=float)
+# Bearer token required on /metrics; without one the endpoint answers 404 unless DEBUG is on
+METRICS_TOKEN = config('METRICS_TOKEN', default='')
+
 # Logging
 LOGGING = {
     'version': 1,
@@ -0,0 +1,38 @@
+"""
+WhiteNoise that can run under ASGI without a thread.
+
+WhiteNoise 6.6 middleware is synchronous only. Under ASGI, Django then calls
+it through ``sync_to_async`` and everything below it, async views included,
+through ``async_to_sync`` from that thread (the request's own, as Django's
+ASGIHandler gives each request a ``ThreadSensitiveContext``): every request
+in progress holds a thread for as long as its view awaits. Here only
+requests for a static file leave the event loop.
+"""
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from whitenoise import middleware
+
+
+class WhiteNoiseMiddleware(middleware.WhiteNoiseMiddleware):
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, *args, **kwargs):
+        super().__init__(get_response, *args, **kwargs)
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = await sync_to_async(self.find_file)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return await sync_to_async(self.serve)(static_file, request)
+        return await self.get_response(request)
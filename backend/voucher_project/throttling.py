@@ -0,0 +1,222 @@
+"""
+GCRA rate limiting for the endpoints that attract credential stuffing and
+voucher code guessing.
+
+Each check is a single Lua script call: Redis keeps one "theoretical arrival
+time" per key, so memory is constant per key no matter the rate, and the
+decision, the key update and the blocked-request counter happen atomically.
+When Redis is unreachable the same algorithm runs against a per-process
+table, which is looser across workers but still caps a single worker.
+
+Rates are the usual DRF ``DEFAULT_THROTTLE_RATES`` entries, keyed by scope.
+"""
+
+import hashlib
+import logging
+import math
+import threading
+import time
+
+import redis
+from django.conf import settings
+from rest_framework.throttling import SimpleRateThrottle
+
+from .redis_client import get_redis
+
+logger = logging.getLogger('voucher_app')
+
+KEY_PREFIX = 'throttle'
+BLOCKED_KEY = f'{KEY_PREFIX}:blocked'
+LOCAL_MAX_KEYS = 50000
+
+# KEYS[1] = limiter key, KEYS[2] = blocked counter hash
+# ARGV[1] = emission interval (ms), ARGV[2] = burst tolerance (ms), ARGV[3] = scope
+# Returns {allowed, retry_after_ms}
+GCRA_SCRIPT = """
+local interval = tonumber(ARGV[1])
+local tolerance = tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) * 1000 + math.floor(tonumber(clock[2]) / 1000)
+local tat = tonumber(redis.call('GET', KEYS[1]))
+if not tat or tat < now then
+    tat = now
+end
+local allow_at = tat - tolerance
+if now < allow_at then
+    redis.call('HINCRBY', KEYS[2], ARGV[3], 1)
+    return {0, allow_at - now}
+end
+local new_tat = tat + interval
+redis.call('SET', KEYS[1], new_tat, 'PX', new_tat - now)
+return {1, 0}
+"""
+
+_script = None
+
+
+def _gcra_script():
+    global _script
+    if _script is None:
+        _script = get_redis().register_script(GCRA_SCRIPT)
+    return _script
+
+
+class _LocalGCRA:
+    """Per-process GCRA table used while Redis is unavailable"""
+
+    def __init__(self, max_keys=LOCAL_MAX_KEYS):
+        self.max_keys = max_keys
+        self.tats = {}
+        self.blocked = {}
+        self.lock = threading.Lock()
+
+    def check(self, key, interval, tolerance, scope):
+        now = time.monotonic() * 1000
+        with self.lock:
+            tat = max(self.tats.get(key, now), now)
+            allow_at = tat - tolerance
+            if now < allow_at:
+                self.blocked[scope] = self.blocked.get(scope, 0) + 1
+                return False, allow_at - now
+            if len(self.tats) >= self.max_keys:
+                # Drop keys whose window has fully drained
+                self.tats = {k: v for k, v in self.tats.items() if v > now}
+                if len(self.tats) >= self.max_keys:
+                    self.tats.clear()
+            self.tats[key] = tat + interval
+            return True, 0
+
+
+_local = _LocalGCRA()
+
+
+def blocked_counts():
+    """Blocked requests per scope, from Redis and from this process's fallback"""
+    try:
+        shared = {
+            scope.decode(): int(count)
+            for scope, count in get_redis().hgetall(BLOCKED_KEY).items()
+        }
+    except redis.RedisError as e:
+        logger.warning(f'Could not read throttle counters: {e}')
+        shared = None
+    return {
+        'redis': shared,
+        'local_fallback': dict(_local.blocked),
+    }
+
+
+def _digest(value):
+    """Keep raw emails and codes out of Redis keys"""
+    return hashlib.sha256(value.encode('utf-8')).hexdigest()[:32]
+
+
+class GCRAThrottle(SimpleRateThrottle):
+    """
+    Base class: subclasses set ``scope`` and implement ``get_cache_key``,
+    returning None to skip the check for a request.
+    """
+
+    def allow_request(self, request, view):
+        if self.rate is None or not settings.THROTTLING_ENABLED:
+            return True
+
+        key = self.get_cache_key(request, view)
+        if key is None:
+            return True
+
+        # num_requests per duration seconds, all of them allowed as a burst
+        interval = self.duration * 1000 / self.num_requests
+        tolerance = interval * (self.num_requests - 1)
+
+        try:
+            allowed, retry_after = _gcra_script()(
+                keys=[key, BLOCKED_KEY],
+                args=[int(interval), int(tolerance), self.scope],
+            )
+        except redis.RedisError as e:
+            logger.warning(f'Rate limiter falling back to local state: {e}')
+            allowed, retry_after = _local.check(key, interval, tolerance, self.scope)
+
+        self.retry_after = int(retry_after) / 1000
+        return bool(allowed)
+
+    def wait(self):
+        return math.ceil(self.retry_after) if self.retry_after else None
+
+    def key_for(self, ident):
+        return f'{KEY_PREFIX}:{self.scope}:{ident}'
+
+
+class IPRateThrottle(GCRAThrottle):
+    def get_cache_key(self, request, view):
+        return self.key_for(self.get_ident(request))
+
+
+class UserRateThrottle(GCRAThrottle):
+    """Per authenticated user, falling back to the client IP"""
+
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            return self.key_for(f'user:{request.user.pk}')
+        return self.key_for(f'ip:{self.get_ident(request)}')
+
+
+class EmailRateThrottle(GCRAThrottle):
+    """Per target account, so one mailbox can't be hammered from many IPs"""
+
+    def get_cache_key(self, request, view):
+        email = request.data.get('email') if hasattr(request.data, 'get') else None
+        if not isinstance(email, str) or not email:
+            return None
+        return self.key_for(_digest(email.strip().lower()))
+
+
+class CodePrefixRateThrottle(GCRAThrottle):
+    """Per voucher code prefix, which slows guessing spread across accounts and IPs"""
+
+    prefix_length = 4
+
+    def get_cache_key(self, request, view):
+        code = request.data.get('code') if hasattr(request.data, 'get') else None
+        if not isinstance(code, str) or not code:
+            return None
+        return self.key_for(_digest(code.strip().upper()[:self.prefix_length]))
+
+
+class LoginIPThrottle(IPRateThrottle):
+    scope = 'login_ip'
+
+
+class LoginEmailThrottle(EmailRateThrottle):
+    scope = 'login_email'
+
+
+class RegisterIPThrottle(IPRateThrottle):
+    scope = 'register_ip'
+
+
+class PasswordResetIPThrottle(IPRateThrottle):
+    scope = 'password_reset_ip'
+
+
+class PasswordResetEmailThrottle(EmailRateThrottle):
+    scope = 'password_reset_email'
+
+
+class RedeemUserThrottle(UserRateThrottle):
+    scope = 'redeem_user'
+
+
+class RedeemIPThrottle(IPRateThrottle):
+    scope = 'redeem_ip'
+
+
+class RedeemCodePrefixThrottle(CodePrefixRateThrottle):
+    scope = 'redeem_code_prefix'
+
+
+LOGIN_THROTTLES = [LoginIPThrottle, LoginEmailThrottle]
+REGISTER_THROTTLES = [RegisterIPThrottle]
+PASSWORD_RESET_THROTTLES = [PasswordResetIPThrottle, PasswordResetEmailThrottle]
+REDEEM_THROTTLES = [RedeemUserThrottle, RedeemIPThrottle, RedeemCodePrefixThrottle]
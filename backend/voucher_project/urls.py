@@ -19,6 +19,8 @@ from django.urls import path, include
 from django.http import JsonResponse
 from django.conf import settings
 from django.conf.urls.static import static
+from voucher_project.batch import batch_view
+from voucher_project.metrics import metrics_view
 
 def test_view(request):
     return JsonResponse({"message": "Backend is working!", "status": "success"})
@@ -26,13 +28,23 @@ def test_view(request):
 def health_check(request):
     return JsonResponse({"status": "healthy", "django": "running"})
 
+# Under ASGI these answer on the event loop, without a trip to the sync thread pool
+async def async_test_view(request):
+    return test_view(request)
+
+async def async_health_check(request):
+    return health_check(request)
+
 urlpatterns = [
     path('admin/', admin.site.urls),
-    path('api/test/', test_view, name='test'),
-    path('api/health/', health_check, name='health'),
+    path('api/test/', async_test_view if settings.ASYNC_VIEWS else test_view, name='test'),
+    path('api/health/', async_health_check if settings.ASYNC_VIEWS else health_check, name='health'),
+    path('metrics', metrics_view, name='metrics'),
+    path('api/batch/', batch_view, name='batch'),
     
     # API endpoints
     path('api/auth/', include('apps.authentication.urls')),
+    path('api/users/', include('apps.users.urls')),
     path('api/vouchers/', include('apps.vouchers.urls')),
     path('api/payments/', include('apps.payments.urls')),
     path('api/analytics/', include('apps.analytics.urls')),
@@ -0,0 +1,16 @@
+"""
+Gunicorn worker for SERVER_MODE=asgi, selected by gunicorn.conf.py.
+"""
+
+import decouple
+from uvicorn.workers import UvicornWorker
+
+
+class ASGIWorker(UvicornWorker):
+    CONFIG_KWARGS = {
+        **UvicornWorker.CONFIG_KWARGS,
+        # Django does not implement the lifespan protocol
+        'lifespan': 'off',
+        # Bounds the database connections a worker can open at once (voucher_project/checks.py)
+        'limit_concurrency': decouple.config('ASGI_MAX_CONCURRENCY', default=200, cast=int),
+    }